@@ -1,16 +1,37 @@
 import os
 import sys
 import json
+import time
 from dotenv import load_dotenv
-from anthropic import Anthropic
-from tools.file_tools import TOOLS as FILE_TOOLS, execute_tool as exec_file_tool
-from tools.search_codebase import SEARCH_TOOLS, execute_tool as exec_search_tool
-from prompts import SYSTEM_PROMPT
 
+# Load .env once, before the modules below read their settings from the environment.
 load_dotenv()
 
+# Heavy dependencies (anthropic, tool modules) are imported on first use;
+# see `python agent-v3.py --profile-startup`.
+from tools import read_cache
+from tools.registry import REGISTRY
+from prompts import SYSTEM_PROMPT
+import client_pool
+from context_compaction import CHARS_PER_TOKEN, ContextCompactor
+from memory_store import MemoryStore
+from permission_policy import PermissionPolicy
+import prompt_cache
+from rate_limiter import LIMITER
+import replay_cache
+import result_shaping
+import subagents
+import tracing
+from tool_scheduler import is_read_only, run_tool_calls, start_early
+
+# Conversation limits, enforced by the context compactor
 MAX_HISTORY = 50
+COUNT_TOKENS_WITH_API = os.getenv("AGENT_COUNT_TOKENS", "0") == "1"
 MODEL_NAME = "claude-opus-4-5-20251101"
+# Stream responses and start read-only tools before the turn finishes.
+STREAMING = os.getenv("AGENT_STREAMING", "1") != "0"
+# One long-lived bash session per agent instead of a shell per run_bash call.
+PERSISTENT_SHELL = os.getenv("AGENT_PERSISTENT_SHELL", "0") == "1"
 
 # Subagent Tool
 SUBAGENT_TOOL = {
@@ -26,127 +47,279 @@ SUBAGENT_TOOL = {
 }
 
 
-# Combine schemas for all tools
-ALL_TOOLS = FILE_TOOLS + SEARCH_TOOLS + [SUBAGENT_TOOL]
+# Tool modules are discovered by the registry and imported on first use.
+REGISTRY.register(SUBAGENT_TOOL, side_effect="subagent")
+ALL_TOOLS = REGISTRY.schemas()
+# Built once per process and shared by every agent that uses the full tool set.
+ALL_TOOLS_CACHED = prompt_cache.cached_tools(ALL_TOOLS)
+
+def ask_permission(tool_name, subject, risk):
+    """Prompt the user; the policy decides when this is needed."""
+    if not sys.stdin.isatty():
+        # Batch workers and other unattended runs: nobody can answer.
+        return "No one to ask in an unattended run; pre-approve with AGENT_SAFE_COMMANDS or AGENT_WRITE_SCOPES"
+    # Subagents may run in parallel; ask one question at a time.
+    with subagents.terminal():
+        if tool_name == "run_bash":
+            print(f"\n !!! Bash Command{f' ({risk})' if risk else ''}: {subject}")
+            return input("Allow? (y/n/reason): ")
+        print(f"\n📝 Writing/Editing: {subject}")
+        return input("Allow? (y/n/a = always for this directory): ")
+
+
+PERMISSIONS = PermissionPolicy(ask_permission)
+
 
 def check_permission(tool_name, tool_input):
+    with tracing.span("permission", "permission", tool=tool_name) as span:
+        allowed, reason = PERMISSIONS.check(tool_name, tool_input)
+        span.set(allowed=allowed)
+    return allowed, reason
 
-    if tool_name == "run_bash":
-        cmd = tool_input.get("command", "")
-        print(f"\n !!! Bash Command: {cmd}")
-        response = input("Allow? (y/n/reason): ").strip()
-        if response.lower() == "y":
-            return True, None
-        return False, response if response else "User denied permission"
-        
-    elif tool_name == "write_file":
-        path = tool_input.get("path", "")
-        print(f"\n📝 Writing/Editing: {path}")
-        response = input("Allow? (y/n): ").strip().lower()
-        if response == "y":
-            return True, None
-        return False, "User denied permission"
-        
-    return True, None
+# Past sessions; the most relevant ones are recalled into the system prompt.
+MEMORY = MemoryStore()
 
-HISTORY_FILE = "history.json"
 
-def load_summary():
-    """Load the summarized history from file."""
-    if os.path.exists(HISTORY_FILE):
-        try:
-            with open(HISTORY_FILE, "r") as f:
-                data = json.load(f)
-                return data.get("summary", "")
-        except Exception:
-            pass
-    return ""
+def system_prompt(task, cwd, depth=0):
+    prompt = SYSTEM_PROMPT.format(current_directory=cwd)
+    # Subagents get narrow, self-contained tasks; only the top level recalls.
+    # Recording and replaying leave memory out: a rerun would recall its own
+    # recorded session, change the prompt, and miss every replayed turn.
+    if depth == 0 and not replay_cache.active():
+        memories = MEMORY.recall(task)
+        if memories:
+            prompt += f"\n## Relevant Past Sessions\n{memories}\n"
+    return prompt
+
+
+def run_and_remember(task, **kwargs):
+    result = run_agent(task, **kwargs)
+    MEMORY.append(task, result)
+    return result
+
+
+
+def execute_tool_call(tool_name, tool_input, tools, max_turns, depth):
+    """Run a single tool call, including its permission check."""
+    with tracing.span(f"tool:{tool_name}", "tool", tool=tool_name, depth=depth,
+                      bytes_in=len(json.dumps(tool_input))) as span:
+        result = _execute_tool_call(tool_name, tool_input, tools, max_turns, depth)
+        span.set(bytes_out=len(result))
+        return result
+
+
+def _execute_tool_call(tool_name, tool_input, tools, max_turns, depth):
+    # An abandoned subagent may still finish its in-flight turn; it must not act on it.
+    if subagents.cancelled() and REGISTRY.side_effect(tool_name) != "read":
+        result = "Error: Subagent was cancelled after exceeding its time budget; tool not run."
+        print(f"   🚫 {result}")
+        return result
+
+    # Handle Subagent Delegation (already on its own thread, see tool_scheduler)
+    if tool_name == "delegate_subagent":
+        sub_task = tool_input["task"]
+        # Recursively call run_agent
+        result = run_agent(sub_task, tools, max_turns, depth + 1)
+        return f"Subagent Result: {result}"
+
+    allowed, reason = check_permission(tool_name, tool_input)
+    if not allowed:
+        result = f"Permission denied: {reason}"
+        print(f"   🚫 {result}")
+        return result
+
+    try:
+        return REGISTRY.execute(tool_name, tool_input)
+    except Exception as e:
+        return f"Error executing tool: {e}"
+
+
+def print_tool_result(block, result):
+    # Display truncation
+    display = result[:200] + "..." if len(result) > 200 else result
+    print(f"   → {display}")
+
 
-def save_summary(summary):
-    """Save the summarized history to file."""
-    with open(HISTORY_FILE, "w") as f:
-        json.dump({"summary": summary}, f, indent=2)
+def stream_response(client, request, execute, started):
+    """Stream one turn, printing text as it arrives.
+
+    Read-only tool calls at the start of the turn are dispatched as soon as
+    their block is complete, so they run while the rest of the response is
+    still being generated. Their futures are stored in `started`.
+    """
+    leading_reads = True
+    with client.messages.stream(**request) as stream:
+        for event in stream:
+            if event.type == "content_block_start" and event.content_block.type == "text":
+                print("\n🤖 ", end="", flush=True)
+            elif event.type == "text":
+                print(event.text, end="", flush=True)
+            elif event.type == "content_block_stop":
+                block = event.content_block
+                if block.type == "text":
+                    print()
+                elif block.type == "tool_use":
+                    # Anything after a side-effecting call must wait for it.
+                    leading_reads = leading_reads and is_read_only(block.name)
+                    if leading_reads:
+                        started[block.id] = start_early(execute, block)
+        return stream.get_final_message()
+
+
+def count_tokens_with_api(client, system, tools):
+    def count(messages):
+        return client.messages.count_tokens(
+            model=MODEL_NAME, system=system, tools=tools, messages=messages
+        ).input_tokens
+    return count
+
+
+def build_request(cached_system, cached_tools, messages):
+    return dict(
+        model=MODEL_NAME,
+        max_tokens=2048,
+        system=cached_system,
+        tools=cached_tools,
+        messages=prompt_cache.with_message_breakpoint(messages)
+    )
 
 
+def first_turn_request(task, cwd):
+    """The first request run_agent would send for `task` from `cwd` (for batching)."""
+    cached_system = prompt_cache.cached_system(system_prompt(task, cwd))
+    return build_request(cached_system, ALL_TOOLS_CACHED, [{"role": "user", "content": task}])
 
-def run_agent(task, tools=ALL_TOOLS, max_turns=10, depth=0):
+
+def run_agent(task, tools=ALL_TOOLS, max_turns=10, depth=0, first_response=None):
+    """Run `task` to completion; `first_response`, if given, answers the first turn."""
+    with tracing.span("agent", "agent", depth=depth, task=task[:200]):
+        if not PERSISTENT_SHELL:
+            return _run_agent(task, tools, max_turns, depth, first_response)
+        # Each agent and subagent keeps its own bash session.
+        from tools import shell_session
+        with shell_session.session_scope(enabled=True):
+            return _run_agent(task, tools, max_turns, depth, first_response)
+
+
+def _run_agent(task, tools, max_turns, depth, first_response=None):
     
     # track recursion depth to prevent infinite subagent loops. 
     if depth > 3:
         return "Error: Maximum subagent recursion depth reached."
           
-    api_key = os.getenv("ANTHROPIC_API_KEY")
-    client = Anthropic(api_key=api_key)
+    # One client (and connection pool) is shared by the agent and all subagents.
+    client = replay_cache.wrap(client_pool.get_client())
+    # Recorded sessions are stored per create() call, so they never stream.
+    streaming = STREAMING and not replay_cache.active()
     
-    formatted_system = SYSTEM_PROMPT.format(current_directory=os.getcwd())
+    formatted_system = system_prompt(task, os.getcwd(), depth)
+    # Tools and system prompt never change within a run; mark them cacheable once.
+    if tools is ALL_TOOLS:
+        cached_tools, tools_json = ALL_TOOLS_CACHED, REGISTRY.schemas_json()
+    else:
+        cached_tools, tools_json = prompt_cache.cached_tools(tools), json.dumps(tools)
+    cached_system = prompt_cache.cached_system(formatted_system)
     
     messages = [{"role": "user", "content": task}]
+    # File contents already sent in this conversation are referenced, not resent.
+    ledger = read_cache.ReadLedger()
+    compactor = ContextCompactor(
+        overhead_tokens=(len(formatted_system) + len(tools_json)) // CHARS_PER_TOKEN,
+        max_messages=MAX_HISTORY,
+        count_tokens=count_tokens_with_api(client, formatted_system, tools) if COUNT_TOKENS_WITH_API else None,
+        on_elide=ledger.forget,
+    )
     final_answer = "No answer provided"
     turn_count = 0
     
+    deadline = subagents.current_deadline() if depth > 0 else None
+
     while turn_count < max_turns:
+        if deadline is not None and time.monotonic() > deadline:
+            print("\n⏱️ Subagent time budget exhausted.")
+            return f"{final_answer} (stopped early: subagent time budget exhausted)"
         turn_count += 1
         try:
-            response = client.messages.create(
-                model=MODEL_NAME,
-                max_tokens=2048,
-                system=formatted_system,
-                tools=tools,
-                messages=messages
-            )
+            def execute(block):
+                return execute_tool_call(block.name, block.input, tools, max_turns, depth)
+
+            if compactor.compact(messages):
+                print(f"\n🗜️ Compacted context to ~{compactor.estimate(messages)} tokens")
+
+            request = build_request(cached_system, cached_tools, messages)
+            started = {}
+            attempts = []
+
+            def send():
+                if attempts:
+                    # A retried stream starts over. Stop the calls the failed
+                    # attempt started and wait out running ones, so none runs
+                    # twice at once when the new stream starts it again.
+                    from concurrent.futures import wait  # deferred: slow import, rare path
+                    for future in started.values():
+                        future.cancel()
+                    wait(started.values())
+                    started.clear()
+                    if streaming:
+                        print("\n↩️ Stream interrupted; the response restarts below.")
+                attempts.append(None)
+                if streaming:
+                    return stream_response(client, request, execute, started)
+                return client.messages.create(**request)
+
+            with tracing.span("messages.stream" if streaming else "messages.create", "api",
+                              depth=depth, turn=turn_count, model=MODEL_NAME) as span:
+                # Waits for rate-limit headroom (shallow agents first) and
+                # retries 429/529s instead of failing the whole run.
+                if turn_count == 1 and first_response is not None:
+                    # Answered ahead of time, e.g. by the Message Batches API.
+                    response, streamed = first_response, False
+                else:
+                    response = LIMITER.call(send, depth=depth, input_tokens=compactor.estimate(messages))
+                    streamed = streaming
+                if not streamed:
+                    # Print text content
+                    for block in response.content:
+                        if block.type == "text":
+                            print(f"\n🤖 {block.text}")
+                span.set(stop_reason=response.stop_reason, **tracing.usage_attributes(response.usage))
+            prompt_cache.SESSION_STATS.record(response.usage)
+            compactor.observe(response.usage)
             
             messages.append({"role": "assistant", "content": response.content})
             
-            # Print text content
             for block in response.content:
                 if block.type == "text":
-                    print(f"\n🤖 {block.text}")
                     final_answer = block.text
 
             if response.stop_reason != "tool_use":
                 return final_answer
 
-            # Process tool calls
+            # Process tool calls; independent reads run concurrently
+            tool_uses = [block for block in response.content if block.type == "tool_use"]
+            results = run_tool_calls(
+                tool_uses,
+                execute,
+                announce=lambda block: print(f"\n🔧 {block.name}: {json.dumps(block.input)}"),
+                on_done=print_tool_result,
+                started=started,
+            )
+
+            # Per-result and per-turn token budgets; oversized output is spilled.
+            results = result_shaping.shape_turn(results, [block.name for block in tool_uses])
+            # Deduped after shaping: the ledger must point at what the model
+            # actually saw, a spilled preview keeps its read_result handle.
+            results = [ledger.dedupe(block.input.get("path"), result, turn_count, block.id)
+                       if block.name == "read_file" else result
+                       for block, result in zip(tool_uses, results)]
+
             tool_results = []
-            for block in response.content:
-                if block.type == "tool_use":
-                    tool_name = block.name
-                    tool_input = block.input
-                    tool_id = block.id
-
-                    print(f"\n🔧 {tool_name}: {json.dumps(tool_input)}")
-
-                    # Handle Subagent Delegation
-                    if tool_name == "delegate_subagent":
-                        sub_task = tool_input["task"]
-                        # Recursively call run_agent
-                        result = run_agent(sub_task, tools, max_turns, depth + 1)
-                        result = f"Subagent Result: {result}"
-                    else:
-                        allowed, reason = check_permission(tool_name, tool_input)
-                        if not allowed:
-                            result = f"Permission denied: {reason}"
-                            print(f"   🚫 {result}")
-                        else:
-                            try:
-                                if any(t["name"] == tool_name for t in FILE_TOOLS):
-                                    result = exec_file_tool(tool_name, tool_input)
-                                elif any(t["name"] == tool_name for t in SEARCH_TOOLS):
-                                    result = exec_search_tool(tool_name, tool_input)
-                                else:
-                                    result = f"Error: Unknown tool {tool_name}"
-                            except Exception as e:
-                                result = f"Error executing tool: {e}"
-                    
-                    # Display truncation
-                    display = result[:200] + "..." if len(result) > 200 else result
-                    print(f"   → {display}")
-
-                    tool_results.append({
-                        "type": "tool_result",
-                        "tool_use_id": tool_id,
-                        "content": result
-                    })
+            for block, result in zip(tool_uses, results):
+                tool_results.append({
+                    "type": "tool_result",
+                    "tool_use_id": block.id,
+                    "content": result
+                })
 
             if tool_results:
                 messages.append({"role": "user", "content": tool_results})
@@ -160,27 +333,47 @@ def run_agent(task, tools=ALL_TOOLS, max_turns=10, depth=0):
     return final_answer
 
 def main():
-    load_dotenv()
+    if sys.argv[1:2] == ["--profile-startup"]:
+        import startup_profile
+        return startup_profile.main(os.path.abspath(__file__))
+
     api_key = os.getenv("ANTHROPIC_API_KEY")
     if not api_key:
         print("Error: ANTHROPIC_API_KEY not found. Please set it in .env or environment.")
         return 1
+
+    if sys.argv[1:2] == ["--batch"]:
+        import batch_runner
+        return batch_runner.main(sys.argv[2:], os.path.abspath(__file__), first_turn_request)
+    if sys.argv[1:2] == ["--batch-worker"]:
+        import batch_runner
+        with tracing.span("session", "session", batch_worker=True):
+            code = batch_runner.run_worker(sys.argv[2], sys.argv[3], run_and_remember)
+        tracing.flush()
+        return code
         
     # Get user prompt
     user_prompt = " ".join(sys.argv[1:]).strip()
     if not user_prompt:
         print('Usage: python agent-v3.py "your task"')
+        print('       python agent-v3.py --batch tasks.jsonl [--workers N] [--first-turn-batch]')
+        print('       python agent-v3.py --profile-startup')
         return 1
         
     # Start the main agent loop
-    result = run_agent(user_prompt)
-    
-    # Save a simple summary
-    current_summary = load_summary()
-    new_summary = f"{current_summary}\n- Task: {user_prompt}\n  Result: {result}\n"
-    save_summary(new_summary)
+    with tracing.span("session", "session", task=user_prompt[:200]):
+        run_and_remember(user_prompt)
+    tracing.flush()
     
-    print(f"\n✅ Session finished. History updated.")
+    print(f"\n✅ Session finished. Memory updated ({MEMORY.path}).")
+    print(f"🔌 HTTP: {client_pool.format_pool_stats()}")
+    print(f"💾 Prompt cache: {prompt_cache.SESSION_STATS.summary()}")
+    print(f"📚 Read cache: {read_cache.SESSION_STATS.summary()}")
+    print(f"✂️ Tool results: {result_shaping.SESSION_STATS.summary()}")
+    print(f"🔐 Permissions: {PERMISSIONS.summary()}")
+    print(f"🚦 Rate limits: {LIMITER.summary()}")
+    if replay_cache.summary():
+        print(f"📼 Replay: {replay_cache.summary()}")
 
 if __name__ == "__main__":
     sys.exit(main())
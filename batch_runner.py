@@ -0,0 +1,227 @@
+"""Run many independent agent tasks from a JSONL file (`agent-v3.py --batch`).
+
+    python agent-v3.py --batch tasks.jsonl [--workers 4] [--results FILE]
+                       [--out-dir DIR] [--timeout SEC] [--first-turn-batch]
+
+Each line of tasks.jsonl is an object with a "task" and optionally an "id",
+a "cwd" and "max_turns". Every task runs in its own agent-v3 process, at
+most --workers at a time, in its own working directory (its "cwd", or a
+fresh <out-dir>/<id>/ when none is given) with stdout and stderr going to
+<out-dir>/<id>.log. Writes inside that directory need no confirmation;
+anything else that would prompt is denied, since nobody is there to answer.
+
+Results are appended to the results file (default <tasks>.results.jsonl)
+as each task finishes. Running the same command again skips tasks whose
+result is already there with status "ok", so an interrupted batch resumes
+where it stopped and failed tasks are retried.
+
+With --first-turn-batch the first turn of every pending task is sent as
+one Message Batches API request (half price, but it can take up to a day)
+and each worker continues its conversation from that response. Tasks the
+batch did not answer start normally.
+
+Workers are separate processes, each with its own rate_limiter; they stay
+under the shared organization limits through the rate-limit headers every
+response carries. They all recall from and record into the memory store of
+the `--batch` process (AGENT_MEMORY_FILE, resolved to an absolute path).
+"""
+
+import argparse
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import time
+
+import memory_store
+
+TASK_TIMEOUT_SEC = float(os.getenv("AGENT_BATCH_TASK_TIMEOUT_SEC", "3600"))
+POLL_INTERVAL_SEC = float(os.getenv("AGENT_BATCH_POLL_SEC", "30"))
+DEFAULT_WORKERS = 4
+# Also the Message Batches custom_id format.
+_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def load_tasks(path):
+    tasks, seen = [], set()
+    with open(path, "r") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            task = json.loads(line)
+            if not isinstance(task, dict) or not task.get("task"):
+                raise ValueError(f"{path}:{number}: expected an object with a \"task\"")
+            task["id"] = str(task.get("id", f"task-{number}"))
+            if not _ID.match(task["id"]):
+                raise ValueError(f"{path}:{number}: id must be 1-64 letters, digits, '_' or '-'")
+            if task["id"] in seen:
+                raise ValueError(f"{path}:{number}: duplicate id {task['id']!r}")
+            seen.add(task["id"])
+            tasks.append(task)
+    return tasks
+
+
+def completed_ids(results_path):
+    done = set()
+    if not os.path.exists(results_path):
+        return done
+    with open(results_path, "r") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by an interrupted run
+            if record.get("status") == "ok":
+                done.add(record.get("id"))
+    return done
+
+
+def task_cwd(task, out_dir):
+    cwd = task.get("cwd") or os.path.join(out_dir, task["id"])
+    os.makedirs(cwd, exist_ok=True)
+    # Resolved the way os.getcwd() reports it inside the worker.
+    return os.path.realpath(cwd)
+
+
+def submit_first_turns(tasks, build_request, out_dir):
+    """{task id: first response} via one Message Batches API request."""
+    import client_pool
+    client = client_pool.get_client()
+    requests = [{"custom_id": task["id"],
+                 "params": build_request(task["task"], task_cwd(task, out_dir))} for task in tasks]
+    batch = client.messages.batches.create(requests=requests)
+    print(f"📦 Submitted first turns of {len(requests)} tasks as batch {batch.id}")
+    while batch.processing_status != "ended":
+        time.sleep(POLL_INTERVAL_SEC)
+        batch = client.messages.batches.retrieve(batch.id)
+        counts = batch.request_counts
+        print(f"   batch {batch.id}: {counts.processing} processing, {counts.succeeded} succeeded, "
+              f"{counts.errored} errored")
+    first = {}
+    for entry in client.messages.batches.results(batch.id):
+        if entry.result.type == "succeeded":
+            first[entry.custom_id] = entry.result.message.model_dump(mode="json")
+    return first
+
+
+def _kill_group(proc):
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    proc.wait()
+
+
+def run_task(task, agent_path, out_dir, timeout=TASK_TIMEOUT_SEC, first_response=None):
+    """Run one task in a worker process; returns its result record."""
+    cwd = task_cwd(task, out_dir)
+    base = os.path.join(out_dir, task["id"])
+    payload_path, result_path, log_path = base + ".task.json", base + ".result.json", base + ".log"
+    with open(payload_path, "w") as f:
+        json.dump(dict(task, first_response=first_response), f)
+    if os.path.exists(result_path):
+        os.unlink(result_path)
+
+    scopes = [s for s in (os.getenv("AGENT_WRITE_SCOPES", ""), cwd) if s]
+    env = dict(os.environ, AGENT_WRITE_SCOPES=os.pathsep.join(scopes),
+               AGENT_MEMORY_FILE=os.path.abspath(memory_store.MEMORY_FILE))
+    start = time.monotonic()
+    with open(log_path, "w") as log:
+        # Own session, so a timeout also kills the tools the agent started.
+        proc = subprocess.Popen([sys.executable, agent_path, "--batch-worker", payload_path, result_path],
+                                cwd=cwd, env=env, stdin=subprocess.DEVNULL, stdout=log,
+                                stderr=subprocess.STDOUT, start_new_session=True)
+        try:
+            exit_code = proc.wait(timeout)
+        except subprocess.TimeoutExpired:
+            _kill_group(proc)
+            exit_code = None
+    elapsed = time.monotonic() - start
+
+    record = {"id": task["id"], "task": task["task"], "cwd": cwd, "log": log_path,
+              "exit_code": exit_code, "elapsed_sec": round(elapsed, 3), "finished_at": time.time(),
+              "first_turn_batched": first_response is not None}
+    try:
+        with open(result_path, "r") as f:
+            record["result"] = json.load(f)["result"]
+        os.unlink(result_path)
+    except (OSError, ValueError, KeyError):
+        record["result"] = None
+    if exit_code is None:
+        record["status"] = "timeout"
+    elif exit_code != 0 or record["result"] is None or record["result"].startswith("Error:"):
+        record["status"] = "error"
+    else:
+        record["status"] = "ok"
+    os.unlink(payload_path)
+    return record
+
+
+def run_worker(payload_path, result_path, run_agent):
+    """Body of a worker process: run one task and write its result."""
+    with open(payload_path, "r") as f:
+        task = json.load(f)
+    first_response = task.get("first_response")
+    if first_response is not None:
+        from anthropic.types import Message
+        first_response = Message.model_validate(first_response)
+    kwargs = {"max_turns": task["max_turns"]} if task.get("max_turns") else {}
+    result = run_agent(task["task"], first_response=first_response, **kwargs)
+    with open(result_path, "w") as f:
+        json.dump({"result": result}, f)
+    return 0
+
+
+def run_batch(tasks_path, agent_path, workers=DEFAULT_WORKERS, results_path=None, out_dir=None,
+              timeout=TASK_TIMEOUT_SEC, first_turn_batch=False, build_request=None):
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    results_path = results_path or os.path.splitext(tasks_path)[0] + ".results.jsonl"
+    out_dir = os.path.abspath(out_dir or os.path.splitext(tasks_path)[0] + ".runs")
+    os.makedirs(out_dir, exist_ok=True)
+
+    tasks = load_tasks(tasks_path)
+    done = completed_ids(results_path)
+    pending = [task for task in tasks if task["id"] not in done]
+    print(f"🗂️ {len(tasks)} tasks, {len(tasks) - len(pending)} already done, {len(pending)} to run "
+          f"on {workers} workers")
+    if not pending:
+        return 0
+
+    first = submit_first_turns(pending, build_request, out_dir) if first_turn_batch else {}
+
+    counts = {}
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as pool, open(results_path, "a") as results:
+        futures = [pool.submit(run_task, task, agent_path, out_dir, timeout, first.get(task["id"]))
+                   for task in pending]
+        for finished, future in enumerate(as_completed(futures), 1):
+            record = future.result()
+            results.write(json.dumps(record) + "\n")
+            results.flush()
+            counts[record["status"]] = counts.get(record["status"], 0) + 1
+            print(f"[{finished}/{len(pending)}] {record['status']:<7} {record['id']} "
+                  f"({record['elapsed_sec']:.1f}s)")
+    summary = ", ".join(f"{n} {status}" for status, n in sorted(counts.items()))
+    print(f"\n✅ Batch finished in {time.monotonic() - start:.1f}s: {summary}. Results: {results_path}")
+    return 0 if counts.get("ok", 0) == len(pending) else 1
+
+
+def main(argv, agent_path, build_request):
+    parser = argparse.ArgumentParser(prog="agent-v3.py --batch", description=__doc__.split("\n")[0])
+    parser.add_argument("tasks")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--results", help="results JSONL (default: <tasks>.results.jsonl)")
+    parser.add_argument("--out-dir", help="working directories and logs (default: <tasks>.runs/)")
+    parser.add_argument("--timeout", type=float, default=TASK_TIMEOUT_SEC, help="seconds per task")
+    parser.add_argument("--first-turn-batch", action="store_true",
+                        help="send first turns through the Message Batches API")
+    args = parser.parse_args(argv)
+    try:
+        return run_batch(args.tasks, agent_path, args.workers, args.results, args.out_dir,
+                         args.timeout, args.first_turn_batch, build_request)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
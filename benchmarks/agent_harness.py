@@ -0,0 +1,47 @@
+"""Helpers for driving agent-v3's `run_agent` against the mock API."""
+
+import importlib.util
+import json
+import os
+import threading
+
+from benchmarks.mock_api import text_message, tool_use_message
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(REPO_ROOT, "benchmarks", "fixtures")
+
+
+def load_agent(base_url):
+    """Import agent-v3.py (not a valid module name) pointed at `base_url`."""
+    os.environ["ANTHROPIC_BASE_URL"] = base_url
+    os.environ.setdefault("ANTHROPIC_API_KEY", "mock-key")
+    spec = importlib.util.spec_from_file_location("agent_v3", os.path.join(REPO_ROOT, "agent-v3.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name)) as f:
+        return json.load(f)
+
+
+def scripted_responder(turns):
+    """Responder that plays back `turns` in order, then answers "done".
+
+    Each turn is {"tool_calls": [[name, input], ...]} or {"text": "..."},
+    with optional "input_tokens"/"output_tokens".
+    """
+    lock = threading.Lock()
+    position = iter(turns)
+
+    def respond(body):
+        with lock:
+            turn = next(position, {"text": "done"})
+        usage = {k: turn[k] for k in ("input_tokens", "output_tokens") if k in turn}
+        if turn.get("tool_calls"):
+            return tool_use_message([tuple(call) for call in turn["tool_calls"]],
+                                    text=turn.get("text"), **usage)
+        return text_message(turn.get("text", "done"), **usage)
+
+    return respond
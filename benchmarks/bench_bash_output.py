@@ -0,0 +1,45 @@
+"""Peak memory of run_bash on a very noisy command.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_bash_output [megabytes]
+
+Runs a command that prints `megabytes` MB (200 by default) once with
+subprocess.run(capture_output=True), the way run_bash used to, and once
+through tools.bash_runner. Peak Python allocations are measured with
+tracemalloc; the runner's peak should not grow with the output size.
+"""
+
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from tools import bash_runner
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    command = f"yes 'building target, all good' | head -c {megabytes * (1 << 20)}"
+
+    old, old_time, old_peak = measure(lambda: subprocess.run(
+        command, shell=True, capture_output=True, text=True).stdout)
+    new, new_time, new_peak = measure(lambda: bash_runner.run_command(command, timeout=600).format())
+
+    print(f"{'runner':<16}{'peak MB':>9}{'time':>8}{'result chars':>15}")
+    print(f"{'subprocess.run':<16}{old_peak / (1 << 20):>9.1f}{old_time:>7.2f}s{len(old):>15,}")
+    print(f"{'bash_runner':<16}{new_peak / (1 << 20):>9.1f}{new_time:>7.2f}s{len(new):>15,}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
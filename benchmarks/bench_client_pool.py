@@ -0,0 +1,69 @@
+"""Handshake savings of the shared client on a deep delegation tree.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_client_pool [depth] [fanout] [turns]
+
+Replays the request pattern of an agent that delegates `fanout` subagents
+per level down to `depth`, each making `turns` Messages API calls, against
+the local mock server. "per-agent" builds a new client for every agent, as
+run_agent used to; "shared" uses one pooled client for all of them. The
+mock delays every new connection to stand in for TCP/TLS handshakes.
+"""
+
+import sys
+import time
+
+from benchmarks.mock_api import MockAPI
+
+CONNECT_LATENCY_SEC = 0.05
+REQUEST = {
+    "model": "mock-model",
+    "max_tokens": 16,
+    "messages": [{"role": "user", "content": "hi"}],
+}
+
+
+def run_tree(get_client, depth, fanout, turns):
+    client = get_client()
+    for _ in range(turns):
+        client.messages.create(**REQUEST)
+    if depth > 0:
+        for _ in range(fanout):
+            run_tree(get_client, depth - 1, fanout, turns)
+
+
+def measure(name, make_get_client, depth, fanout, turns):
+    with MockAPI(connect_latency=CONNECT_LATENCY_SEC) as api:
+        get_client = make_get_client(api.url)
+        start = time.perf_counter()
+        run_tree(get_client, depth, fanout, turns)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<10}{api.stats['requests']:>9}{api.stats['connections']:>13}{elapsed:>9.2f}s")
+
+
+def main():
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    fanout = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    turns = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    from anthropic import Anthropic
+    import client_pool
+
+    def per_agent(url):
+        return lambda: Anthropic(api_key="test", base_url=url)
+
+    def shared(url):
+        client = client_pool.create_client(api_key="test", base_url=url)
+        return lambda: client
+
+    print(f"depth={depth} fanout={fanout} turns={turns}, "
+          f"{CONNECT_LATENCY_SEC * 1000:.0f} ms per new connection")
+    print(f"{'client':<10}{'requests':>9}{'connections':>13}{'time':>10}")
+    measure("per-agent", per_agent, depth, fanout, turns)
+    measure("shared", shared, depth, fanout, turns)
+    print(f"shared pool stats: {client_pool.format_pool_stats()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""Repeated glob latency: glob.glob vs the walker with and without the snapshot.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_glob [num_files] [rounds]
+
+Each round issues the same handful of patterns, like a model exploring a
+tree. The snapshot pays for one full listing in the first round and a
+stat() per directory afterwards.
+"""
+
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_grep_index import generate_tree
+from tools import tree_snapshot
+from tools.search_codebase import glob_files
+
+PATTERNS = ["**/*.py", "pkg00*/**/*.py", "**/mod1*.py", "**/*.md"]
+
+
+def run(fn, rounds):
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for pattern in PATTERNS:
+            fn(pattern)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    num_files = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    workdir = tempfile.mkdtemp(prefix="glob-bench-")
+    cwd = os.getcwd()
+    try:
+        generate_tree(workdir, num_files)
+        os.chdir(workdir)
+
+        def uncached(pattern):
+            return glob_files(pattern, snapshot=None)
+
+        tree_snapshot.SNAPSHOT.clear()
+        results = {
+            "glob.glob": run(lambda p: glob.glob(p, recursive=True), rounds),
+            "walker": run(uncached, rounds),
+            "snapshot": run(glob_files, rounds),
+        }
+        print(f"{num_files} files, {len(PATTERNS)} patterns per round")
+        print(f"{'engine':<12}{'first round':>13}{'later rounds (avg)':>21}")
+        for name, timings in results.items():
+            later = sum(timings[1:]) / max(len(timings) - 1, 1)
+            print(f"{name:<12}{timings[0]:>12.3f}s{later:>20.3f}s")
+        snap = tree_snapshot.SNAPSHOT
+        print(f"snapshot listings: {snap.hits} hits, {snap.misses} misses")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
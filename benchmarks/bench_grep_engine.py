@@ -0,0 +1,58 @@
+"""Compare the parallel grep engine with a serial full scan.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_grep_engine [num_files]
+
+Runs a common pattern (where early termination dominates) and a rare one
+(where the whole tree must be scanned and the pool's parallelism matters)
+over a generated tree, without the trigram index in the way.
+"""
+
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_grep_index import brute_force, generate_tree
+from tools import grep_engine
+from tools.walker import walk_files
+
+PATTERNS = [
+    ("common", r"return config\.get"),
+    ("rare", r"needle_[0-9]+"),
+    ("none", r"no such (thing|symbol)"),
+]
+
+
+def walk(path):
+    return (entry.path for entry in walk_files(path))
+
+
+def main():
+    num_files = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    workdir = tempfile.mkdtemp(prefix="grep-engine-bench-")
+    try:
+        generate_tree(workdir, num_files)
+        print(f"{num_files} files, {grep_engine.WORKERS} workers")
+        print(f"{'case':<8}{'serial':>10}{'engine':>10}{'speedup':>10}")
+        for name, pattern in PATTERNS:
+            start = time.perf_counter()
+            expected = brute_force(pattern, workdir)
+            slow = time.perf_counter() - start
+
+            start = time.perf_counter()
+            results = grep_engine.search(pattern, walk(workdir))
+            fast = time.perf_counter() - start
+
+            actual = "\n".join(results) if results else "No matches found."
+            if actual != expected:
+                print(f"MISMATCH for {pattern!r}")
+                return 1
+            print(f"{name:<8}{slow:>9.2f}s{fast:>9.2f}s{slow / fast:>9.1f}x")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""Compare the trigram-indexed grep against a brute-force scan.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_grep_index [num_files]
+
+Generates a tree of `num_files` small source files (default 100000), then
+times a brute-force scan, the first indexed grep (which builds the index),
+and warm indexed greps. Every indexed result is checked against the
+brute-force output.
+"""
+
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+from tools.walker import open_text, walk_files
+
+WORDS = [
+    "alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel",
+    "india", "juliet", "kilo", "lima", "mike", "november", "oscar", "papa",
+    "render", "parse", "config", "handler", "request", "session", "cache",
+]
+PATTERNS = [
+    r"def render_handler",
+    r"class Session\w*",
+    r"needle_[0-9]+",
+    r"config\.(get|set)",
+    r"^import os$",
+]
+
+
+def generate_tree(root, num_files, seed=0):
+    rng = random.Random(seed)
+    per_dir = 200
+    for i in range(num_files):
+        d = os.path.join(root, f"pkg{i // per_dir:04d}")
+        if i % per_dir == 0:
+            os.makedirs(d, exist_ok=True)
+        lines = []
+        for _ in range(rng.randint(5, 30)):
+            a, b = rng.choice(WORDS), rng.choice(WORDS)
+            lines.append(f"def {a}_{b}(x):\n    return config.get('{b}')\n")
+        if rng.random() < 0.001:
+            lines.append(f"needle_{i} = True\n")
+        if rng.random() < 0.01:
+            lines.append("class SessionManager:\n    pass\n")
+        with open(os.path.join(d, f"mod{i}.py"), "w") as f:
+            f.writelines(lines)
+
+
+def brute_force(pattern, path):
+    """Scan every file the walker yields, serially and without the index."""
+    results = []
+    for entry in walk_files(path):
+        try:
+            f = open_text(entry.path)
+            if f is None:
+                continue
+            with f:
+                for i, line in enumerate(f, 1):
+                    if re.search(pattern, line):
+                        results.append(f"{entry.path}:{i}: {line.strip()}")
+        except Exception:
+            continue
+    return "\n".join(results[:100]) if results else "No matches found."
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - start
+
+
+def main():
+    num_files = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    workdir = tempfile.mkdtemp(prefix="grep-bench-")
+    os.environ["AGENT_INDEX_DIR"] = os.path.join(workdir, "index")
+    tree = os.path.join(workdir, "tree")
+    try:
+        print(f"Generating {num_files} files in {tree} ...")
+        generate_tree(tree, num_files)
+
+        # Import after AGENT_INDEX_DIR is set so the index lands in workdir.
+        from tools.search_codebase import execute_tool
+
+        def indexed(pattern, path):
+            return execute_tool("grep", {"pattern": pattern, "path": path})
+
+        _, build = timed(indexed, PATTERNS[0], tree)
+        print(f"index build (first grep): {build:.2f}s")
+        print(f"{'pattern':<24}{'brute force':>14}{'indexed':>12}{'speedup':>10}")
+        for pattern in PATTERNS:
+            expected, slow = timed(brute_force, pattern, tree)
+            actual, fast = timed(indexed, pattern, tree)
+            if actual != expected:
+                print(f"MISMATCH for {pattern!r}")
+                return 1
+            print(f"{pattern:<24}{slow:>13.2f}s{fast:>11.2f}s{slow / fast:>9.1f}x")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+"""Per-turn prompt-cache accounting over a scripted ten-turn session.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_prompt_cache
+
+Runs `run_agent` against the mock API, which plays back
+fixtures/ten_turn_session.json and reports cache reads/writes for the
+breakpoints it sees. Full-price input (fresh + cache writes) should stay
+roughly flat while the cached prefix grows. Exits non-zero if any turn
+after the first misses the cache.
+"""
+
+import sys
+
+from benchmarks.agent_harness import load_agent, load_fixture, scripted_responder
+from benchmarks.mock_api import MockAPI
+
+
+def main():
+    turns = load_fixture("ten_turn_session.json")["turns"]
+    with MockAPI(scripted_responder(turns), simulate_prompt_cache=True) as api:
+        agent = load_agent(api.url)
+        agent.run_agent("Analyze the tools directory and summarize the capabilities",
+                        max_turns=len(turns))
+        usage_log = list(api.usage_log)
+
+    print(f"\n{'turn':>4}{'fresh':>9}{'cache read':>12}{'cache write':>13}")
+    for i, usage in enumerate(usage_log, 1):
+        print(f"{i:>4}{usage['input_tokens']:>9}{usage['cache_read_input_tokens']:>12}"
+              f"{usage['cache_creation_input_tokens']:>13}")
+    if not all(u["cache_read_input_tokens"] for u in usage_log[1:]):
+        print("FAIL: some turns did not read the cached prefix")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""Throughput of parallel agents under a rate limit, with and without rate_limiter.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_rate_limit [agents] [turns] [requests_per_window]
+
+Starts `agents` threads at mixed depths (one top-level agent, the rest
+subagents two and three levels down), each making `turns` sequential
+Messages API calls, against the mock server limited to
+`requests_per_window` requests and 40k input tokens per 2 s window.
+"sdk" is a plain client with the SDK's default retries, where an agent
+dies at its first unretried error, as agent-v3 used to. "scheduled" sends
+every call through rate_limiter with SDK retries off. "streamed" does the
+same with streaming requests while the mock breaks off STREAM_ERROR_RATE of
+the streams with a mid-stream `event: error`. Reported: calls completed,
+agents that died, 429s the server sent, wall time, and when the average
+agent at each depth finished.
+"""
+
+import sys
+import threading
+import time
+
+from benchmarks.mock_api import MockAPI
+
+WINDOW_SEC = 2.0
+INPUT_TOKENS_LIMIT = 40_000
+LATENCY_SEC = 0.02
+STREAM_ERROR_RATE = 0.2
+PROMPT = "Summarize the module below.\n" + "def handler(event):\n    return event\n" * 150
+
+
+def request(depth, turn):
+    return {"model": "mock-model", "max_tokens": 64,
+            "messages": [{"role": "user", "content": f"depth {depth} turn {turn}\n{PROMPT}"}]}
+
+
+def run(name, send, agents, turns, limit, **mock_options):
+    depths = [0] + [1 + i % 3 for i in range(agents - 1)]
+    lock = threading.Lock()
+    results = {"calls": 0, "died": 0, "finished": {}}
+
+    def agent(depth):
+        for turn in range(turns):
+            try:
+                send(depth, request(depth, turn))
+            except Exception:
+                with lock:
+                    results["died"] += 1
+                return
+            with lock:
+                results["calls"] += 1
+        with lock:
+            results["finished"].setdefault(depth, []).append(time.perf_counter() - start)
+
+    with MockAPI(latency=LATENCY_SEC, requests_limit=limit, input_tokens_limit=INPUT_TOKENS_LIMIT,
+                 window_sec=WINDOW_SEC, **mock_options) as api:
+        send.connect(api.url)
+        threads = [threading.Thread(target=agent, args=(d,)) for d in depths]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        limited = api.stats["rate_limited"]
+    finished = "  ".join(f"d{d}:{sum(v) / len(v):.1f}s" for d, v in sorted(results["finished"].items()))
+    print(f"{name:<10}{results['calls']:>7}/{agents * turns:<6}{results['died']:>6}{limited:>7}"
+          f"{elapsed:>8.1f}s{results['calls'] / elapsed:>8.1f}/s   {finished}")
+
+
+class SdkSender:
+    def connect(self, url):
+        from anthropic import Anthropic
+        self.client = Anthropic(api_key="test", base_url=url)
+
+    def __call__(self, depth, body):
+        return self.client.messages.create(**body)
+
+
+class ScheduledSender:
+    def __init__(self):
+        import rate_limiter
+        # Same window as the mock, so buckets refill at the mock's rate.
+        rate_limiter.LIMITER = self.limiter = rate_limiter.RateLimiter(
+            window_sec=WINDOW_SEC, backoff_base=0.25)
+
+    def connect(self, url):
+        import client_pool
+        self.client = client_pool.create_client(api_key="test", base_url=url)
+
+    def __call__(self, depth, body):
+        return self.limiter.call(lambda: self.send(body), depth=depth,
+                                 input_tokens=len(body["messages"][0]["content"]) // 4)
+
+    def send(self, body):
+        return self.client.messages.create(**body)
+
+
+class StreamedSender(ScheduledSender):
+    def send(self, body):
+        with self.client.messages.stream(**body) as stream:
+            for _ in stream:
+                pass
+            return stream.get_final_message()
+
+
+def main():
+    agents = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+    turns = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    limit = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+
+    print(f"{agents} agents x {turns} turns, limit {limit} requests / "
+          f"{INPUT_TOKENS_LIMIT:,} input tokens per {WINDOW_SEC:.0f}s")
+    print(f"{'client':<10}{'calls':>13}{'died':>6}{'429s':>7}{'wall':>9}{'rate':>10}   finished by depth")
+    run("sdk", SdkSender(), agents, turns, limit)
+    scheduled = ScheduledSender()
+    run("scheduled", scheduled, agents, turns, limit)
+    print(f"scheduled: {scheduled.limiter.summary()}")
+    streamed = StreamedSender()
+    run("streamed", streamed, agents, turns, limit, stream_error_rate=STREAM_ERROR_RATE)
+    print(f"streamed:  {streamed.limiter.summary()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
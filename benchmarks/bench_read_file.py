@@ -0,0 +1,80 @@
+"""Paging through a very large file with read_file.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_read_file [size_mb]
+
+Writes a log-like file (2 GB by default), then reads 200-line pages at
+random line offsets through `read_file`. The first read builds the sparse
+line index; later reads should take about the same time wherever the page
+is. For comparison, a few pages are also read the naive way, by iterating
+lines from the start of the file.
+"""
+
+import itertools
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from tools import line_index
+from tools.file_tools import read_file
+
+PAGE_LINES = 200
+PAGES = 50
+NAIVE_PAGES = 3
+
+
+def generate_log(path, size_mb):
+    line = "2024-01-01T00:00:00Z INFO worker-{:04d} processed request id={:010d}\n"
+    block = "".join(line.format(i % 64, i) for i in range(10_000)).encode()
+    with open(path, "wb") as f:
+        for _ in range(size_mb * (1 << 20) // len(block) + 1):
+            f.write(block)
+
+
+def naive_page(path, offset):
+    with open(path, "r") as f:
+        return "".join(itertools.islice(f, offset - 1, offset - 1 + PAGE_LINES))
+
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 2048
+    workdir = tempfile.mkdtemp(prefix="read-bench-")
+    path = os.path.join(workdir, "big.log")
+    try:
+        generate_log(path, size_mb)
+        size = os.path.getsize(path)
+
+        start = time.perf_counter()
+        header = read_file(path).split("\n", 1)[0]
+        first = time.perf_counter() - start
+        total = line_index.read_lines(path, 1, 0)[3]
+        print(f"file: {size / (1 << 20):,.0f} MB, {total:,} lines")
+        print(f"first read (builds index): {first * 1000:8.1f} ms  {header}")
+
+        rng = random.Random(0)
+        offsets = [rng.randint(1, total - PAGE_LINES) for _ in range(PAGES)]
+        timings = []
+        for offset in offsets:
+            start = time.perf_counter()
+            read_file(path, offset=offset, limit=PAGE_LINES)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        print(f"random pages (indexed):    {timings[len(timings) // 2] * 1000:8.2f} ms median, "
+              f"{timings[-1] * 1000:.2f} ms max")
+
+        naive = []
+        for offset in offsets[:NAIVE_PAGES]:
+            start = time.perf_counter()
+            naive_page(path, offset)
+            naive.append(time.perf_counter() - start)
+        print(f"random pages (naive):      {sum(naive) / len(naive) * 1000:8.1f} ms mean")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
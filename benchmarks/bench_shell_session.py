@@ -0,0 +1,45 @@
+"""Per-command latency of run_bash: one shell per call vs. a persistent session.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_shell_session [commands]
+
+Runs the same short commands (200 by default) through bash_runner, which
+spawns a shell for every call, and through one ShellSession.
+"""
+
+import sys
+import time
+
+from tools import bash_runner
+from tools.shell_session import ShellSession
+
+COMMANDS = ["true", "echo hello", "pwd", "ls > /dev/null", "git --version"]
+
+
+def timed(run, count):
+    timings = []
+    for i in range(count):
+        start = time.perf_counter()
+        run(COMMANDS[i % len(COMMANDS)])
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2], sum(timings) / len(timings), timings[int(len(timings) * 0.95)]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    session = ShellSession()
+    session.run("true")  # exclude shell startup from the session numbers
+    rows = [
+        ("spawn per call", timed(bash_runner.run_command, count)),
+        ("persistent", timed(session.run, count)),
+    ]
+    session.close()
+    print(f"{'mode':<16}{'median':>10}{'mean':>10}{'p95':>10}")
+    for name, (median, mean, p95) in rows:
+        print(f"{name:<16}{median * 1000:>8.2f}ms{mean * 1000:>8.2f}ms{p95 * 1000:>8.2f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+"""Cold-start import time of agent-v3.py, with a regression threshold.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_startup [budget_ms]
+
+Imports agent-v3.py in a fresh interpreter several times and takes the
+fastest run. Exits non-zero if that exceeds the budget (default 150 ms,
+or AGENT_STARTUP_BUDGET_MS), and prints the importtime breakdown so the
+offending import is easy to find. anthropic and the tool modules are
+imported on first use, so they are not part of this number.
+"""
+
+import os
+import sys
+
+import startup_profile
+from benchmarks.agent_harness import REPO_ROOT
+
+RUNS = 5
+
+
+def main():
+    budget_ms = float(sys.argv[1]) if len(sys.argv) > 1 else float(
+        os.getenv("AGENT_STARTUP_BUDGET_MS", "150"))
+    agent_path = os.path.join(REPO_ROOT, "agent-v3.py")
+    runs = [startup_profile.profile(agent_path, agent_only=True) for _ in range(RUNS)]
+    phases, imports = min(runs, key=lambda run: run[0]["agent"])
+    best_ms = phases["agent"] * 1000
+
+    print(startup_profile.format_report(phases, imports, top_n=10))
+    print(f"\nimport agent-v3.py: {best_ms:.1f} ms (best of {RUNS}), budget {budget_ms:.0f} ms")
+    if best_ms > budget_ms:
+        print("FAIL: startup import time is over budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""Time-to-first-output and turn latency, streaming vs. non-streaming.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_streaming [num_files]
+
+The mock API streams a turn that says a few sentences, then issues two
+greps over a generated tree, then keeps talking. With streaming, text shows
+up as soon as the first delta arrives and the greps run while the rest of
+the turn is still being generated.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.agent_harness import load_agent, scripted_responder
+from benchmarks.bench_grep_index import generate_tree
+from benchmarks.mock_api import MockAPI
+
+CHUNK_LATENCY_SEC = 0.02
+FIRST_BYTE_LATENCY_SEC = 0.3
+
+
+class _FirstWrite:
+    """stdout wrapper that remembers when the first output appeared."""
+
+    def __init__(self, real):
+        self.real = real
+        self.first = None
+
+    def write(self, text):
+        if self.first is None and text.strip():
+            self.first = time.perf_counter()
+        return self.real.write(text)
+
+    def __getattr__(self, name):
+        return getattr(self.real, name)
+
+
+def session(tree):
+    # No literal run, so the trigram index cannot shortcut these greps.
+    grep = ["grep", {"pattern": r"[0-9]{6}", "path": tree}]
+    return [
+        {"text": "Let me search the tree for six-digit numbers. " * 4,
+         "tool_calls": [grep, grep]},
+        {"text": "Done. " * 40},
+    ]
+
+
+def measure(agent, api, tree, streaming):
+    agent.STREAMING = streaming
+    api.responder = scripted_responder(session(tree))
+    out = _FirstWrite(sys.stdout)
+    sys.stdout = out
+    start = time.perf_counter()
+    try:
+        agent.run_agent("find numbers", max_turns=3)
+    finally:
+        sys.stdout = out.real
+    total = time.perf_counter() - start
+    return (out.first or start) - start, total
+
+
+def main():
+    num_files = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    workdir = tempfile.mkdtemp(prefix="stream-bench-")
+    os.environ["AGENT_INDEX_DIR"] = os.path.join(workdir, "index")
+    tree = os.path.join(workdir, "tree")
+    try:
+        generate_tree(tree, num_files)
+        with MockAPI(latency=FIRST_BYTE_LATENCY_SEC, chunk_latency=CHUNK_LATENCY_SEC) as api:
+            agent = load_agent(api.url)
+            rows = [(name, *measure(agent, api, tree, streaming))
+                    for name, streaming in (("blocking", False), ("streaming", True))]
+        print(f"\n{'mode':<11}{'first output':>14}{'session':>10}")
+        for name, first, total in rows:
+            print(f"{name:<11}{first:>13.2f}s{total:>9.2f}s")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""Offline end-to-end benchmarks of `run_agent` against the mock API.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_suite [--only a,b] [--scale 1.0]
+                                     [--latency 0.05] [--output results.json]
+
+Scenarios:
+    deep_delegation   every agent delegates two subagents, three levels deep
+    many_greps        turns with a dozen greps each over a generated tree
+    large_reads       paging through a large log plus whole-file reads
+    long_session      a long read/grep session that triggers compaction
+
+Each scenario builds its fixtures, starts a MockAPI scripted for it, and
+runs agent-v3 in a fresh child process, so peak RSS and imports are not
+shared between scenarios. Reported per scenario: wall time, API turn
+latency (request to final message, as seen by the agent), tool time
+(excluding delegate_subagent, which contains whole subagent runs), bytes
+the agent sent and received, and the child's peak RSS. Results are written
+as JSON together with the git commit, so runs can be compared across
+commits. `--scale` grows or shrinks the fixtures and session lengths.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.agent_harness import REPO_ROOT, load_agent, scripted_responder
+from benchmarks.bench_grep_index import PATTERNS, generate_tree
+from benchmarks.bench_read_file import generate_log
+from benchmarks.mock_api import MockAPI, text_message, tool_use_message
+
+CHUNK_LATENCY_SEC = 0.002
+CHILD_TIMEOUT_SEC = 1800
+
+
+def deep_delegation(workdir, scale):
+    depth, fanout = 3, 2
+
+    def respond(body):
+        messages = body["messages"]
+        task = messages[0]["content"]
+        level = int(task.rsplit(" ", 1)[1]) if isinstance(task, str) and task.startswith("level ") else 0
+        if len(messages) == 1 and level < depth:
+            call = ("delegate_subagent", {"task": f"level {level + 1}"})
+            return tool_use_message([call] * fanout, text=f"Splitting level {level}.")
+        return text_message(f"Finished level {level}.")
+
+    return "level 0", respond, 3
+
+
+def many_greps(workdir, scale):
+    tree = os.path.join(workdir, "tree")
+    generate_tree(tree, int(5000 * scale))
+    calls = [["grep", {"pattern": p, "path": tree}] for p in PATTERNS] * 2
+    calls += [["glob", {"pattern": os.path.join(tree, "pkg000*", "*.py")}]] * 2
+    turns = [{"tool_calls": calls}] * max(1, int(5 * scale))
+    return "search the tree", scripted_responder(turns), len(turns) + 1
+
+
+def large_reads(workdir, scale):
+    log = os.path.join(workdir, "big.log")
+    generate_log(log, max(1, int(256 * scale)))
+    sources = [os.path.join(REPO_ROOT, name) for name in ("agent-v3.py", "README.md", "prompts.py")]
+    turns = []
+    for i in range(max(1, int(10 * scale))):
+        calls = [["read_file", {"path": log, "offset": 1 + i * 400_000 + k * 50_000, "limit": 200}]
+                 for k in range(4)]
+        calls.append(["read_file", {"path": sources[i % len(sources)]}])
+        turns.append({"tool_calls": calls})
+    turns.append({"tool_calls": [["read_file", {"path": log}]]})
+    return "read the log", scripted_responder(turns), len(turns) + 1
+
+
+def long_session(workdir, scale):
+    tree = os.path.join(workdir, "tree")
+    generate_tree(tree, 500)
+    files = sorted(os.path.join(root, name) for root, _, names in os.walk(tree) for name in names)
+    turns = []
+    for i in range(max(1, int(120 * scale))):
+        calls = [["read_file", {"path": files[(i * 7) % len(files)]}]]
+        if i % 3 == 0:
+            calls.append(["grep", {"pattern": PATTERNS[i % len(PATTERNS)], "path": tree}])
+        turns.append({"text": f"Step {i}: checking another module.", "tool_calls": calls})
+    return "walk through every module", scripted_responder(turns), len(turns) + 1
+
+
+SCENARIOS = {
+    "deep_delegation": deep_delegation,
+    "many_greps": many_greps,
+    "large_reads": large_reads,
+    "long_session": long_session,
+}
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_child(task, max_turns, result_path):
+    """Child process: run the agent once and write its measurements."""
+    agent = load_agent(os.environ["ANTHROPIC_BASE_URL"])
+    lock = threading.Lock()
+    turn_latency, tool_time = [], []
+
+    def timed(func, sink, skip=None):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                if skip is None or not skip(*args):
+                    with lock:
+                        sink.append(time.perf_counter() - start)
+        return wrapper
+
+    agent.execute_tool_call = timed(agent.execute_tool_call, tool_time,
+                                    skip=lambda name, *_: name == "delegate_subagent")
+    if agent.STREAMING:
+        agent.stream_response = timed(agent.stream_response, turn_latency)
+    else:
+        messages = agent.client_pool.get_client().messages
+        messages.create = timed(messages.create, turn_latency)
+
+    start = time.perf_counter()
+    agent.run_agent(task, max_turns=max_turns)
+    wall = time.perf_counter() - start
+    with open(result_path, "w") as f:
+        json.dump({
+            "wall_sec": wall,
+            "turns": len(turn_latency),
+            "turn_latency_sec": {"mean": sum(turn_latency) / max(1, len(turn_latency)),
+                                 "p50": percentile(turn_latency, 0.5),
+                                 "p95": percentile(turn_latency, 0.95),
+                                 "max": max(turn_latency, default=0.0)},
+            "tool_calls": len(tool_time),
+            "tool_time_sec": sum(tool_time),
+            # ru_maxrss is in KiB on Linux, bytes on macOS.
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                           / (1 << 20 if sys.platform == "darwin" else 1 << 10),
+        }, f)
+
+
+def run_scenario(name, scale, latency):
+    workdir = tempfile.mkdtemp(prefix=f"suite-{name}-")
+    try:
+        task, responder, max_turns = SCENARIOS[name](workdir, scale)
+        result_path = os.path.join(workdir, "result.json")
+        env = dict(os.environ,
+                   AGENT_INDEX_DIR=os.path.join(workdir, "index"),
+                   AGENT_PERMISSION_LOG="",
+                   ANTHROPIC_API_KEY="mock-key")
+        with MockAPI(responder, latency=latency, chunk_latency=CHUNK_LATENCY_SEC) as api:
+            env["ANTHROPIC_BASE_URL"] = api.url
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_suite", "--child", task,
+                 "--max-turns", str(max_turns), "--result", result_path],
+                cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, timeout=CHILD_TIMEOUT_SEC,
+                check=True,
+            )
+            stats = dict(api.stats)
+        with open(result_path) as f:
+            result = json.load(f)
+        result.update(requests=stats["requests"], bytes_sent=stats["bytes_received"],
+                      bytes_received=stats["bytes_sent"])
+        return result
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--only", help="comma-separated scenarios to run")
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--latency", type=float, default=0.05, help="mock time-to-first-byte, seconds")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--max-turns", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        run_child(args.child, args.max_turns, args.result)
+        return 0
+
+    names = args.only.split(",") if args.only else list(SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    results = {}
+    print(f"{'scenario':<17}{'wall':>8}{'turns':>7}{'turn p50':>10}{'turn p95':>10}"
+          f"{'tools':>8}{'sent':>10}{'recv':>10}{'rss':>8}")
+    for name in names:
+        r = results[name] = run_scenario(name, args.scale, args.latency)
+        print(f"{name:<17}{r['wall_sec']:>7.2f}s{r['turns']:>7}"
+              f"{r['turn_latency_sec']['p50'] * 1000:>8.0f}ms{r['turn_latency_sec']['p95'] * 1000:>8.0f}ms"
+              f"{r['tool_time_sec']:>7.2f}s{r['bytes_sent'] / 1024:>8.0f}KB"
+              f"{r['bytes_received'] / 1024:>8.0f}KB{r['peak_rss_mb']:>6.0f}MB")
+
+    with open(args.output, "w") as f:
+        json.dump({"commit": git_commit(), "timestamp": time.time(), "python": platform.python_version(),
+                   "scale": args.scale, "latency_sec": args.latency, "scenarios": results}, f, indent=2)
+    print(f"\nwrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
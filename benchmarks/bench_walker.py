@@ -0,0 +1,124 @@
+"""Bytes read by grep with and without the ignore-aware walker.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_walker [num_source_files]
+
+Builds a small project that has a checked-in virtualenv, a `.git`
+directory, `node_modules` and some binaries, then greps it the old way
+(os.walk, every file decoded) and through the shared walker. Bytes read are
+taken from /proc/self/io where available, otherwise from file sizes.
+"""
+
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+from tools.walker import open_text, walk_files
+
+PATTERN = r"import os"
+
+
+def generate_project(root, num_source_files):
+    def write(path, data, mode="w"):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, mode) as f:
+            f.write(data)
+
+    source = "import os\nimport sys\n\n" + "def f(x):\n    return x + 1\n" * 40
+    for i in range(num_source_files):
+        write(os.path.join(root, "src", f"pkg{i // 50}", f"mod{i}.py"), source)
+
+    # A virtualenv that was committed by mistake, under a non-standard name.
+    env = os.path.join(root, "env")
+    write(os.path.join(env, "pyvenv.cfg"), "home = /usr/bin\n")
+    site = os.path.join(env, "lib", "python3.11", "site-packages")
+    for i in range(num_source_files * 4):
+        write(os.path.join(site, f"dep{i // 100}", f"m{i}.py"), source)
+    for i in range(num_source_files // 10 or 1):
+        write(os.path.join(site, f"ext{i}.so"), b"\x7fELF\0\0" + os.urandom(256 * 1024), "wb")
+
+    for i in range(num_source_files):
+        write(os.path.join(root, ".git", "objects", f"{i % 256:02x}", f"obj{i}"),
+              b"x\x9c\0" + os.urandom(4096), "wb")
+    for i in range(num_source_files):
+        write(os.path.join(root, "node_modules", f"lib{i // 100}", f"index{i}.js"),
+              "const os = require('os');\n// import os\n" * 20)
+    write(os.path.join(root, ".gitignore"), "node_modules/\n*.log\n")
+    write(os.path.join(root, "build.log"), "import os\n" * 10_000)
+
+
+def bytes_read():
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("rchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def grep_old(pattern, path):
+    results, size = [], 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            file_path = os.path.join(root, name)
+            try:
+                size += os.path.getsize(file_path)
+                with open(file_path, "r", errors="ignore") as f:
+                    for i, line in enumerate(f, 1):
+                        if re.search(pattern, line):
+                            results.append(f"{file_path}:{i}: {line.strip()}")
+            except Exception:
+                continue
+    return results, size
+
+
+def grep_walker(pattern, path):
+    results, size = [], 0
+    for entry in walk_files(path):
+        try:
+            f = open_text(entry.path)
+            if f is None:
+                size += min(entry.size, 8192)
+                continue
+            size += entry.size
+            with f:
+                for i, line in enumerate(f, 1):
+                    if re.search(pattern, line):
+                        results.append(f"{entry.path}:{i}: {line.strip()}")
+        except Exception:
+            continue
+    return results, size
+
+
+def measure(fn, path):
+    before = bytes_read()
+    start = time.perf_counter()
+    results, size = fn(PATTERN, path)
+    elapsed = time.perf_counter() - start
+    after = bytes_read()
+    read = after - before if before is not None else size
+    noise = sum(1 for r in results[:100] if not r.startswith(os.path.join(path, "src")))
+    return read, elapsed, len(results), noise
+
+
+def main():
+    num_source_files = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    workdir = tempfile.mkdtemp(prefix="walker-bench-")
+    try:
+        generate_project(workdir, num_source_files)
+        print(f"{'walk':<10}{'MB read':>10}{'time':>9}{'matches':>9}{'junk in top 100':>17}")
+        for name, fn in (("os.walk", grep_old), ("walker", grep_walker)):
+            read, elapsed, matches, noise = measure(fn, workdir)
+            print(f"{name:<10}{read / 1e6:>10.1f}{elapsed:>8.2f}s{matches:>9}{noise:>17}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,313 @@
+"""A local stand-in for the Anthropic Messages API, for offline benchmarks.
+
+    with MockAPI(latency=0.05) as api:
+        client = Anthropic(api_key="test", base_url=api.url)
+        ...
+        print(api.stats)
+
+The server speaks HTTP/1.1 with keep-alive so connection reuse can be
+measured, counts the TCP connections it accepts, and can delay each new
+connection (`connect_latency`) to stand in for TCP/TLS handshakes. By
+default every request is answered with a short `end_turn` text message;
+pass `responder` (a callable taking the parsed request body and returning a
+response dict) to script tool_use sequences. With `simulate_prompt_cache`
+the usage block reports cache reads and writes for `cache_control`
+breakpoints, approximating the real API. Requests with `"stream": true` get
+server-sent events, one delta per 16 characters, `chunk_latency` apart.
+
+`requests_limit` / `input_tokens_limit` enforce rate limits per `window_sec`
+(60 like the real API, shorter for benchmarks) with continuously refilling
+buckets. Every response reports them in `anthropic-ratelimit-*` headers;
+requests over the limit get a 429 with `retry-after`. `overload_rate` is the
+fraction of requests answered with a 529 overloaded error. `stream_error_rate`
+is the fraction of streamed responses that break off after their first
+content block with an `event: error` (overloaded_error), as the real API
+does when it is overloaded mid-stream; the HTTP status is already 200.
+"""
+
+import hashlib
+import itertools
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_ids = itertools.count(1)
+
+
+def text_message(text, model="mock-model", input_tokens=100, output_tokens=20):
+    return message([{"type": "text", "text": text}], "end_turn", model, input_tokens, output_tokens)
+
+
+def tool_use_message(calls, text=None, model="mock-model", input_tokens=100, output_tokens=40):
+    """A tool_use response; `calls` is a list of (name, input) pairs."""
+    content = [{"type": "text", "text": text}] if text else []
+    for name, tool_input in calls:
+        content.append({
+            "type": "tool_use",
+            "id": f"toolu_mock{next(_ids):06d}",
+            "name": name,
+            "input": tool_input,
+        })
+    return message(content, "tool_use", model, input_tokens, output_tokens)
+
+
+def message(content, stop_reason, model="mock-model", input_tokens=100, output_tokens=20):
+    return {
+        "id": f"msg_mock{next(_ids):06d}",
+        "type": "message",
+        "role": "assistant",
+        "model": model,
+        "content": content,
+        "stop_reason": stop_reason,
+        "stop_sequence": None,
+        "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens},
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.api._count("connections")
+        if self.server.api.connect_latency:
+            # Stand-in for the TCP + TLS handshake round-trips of a real endpoint.
+            time.sleep(self.server.api.connect_latency)
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        api = self.server.api
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length)
+        api._count("requests")
+        api._count("bytes_received", len(raw))
+        if not self.path.startswith("/v1/messages"):
+            self._send_json(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+            return
+        body = json.loads(raw or b"{}")
+        status, headers = api._admit(len(raw) // 4)
+        if status == 429:
+            self._send_json(429, {"type": "error", "error": {
+                "type": "rate_limit_error", "message": "Rate limit exceeded (mock)"}}, headers)
+            return
+        if status == 529:
+            self._send_json(529, {"type": "error", "error": {
+                "type": "overloaded_error", "message": "Overloaded (mock)"}}, headers)
+            return
+        if api.latency:
+            time.sleep(api.latency)
+        response = api.responder(body)
+        if api.prompt_cache is not None:
+            response["usage"].update(api._cache_usage(body))
+        api.usage_log.append(response["usage"])
+        if body.get("stream"):
+            self._send_sse(response, headers)
+        else:
+            self._send_json(200, response, headers)
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+        self.server.api._count("bytes_sent", len(data))
+
+
+    def _send_sse(self, response, headers=None):
+        """Stream `response` as Messages API server-sent events, chunked."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        api = self.server.api
+
+        def emit(event_type, payload, delay=0.0):
+            if delay:
+                time.sleep(delay)
+            data = f"event: {event_type}\ndata: {json.dumps(payload)}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+            api._count("bytes_sent", len(data))
+
+        start = dict(response, content=[], stop_reason=None, stop_sequence=None,
+                     usage=dict(response["usage"], output_tokens=1))
+        emit("message_start", {"type": "message_start", "message": start})
+        for index, block in enumerate(response["content"]):
+            if block["type"] == "text":
+                emit("content_block_start", {"type": "content_block_start", "index": index,
+                                             "content_block": {"type": "text", "text": ""}})
+                chunks = [{"type": "text_delta", "text": t} for t in _split(block["text"])]
+            else:
+                emit("content_block_start", {"type": "content_block_start", "index": index,
+                                             "content_block": dict(block, input={})})
+                chunks = [{"type": "input_json_delta", "partial_json": t}
+                          for t in _split(json.dumps(block["input"]))]
+            for delta in chunks:
+                emit("content_block_delta", {"type": "content_block_delta", "index": index,
+                                             "delta": delta}, api.chunk_latency)
+            emit("content_block_stop", {"type": "content_block_stop", "index": index})
+            if index == 0 and api._stream_fails():
+                emit("error", {"type": "error", "error": {
+                    "type": "overloaded_error", "message": "Overloaded (mock)"}})
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+                return
+        emit("message_delta", {
+            "type": "message_delta",
+            "delta": {"stop_reason": response["stop_reason"], "stop_sequence": None},
+            "usage": {"output_tokens": response["usage"]["output_tokens"]},
+        })
+        emit("message_stop", {"type": "message_stop"})
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def _split(text, size=16):
+    return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+
+class MockAPI:
+    def __init__(self, responder=None, latency=0.0, connect_latency=0.0,
+                 chunk_latency=0.0, simulate_prompt_cache=False, handler=_Handler,
+                 requests_limit=None, input_tokens_limit=None, window_sec=60,
+                 overload_rate=0.0, stream_error_rate=0.0, seed=0):
+        self.responder = responder or (lambda body: text_message("ok", model=body.get("model", "mock-model")))
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.chunk_latency = chunk_latency
+        self.stats = {"connections": 0, "requests": 0, "bytes_received": 0, "bytes_sent": 0,
+                      "rate_limited": 0, "overloaded": 0, "stream_errors": 0}
+        self.usage_log = []
+        self.limits = {name: limit for name, limit in
+                       (("requests", requests_limit), ("input-tokens", input_tokens_limit)) if limit}
+        self.levels = dict(self.limits)
+        self.window_sec = window_sec
+        self.refilled = time.monotonic()
+        self.overload_rate = overload_rate
+        self.stream_error_rate = stream_error_rate
+        self.random = random.Random(seed)
+        self.prompt_cache = set() if simulate_prompt_cache else None
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+        self._server.api = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def _admit(self, input_tokens):
+        """(status, rate-limit headers) for a request of `input_tokens`."""
+        cost = {"requests": 1, "input-tokens": input_tokens}
+        with self._lock:
+            now = time.monotonic()
+            for name, limit in self.limits.items():
+                self.levels[name] = min(limit, self.levels[name]
+                                        + (now - self.refilled) * limit / self.window_sec)
+            self.refilled = now
+            # Larger-than-capacity requests only need a full bucket.
+            short = {name: min(cost[name], limit) - self.levels[name]
+                     for name, limit in self.limits.items()}
+            if any(missing > 0 for missing in short.values()):
+                status = 429
+                wait = max(missing * self.window_sec / self.limits[name]
+                           for name, missing in short.items())
+            elif self.overload_rate and self.random.random() < self.overload_rate:
+                status = 529
+            else:
+                status = 200
+                for name in self.limits:
+                    self.levels[name] -= cost[name]
+            headers = {}
+            for name, limit in self.limits.items():
+                headers[f"anthropic-ratelimit-{name}-limit"] = str(limit)
+                headers[f"anthropic-ratelimit-{name}-remaining"] = str(max(0, int(self.levels[name])))
+            if status == 429:
+                headers["retry-after"] = str(math.ceil(wait))
+                self.stats["rate_limited"] += 1
+            elif status == 529:
+                self.stats["overloaded"] += 1
+        return status, headers
+
+    def _stream_fails(self):
+        with self._lock:
+            if self.stream_error_rate and self.random.random() < self.stream_error_rate:
+                self.stats["stream_errors"] += 1
+                return True
+        return False
+
+    def _cache_usage(self, body):
+        """Approximate prompt-cache usage for `body`, the way the API reports it.
+
+        Every breakpoint writes its prefix to the cache; a request reads the
+        longest prefix (at any block boundary) written by an earlier request.
+        Tokens are estimated at four characters each.
+        """
+        blocks = list(body.get("tools", []))
+        system = body.get("system")
+        blocks += [{"type": "text", "text": system}] if isinstance(system, str) else (system or [])
+        for msg in body.get("messages", []):
+            content = msg["content"]
+            if isinstance(content, str):
+                content = [{"type": "text", "text": content}]
+            blocks += [dict(block, role=msg["role"]) for block in content]
+
+        digest = hashlib.sha256()
+        prefix_tokens, hashes, breakpoints = [], [], []
+        tokens = 0
+        for i, block in enumerate(blocks):
+            if "cache_control" in block:
+                breakpoints.append(i)
+                block = {k: v for k, v in block.items() if k != "cache_control"}
+            text = json.dumps(block, sort_keys=True)
+            digest.update(text.encode("utf-8"))
+            tokens += len(text) // 4
+            prefix_tokens.append(tokens)
+            hashes.append(digest.copy().hexdigest())
+
+        with self._lock:
+            read_upto = max((i for i, h in enumerate(hashes) if h in self.prompt_cache), default=-1)
+            written_upto = read_upto
+            for i in breakpoints:
+                if i > read_upto:
+                    self.prompt_cache.add(hashes[i])
+                    written_upto = max(written_upto, i)
+        read = prefix_tokens[read_upto] if read_upto >= 0 else 0
+        written = (prefix_tokens[written_upto] if written_upto >= 0 else 0) - read
+        return {
+            "cache_read_input_tokens": read,
+            "cache_creation_input_tokens": written,
+            "input_tokens": tokens - read - written,
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,114 @@
+"""Process-wide Anthropic client with a tuned, shared connection pool.
+
+Every agent and sub-agent used to build its own `Anthropic()`, and with it
+its own httpx connection pool, so each one paid for fresh TCP/TLS
+handshakes. `get_client()` hands out one client for the whole process.
+Requests are traced through httpcore so we can report how many connections
+were opened versus reused.
+
+Tuning knobs (environment variables):
+    AGENT_HTTP_MAX_CONNECTIONS   max open connections (default 32)
+    AGENT_HTTP_MAX_KEEPALIVE     max idle keep-alive connections (default 16)
+    AGENT_HTTP_KEEPALIVE_SEC     idle connection expiry (default 120)
+    AGENT_HTTP_CONNECT_TIMEOUT   connect timeout in seconds (default 10)
+    AGENT_HTTP_READ_TIMEOUT      read timeout in seconds (default 600)
+    AGENT_HTTP2                  "0" to disable HTTP/2 (used when `h2` is installed)
+
+Response headers are fed to rate_limiter, which also owns retries.
+"""
+
+import importlib.util
+import os
+import threading
+
+import rate_limiter
+
+MAX_CONNECTIONS = int(os.getenv("AGENT_HTTP_MAX_CONNECTIONS", "32"))
+MAX_KEEPALIVE = int(os.getenv("AGENT_HTTP_MAX_KEEPALIVE", "16"))
+KEEPALIVE_EXPIRY_SEC = float(os.getenv("AGENT_HTTP_KEEPALIVE_SEC", "120"))
+CONNECT_TIMEOUT_SEC = float(os.getenv("AGENT_HTTP_CONNECT_TIMEOUT", "10"))
+READ_TIMEOUT_SEC = float(os.getenv("AGENT_HTTP_READ_TIMEOUT", "600"))
+HTTP2 = os.getenv("AGENT_HTTP2", "1") != "0" and importlib.util.find_spec("h2") is not None
+
+_client = None
+_lock = threading.Lock()
+_stats = {"requests": 0, "connections_opened": 0, "tls_handshakes": 0}
+
+
+def _trace(event_name, info):
+    # httpcore trace hook; called on whichever thread sends the request.
+    if event_name == "connection.connect_tcp.complete":
+        key = "connections_opened"
+    elif event_name == "connection.start_tls.complete":
+        key = "tls_handshakes"
+    elif event_name.endswith(".send_request_headers.started"):
+        key = "requests"
+    else:
+        return
+    with _lock:
+        _stats[key] += 1
+
+
+def _attach_trace(request):
+    request.extensions["trace"] = _trace
+
+
+def _observe_limits(response):
+    # Every response, errors included, carries the current rate-limit state.
+    rate_limiter.LIMITER.observe(response.headers)
+
+
+def create_client(**kwargs):
+    """Build a new Anthropic client on a tuned connection pool."""
+    import httpx
+    from anthropic import Anthropic, DefaultHttpxClient
+
+    http_client = DefaultHttpxClient(
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE,
+            keepalive_expiry=KEEPALIVE_EXPIRY_SEC,
+        ),
+        timeout=httpx.Timeout(READ_TIMEOUT_SEC, connect=CONNECT_TIMEOUT_SEC),
+        http2=HTTP2,
+        event_hooks={"request": [_attach_trace], "response": [_observe_limits]},
+    )
+    kwargs.setdefault("api_key", os.getenv("ANTHROPIC_API_KEY"))
+    # Retries are rate_limiter's job; SDK retries would bypass its buckets.
+    kwargs.setdefault("max_retries", 0)
+    return Anthropic(http_client=http_client, **kwargs)
+
+
+def get_client():
+    """The process-wide client, created on first use."""
+    global _client
+    with _lock:
+        if _client is None:
+            _client = create_client()
+        return _client
+
+
+def pool_stats():
+    """Connection counters for the shared client."""
+    with _lock:
+        stats = dict(_stats)
+    stats["connections_reused"] = max(stats["requests"] - stats["connections_opened"], 0)
+    stats["idle"] = None
+    stats["http2"] = HTTP2
+    if _client is not None:
+        try:
+            # httpcore internals; only used for reporting.
+            pool = _client._client._transport._pool
+            stats["idle"] = sum(1 for conn in pool.connections if conn.is_idle())
+        except AttributeError:
+            pass
+    return stats
+
+
+def format_pool_stats():
+    stats = pool_stats()
+    idle = "?" if stats["idle"] is None else stats["idle"]
+    return (
+        f"{stats['requests']} requests over {stats['connections_opened']} connections "
+        f"({stats['connections_reused']} reused, {idle} idle)"
+    )
@@ -0,0 +1,203 @@
+"""Keeps the conversation sent by `run_agent` under a token budget.
+
+Tokens are estimated locally (about four characters per token) and the
+estimate is calibrated against the real prompt size reported in
+`response.usage` after every turn. Optionally the count-tokens endpoint can
+be asked before compacting.
+
+When the budget is exceeded, compaction runs in two stages until the
+history is back under a lower target, so it happens in occasional batches
+rather than every turn (each rewrite invalidates the prompt cache once):
+
+1. Old, large tool results are replaced with short stubs that say which
+   tool produced them and how big they were.
+2. If that is not enough, the oldest turns are folded into a single summary
+   that becomes the first user message. The cut is always placed just
+   before an assistant message, so every remaining tool_result still
+   follows the tool_use it answers.
+"""
+
+import json
+import os
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("AGENT_CONTEXT_BUDGET", "120000"))
+# After compacting, aim for this fraction of the budget.
+COMPACT_TARGET_RATIO = 0.6
+# The most recent turns are never touched.
+KEEP_RECENT_MESSAGES = 6
+# Tool results smaller than this are not worth stubbing.
+STUB_MIN_TOKENS = 200
+CHARS_PER_TOKEN = 4
+SUMMARY_HEADER = "[Summary of earlier turns, removed to save context]"
+SUMMARY_EVENTS = "What happened in them:\n"
+SUMMARY_MAX_EVENTS = 60
+
+
+def _get(block, key, default=None):
+    if isinstance(block, dict):
+        return block.get(key, default)
+    return getattr(block, key, default)
+
+
+def _block_text(block):
+    if isinstance(block, str):
+        return block
+    if not isinstance(block, dict):
+        block = block.model_dump(exclude_none=True)
+    return json.dumps(block, default=str)
+
+
+def estimate_tokens(message):
+    content = message["content"]
+    if isinstance(content, str):
+        chars = len(content)
+    else:
+        chars = sum(len(_block_text(block)) for block in content)
+    return chars // CHARS_PER_TOKEN + 4
+
+
+def _short(value, limit):
+    text = value if isinstance(value, str) else json.dumps(value, default=str)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+class ContextCompactor:
+    def __init__(self, overhead_tokens=0, budget=CONTEXT_TOKEN_BUDGET,
+                 max_messages=None, count_tokens=None, on_elide=None):
+        # overhead_tokens: system prompt + tool schemas, sent with every turn.
+        # count_tokens: optional callable(messages) -> exact prompt tokens.
+        # on_elide: optional callable(tool_use_id), called for every tool
+        # result that is stubbed out or dropped from the conversation.
+        self.overhead_tokens = overhead_tokens
+        self.budget = budget
+        self.max_messages = max_messages
+        self.count_tokens = count_tokens
+        self.on_elide = on_elide
+        self.scale = 1.0
+        self.compactions = 0
+        self._last_estimate = None
+
+    def estimate(self, messages):
+        raw = self.overhead_tokens + sum(estimate_tokens(m) for m in messages)
+        return int(raw * self.scale)
+
+    def observe(self, usage):
+        """Calibrate the estimator with the real size of the last prompt."""
+        actual = ((getattr(usage, "input_tokens", 0) or 0)
+                  + (getattr(usage, "cache_read_input_tokens", 0) or 0)
+                  + (getattr(usage, "cache_creation_input_tokens", 0) or 0))
+        if actual and self._last_estimate:
+            ratio = actual / (self._last_estimate / self.scale)
+            self.scale = 0.5 * self.scale + 0.5 * ratio
+
+    def _over_budget(self, messages):
+        if self.max_messages and len(messages) > self.max_messages:
+            return True
+        if self.estimate(messages) <= self.budget:
+            return False
+        if self.count_tokens:
+            return self.count_tokens(messages) > self.budget
+        return True
+
+    def _within_target(self, messages):
+        if self.max_messages and len(messages) > int(self.max_messages * COMPACT_TARGET_RATIO):
+            return False
+        return self.estimate(messages) <= self.budget * COMPACT_TARGET_RATIO
+
+    def compact(self, messages):
+        """Compact `messages` in place if needed; returns True if it changed."""
+        changed = False
+        if self._over_budget(messages):
+            changed = self._stub_tool_results(messages)
+            if not self._within_target(messages):
+                changed = self._summarize_prefix(messages) or changed
+            if changed:
+                self.compactions += 1
+        self._last_estimate = self.estimate(messages)
+        return changed
+
+    def _tool_calls(self, messages):
+        calls = {}
+        for message in messages:
+            if message["role"] != "assistant" or isinstance(message["content"], str):
+                continue
+            for block in message["content"]:
+                if _get(block, "type") == "tool_use":
+                    calls[_get(block, "id")] = (_get(block, "name"), _get(block, "input"))
+        return calls
+
+    def _stub_tool_results(self, messages):
+        calls = self._tool_calls(messages)
+        changed = False
+        for index in range(len(messages) - KEEP_RECENT_MESSAGES):
+            message = messages[index]
+            if message["role"] != "user" or isinstance(message["content"], str):
+                continue
+            content = []
+            for block in message["content"]:
+                if (_get(block, "type") == "tool_result"
+                        and isinstance(block.get("content"), str)
+                        and len(block["content"]) // CHARS_PER_TOKEN >= STUB_MIN_TOKENS):
+                    name, tool_input = calls.get(block["tool_use_id"], ("tool", {}))
+                    tokens = len(block["content"]) // CHARS_PER_TOKEN
+                    block = dict(block, content=(
+                        f"[Elided to save context: {name}({_short(tool_input, 120)}) "
+                        f"returned ~{tokens} tokens. Run it again if you still need it.]"
+                    ))
+                    if self.on_elide:
+                        self.on_elide(block["tool_use_id"])
+                    changed = True
+                content.append(block)
+            messages[index] = dict(message, content=content)
+            if self._within_target(messages):
+                break
+        return changed
+
+    def _summarize_prefix(self, messages):
+        # Drop whole turns from the front until we are under target, but keep
+        # the most recent messages. A valid cut is an assistant message.
+        cut = None
+        for index in range(1, len(messages) - KEEP_RECENT_MESSAGES):
+            if messages[index]["role"] != "assistant":
+                continue
+            cut = index
+            if self._within_target(messages[index:]):
+                break
+        if cut is None:
+            return False
+        summary = self.summarize(messages[:cut])
+        if self.on_elide:
+            for message in messages[:cut]:
+                if message["role"] == "user" and not isinstance(message["content"], str):
+                    for block in message["content"]:
+                        if _get(block, "type") == "tool_result":
+                            self.on_elide(_get(block, "tool_use_id"))
+        messages[:cut] = [{"role": "user", "content": summary}]
+        return True
+
+    def summarize(self, dropped):
+        """Extractive summary of the dropped turns; override for model summaries.
+
+        An earlier summary at the front is extended rather than nested, and
+        only the most recent SUMMARY_MAX_EVENTS events are kept.
+        """
+        first = dropped[0]["content"]
+        if not isinstance(first, str):
+            first = next((_get(b, "text") for b in first if _get(b, "type") == "text"), "")
+        if first.startswith(SUMMARY_HEADER):
+            head, _, previous = first.partition(SUMMARY_EVENTS)
+            events = previous.strip("\n").split("\n") if previous.strip() else []
+        else:
+            head = f"{SUMMARY_HEADER}\nOriginal task: {first}\n\n"
+            events = []
+        for message in dropped[1:]:
+            if message["role"] != "assistant" or isinstance(message["content"], str):
+                continue
+            for block in message["content"]:
+                kind = _get(block, "type")
+                if kind == "text" and _get(block, "text"):
+                    events.append(f"- You said: {_short(_get(block, 'text'), 300)}")
+                elif kind == "tool_use":
+                    events.append(f"- You called {_get(block, 'name')}({_short(_get(block, 'input'), 160)})")
+        events = events[-SUMMARY_MAX_EVENTS:]
+        return head + SUMMARY_EVENTS + "\n".join(events)
@@ -0,0 +1,180 @@
+"""Long-term memory of past sessions: append-only JSONL with BM25 recall.
+
+Replaces history.json, whose single summary string grew with every run and
+was rewritten in full each time. Every finished session appends one line
+
+    {"ts": ..., "task": ..., "result": ..., "cwd": ...}
+
+to AGENT_MEMORY_FILE (default memory.jsonl in the working directory). An
+append holds an exclusive flock on a sidecar lock file and writes its line
+with a single write(), so parallel agent processes (`--batch` workers,
+several terminals) never interleave or lose entries.
+
+At the start of a run the entries most relevant to the new task are ranked
+with BM25 over task and result text, and the best AGENT_MEMORY_TOP_K of
+them are injected into the system prompt until AGENT_MEMORY_TOKENS is
+spent. The prompt therefore stays the same size however long the history.
+The index is rebuilt from the file on each search rather than persisted:
+compaction keeps the file small enough that this costs a few milliseconds.
+Memory is not recalled while replay_cache records or replays.
+
+Compaction keeps the file bounded: once it passes AGENT_MEMORY_MAX_KB, the
+next append rewrites it with only the latest entry per task, newest first,
+up to half that size. An existing history.json is migrated on first use
+and renamed to history.json.migrated.
+"""
+
+import fcntl
+import json
+import math
+import os
+import re
+import time
+from collections import Counter
+
+from context_compaction import CHARS_PER_TOKEN
+
+MEMORY_FILE = os.getenv("AGENT_MEMORY_FILE", "memory.jsonl")
+LEGACY_HISTORY_FILE = "history.json"
+TOP_K = int(os.getenv("AGENT_MEMORY_TOP_K", "5"))
+TOKEN_BUDGET = int(os.getenv("AGENT_MEMORY_TOKENS", "1000"))
+MAX_FILE_BYTES = int(os.getenv("AGENT_MEMORY_MAX_KB", "1024")) * 1024
+# Results are stored truncated; memory is a pointer, not a transcript.
+MAX_RESULT_CHARS = 2000
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_WORDS = re.compile(r"[a-z0-9_]+")
+_LEGACY_ENTRY = re.compile(r"^- Task: (.*?)\n  Result: (.*?)(?=\n- Task: |\Z)", re.MULTILINE | re.DOTALL)
+
+
+def tokenize(text):
+    return _WORDS.findall(text.lower())
+
+
+def _clip(text, limit):
+    return text if len(text) <= limit else text[:limit] + "…"
+
+
+class MemoryStore:
+    def __init__(self, path=MEMORY_FILE, legacy_path=LEGACY_HISTORY_FILE, max_bytes=MAX_FILE_BYTES):
+        # Absolute, so a process that changes directory (a `--batch` worker
+        # runs in its task's directory) keeps using the same file.
+        self.path = os.path.abspath(path)
+        self.lock_path = self.path + ".lock"
+        self.legacy_path = legacy_path
+        self.max_bytes = max_bytes
+        self._migrated = False
+
+    def _locked(self):
+        """An open lock file holding the exclusive lock; close it to release."""
+        lock = open(self.lock_path, "a")
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return lock
+
+    def _migrate(self):
+        # Called with the lock held.
+        self._migrated = True
+        if os.path.exists(self.path) or not self.legacy_path or not os.path.exists(self.legacy_path):
+            return
+        try:
+            with open(self.legacy_path, "r") as f:
+                summary = json.load(f).get("summary", "")
+        except (OSError, ValueError, AttributeError):
+            return
+        ts = os.path.getmtime(self.legacy_path)
+        with open(self.path, "a") as f:
+            for task, result in _LEGACY_ENTRY.findall(summary.strip()):
+                f.write(json.dumps({"ts": ts, "task": task.strip(),
+                                    "result": _clip(result.strip(), MAX_RESULT_CHARS), "cwd": None}) + "\n")
+        os.replace(self.legacy_path, self.legacy_path + ".migrated")
+
+    def append(self, task, result, **fields):
+        line = json.dumps(dict(ts=time.time(), task=task, result=_clip(str(result), MAX_RESULT_CHARS),
+                               cwd=os.getcwd(), **fields)) + "\n"
+        with self._locked():
+            if not self._migrated:
+                self._migrate()
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode("utf-8"))
+                size = os.fstat(fd).st_size
+            finally:
+                os.close(fd)
+            if size > self.max_bytes:
+                self._compact()
+
+    def entries(self):
+        if not self._migrated and not os.path.exists(self.path) and os.path.exists(self.legacy_path or ""):
+            with self._locked():
+                self._migrate()
+        entries = []
+        try:
+            with open(self.path, "r") as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        continue  # torn line from a crashed writer
+        except OSError:
+            pass
+        return entries
+
+    def _compact(self):
+        # Called with the lock held; other writers wait on the same lock file.
+        latest = {}
+        for entry in self.entries():
+            latest[" ".join(tokenize(entry.get("task", "")))] = entry
+        kept, size = [], 0
+        for entry in sorted(latest.values(), key=lambda e: e.get("ts", 0), reverse=True):
+            line = json.dumps(entry) + "\n"
+            if size + len(line) > self.max_bytes // 2:
+                break
+            kept.append(line)
+            size += len(line)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            f.writelines(reversed(kept))
+        os.replace(tmp, self.path)
+
+    def compact(self):
+        with self._locked():
+            if not self._migrated:
+                self._migrate()
+            self._compact()
+
+    def search(self, query, k=TOP_K):
+        """[(score, entry)] of the k entries that best match `query` (BM25)."""
+        entries = self.entries()
+        terms = set(tokenize(query))
+        if not entries or not terms:
+            return []
+        docs = [Counter(tokenize(f"{e.get('task', '')} {e.get('result', '')}")) for e in entries]
+        avg_len = sum(sum(d.values()) for d in docs) / len(docs) or 1
+        df = Counter(term for d in docs for term in terms if term in d)
+        scored = []
+        for i, (entry, doc) in enumerate(zip(entries, docs)):
+            length = sum(doc.values())
+            score = 0.0
+            for term in terms:
+                tf = doc.get(term, 0)
+                if tf:
+                    idf = math.log(1 + (len(docs) - df[term] + 0.5) / (df[term] + 0.5))
+                    score += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_len))
+            if score > 0:
+                scored.append((score, i, entry))
+        # Best first; newer entries win ties.
+        scored.sort(key=lambda s: (s[0], s[1]), reverse=True)
+        return [(score, entry) for score, _, entry in scored[:k]]
+
+    def recall(self, query, budget_tokens=TOKEN_BUDGET, k=TOP_K):
+        """Prompt text for the most relevant past sessions, within the budget."""
+        lines, spent = [], 0
+        for _, entry in self.search(query, k):
+            text = f"- Task: {entry.get('task', '')}\n  Result: {entry.get('result', '')}"
+            cost = len(text) // CHARS_PER_TOKEN
+            if spent + cost > budget_tokens:
+                continue
+            lines.append(text)
+            spent += cost
+        return "\n".join(lines)
@@ -0,0 +1,340 @@
+"""Decides which tool calls need a human yes/no, and remembers the answers.
+
+Checks for a `run_bash` command, in order:
+
+1. Risk rules (agent-v2's RISK_PATTERNS) compiled into one regex with a
+   named group per rule, so a single search says whether, and why, a
+   command is risky. Risky commands are never allowed by class.
+2. Read-only command classes (AUTO_ALLOW_CLASSES): a command whose every
+   pipeline segment starts with an allowed command, and which has no
+   redirection into files or command substitution, is allowed at once.
+   Every option must be on that command's allowlist (COMMAND_OPTIONS):
+   flags such as `fd --exec`, `rg --pre` or `sort -o` run programs or write
+   files, so anything not known to be harmless needs a prompt. Commands
+   without an entry, including AGENT_SAFE_COMMANDS, take no options.
+3. An earlier approval in this session of the identical command.
+
+Writes (`write_file`, `apply_edits`) are allowed at once inside WRITE_SCOPES
+for files approved earlier in the session, or under a directory the user
+approved with "a". Denials are not remembered, so the user can reconsider.
+
+Every decision is appended to a JSONL log (AGENT_PERMISSION_LOG, empty to
+disable) with its source and latency; for prompts, latency is how long we
+waited on the human.
+"""
+
+import json
+import os
+import re
+import shlex
+import threading
+import time
+from collections import namedtuple
+
+RISK_RULES = [
+    ("sensitive_command", r"(^|\s)(sudo|rm|mkfs|fdisk|dd|shutdown|reboot|poweroff|userdel|usermod|chmod|chown)(\s|$)", "sensitive command"),
+    ("download_execute", r"\b(curl|wget)\b[^\n]*\|\s*(bash|sh)\b", "download-and-execute pattern"),
+    ("forced_delete", r"\brm\b[^\n]*\s-(?:[^\s]*[rf]|[^\s]*[fr])", "recursive/forced delete"),
+    ("sensitive_path", r"(^|\s)(/|/etc|/usr|/bin|/sbin|/var|/boot|~/.ssh)(/|\s|$)", "sensitive path"),
+]
+
+COMMAND_CLASSES = {
+    "inspect": ["ls", "cat", "head", "tail", "wc", "file", "stat", "du", "df", "tree", "pwd",
+                "echo", "which", "type", "date", "whoami", "uname", "sort", "uniq", "cut",
+                "diff", "basename", "dirname", "realpath"],
+    "search": ["grep", "egrep", "rg", "ag", "find", "fd", "locate"],
+    "git-read": ["git status", "git log", "git diff", "git show", "git blame",
+                 "git rev-parse", "git ls-files", "git remote -v"],
+    "python-info": ["python --version", "python3 --version", "pip list", "pip show", "pip freeze"],
+}
+
+# Options each read-only command may take without a prompt. `short` flags
+# may be clustered (-la); a flag in `value` takes the rest of its cluster
+# or the next word as its value. `long` names may be given as --name=value.
+# `positionals` caps plain arguments (uniq's second one is an output file).
+# `predicates` maps find-style single-dash words to whether they take an
+# argument. ANY_OPTIONS: no option of the command runs or writes anything.
+OptionSpec = namedtuple("OptionSpec", "short value long positionals predicates",
+                        defaults=("", "", (), None, ()))
+ANY_OPTIONS = None
+_NO_ARGS = OptionSpec(positionals=0)
+
+COMMAND_OPTIONS = {
+    "ls": ANY_OPTIONS, "cat": ANY_OPTIONS, "head": ANY_OPTIONS, "tail": ANY_OPTIONS,
+    "wc": ANY_OPTIONS, "stat": ANY_OPTIONS, "du": ANY_OPTIONS, "df": ANY_OPTIONS,
+    "pwd": ANY_OPTIONS, "echo": ANY_OPTIONS, "which": ANY_OPTIONS, "type": ANY_OPTIONS,
+    "whoami": ANY_OPTIONS, "uname": ANY_OPTIONS, "cut": ANY_OPTIONS, "diff": ANY_OPTIONS,
+    "basename": ANY_OPTIONS, "dirname": ANY_OPTIONS, "realpath": ANY_OPTIONS,
+    "grep": ANY_OPTIONS, "egrep": ANY_OPTIONS, "locate": ANY_OPTIONS,
+    # file -C compiles a magic file; tree -o writes its listing to a file.
+    "file": OptionSpec(short="bhiIkLNprsvz0", value="emfF",
+                       long=("--brief", "--mime", "--mime-type", "--mime-encoding", "--dereference",
+                             "--no-dereference", "--keep-going", "--raw", "--special-files")),
+    "tree": OptionSpec(short="adfilpsughDFqNQrtvUcCAS", value="LPI",
+                       long=("--dirsfirst", "--noreport", "--charset", "--filelimit", "--du", "--gitignore")),
+    # date -s sets the clock.
+    "date": OptionSpec(short="uRI", value="dr", long=("--utc", "--date", "--rfc-3339", "--iso-8601", "--reference")),
+    # sort -o writes a file; --compress-program runs one.
+    "sort": OptionSpec(short="bdfgiMhnRrVsuzc", value="ktS",
+                       long=("--ignore-leading-blanks", "--dictionary-order", "--ignore-case",
+                             "--general-numeric-sort", "--human-numeric-sort", "--numeric-sort",
+                             "--reverse", "--version-sort", "--stable", "--unique", "--key",
+                             "--field-separator", "--zero-terminated", "--check")),
+    "uniq": OptionSpec(short="cdDiuz", value="fsw",
+                       long=("--count", "--repeated", "--ignore-case", "--unique", "--skip-fields",
+                             "--skip-chars", "--check-chars", "--zero-terminated"), positionals=1),
+    # rg --pre and --pre-glob run a program on every file.
+    "rg": OptionSpec(short="iIsSwxvnNlcoFLuUHPz0aqh", value="eEgtTmABCMjd",
+                     long=("--ignore-case", "--smart-case", "--case-sensitive", "--word-regexp",
+                           "--line-regexp", "--invert-match", "--line-number", "--no-line-number",
+                           "--files-with-matches", "--files-without-match", "--count", "--count-matches",
+                           "--only-matching", "--fixed-strings", "--follow", "--hidden", "--no-ignore",
+                           "--glob", "--iglob", "--type", "--type-not", "--max-count", "--max-depth",
+                           "--after-context", "--before-context", "--context", "--files", "--json",
+                           "--no-heading", "--heading", "--with-filename", "--no-filename", "--column",
+                           "--vimgrep", "--multiline", "--pcre2", "--text", "--sort", "--sortr",
+                           "--max-filesize", "--null", "--quiet", "--stats", "--color", "--regexp",
+                           "--type-list", "--trim", "--unrestricted", "--one-file-system")),
+    # ag --pager pipes its output through a program.
+    "ag": OptionSpec(short="iswvlLcoQaufHnUtz0", value="GgABCm",
+                     long=("--ignore-case", "--smart-case", "--case-sensitive", "--word-regexp",
+                           "--invert-match", "--files-with-matches", "--files-without-matches",
+                           "--count", "--only-matching", "--literal", "--all-types", "--unrestricted",
+                           "--follow", "--hidden", "--skip-vcs-ignores", "--depth", "--context",
+                           "--after", "--before", "--max-count", "--nocolor", "--noheading",
+                           "--nobreak", "--filename-pattern", "--file-search-regex", "--column",
+                           "--vimgrep", "--stats", "--search-zip")),
+    # fd -x/-X run a command per match.
+    "fd": OptionSpec(short="HIusiFgaLlp01", value="tedEcjS",
+                     long=("--hidden", "--no-ignore", "--unrestricted", "--case-sensitive",
+                           "--ignore-case", "--glob", "--regex", "--fixed-strings", "--absolute-path",
+                           "--list-details", "--follow", "--full-path", "--print0", "--type",
+                           "--extension", "--max-depth", "--min-depth", "--exact-depth", "--exclude",
+                           "--max-results", "--size", "--changed-within", "--changed-before",
+                           "--owner", "--color", "--threads", "--search-path", "--base-directory")),
+    # find -exec, -delete, -fprint and friends are simply not listed.
+    "find": OptionSpec(predicates=dict.fromkeys((
+        "-name", "-iname", "-path", "-ipath", "-wholename", "-iwholename", "-regex", "-iregex",
+        "-regextype", "-type", "-xtype", "-maxdepth", "-mindepth", "-size", "-newer", "-mtime",
+        "-mmin", "-atime", "-amin", "-ctime", "-cmin", "-user", "-group", "-perm", "-links",
+        "-inum", "-samefile", "-printf"), True) | dict.fromkeys((
+        "-not", "-and", "-a", "-or", "-o", "-prune", "-print", "-print0", "-ls", "-empty",
+        "-readable", "-writable", "-executable", "-nouser", "-nogroup", "-depth", "-follow",
+        "-mount", "-xdev", "-true", "-false", "-quit", "-L", "-P", "-H"), False)),
+    "git status": OptionSpec(short="sbuvz", long=("--short", "--branch", "--porcelain", "--long",
+                                                  "--untracked-files", "--ignored", "--verbose")),
+    "git log": OptionSpec(short="pP0123456789", value="nSGL", long=(
+        "--oneline", "--stat", "--shortstat", "--numstat", "--name-only", "--name-status", "--graph",
+        "--decorate", "--all", "--author", "--committer", "--since", "--until", "--after", "--before",
+        "--grep", "--patch", "--format", "--pretty", "--max-count", "--reverse", "--follow",
+        "--abbrev-commit", "--date", "--merges", "--no-merges", "--first-parent", "--no-color",
+        "--color", "--word-diff", "--unified", "--invert-grep", "--all-match", "--branches", "--tags")),
+    "git diff": OptionSpec(short="wbR", value="UM", long=(
+        "--stat", "--shortstat", "--numstat", "--name-only", "--name-status", "--cached", "--staged",
+        "--word-diff", "--unified", "--no-color", "--color", "--ignore-all-space",
+        "--ignore-space-change", "--ignore-blank-lines", "--diff-filter", "--check", "--merge-base",
+        "--find-renames", "--no-renames", "--minimal", "--patience", "--histogram")),
+    "git show": OptionSpec(short="sw", value="U", long=(
+        "--stat", "--shortstat", "--numstat", "--name-only", "--name-status", "--format", "--pretty",
+        "--oneline", "--no-patch", "--word-diff", "--unified", "--no-color", "--color", "--abbrev-commit",
+        "--date")),
+    "git blame": OptionSpec(short="wsfnelcp", value="L", long=(
+        "--show-email", "--show-name", "--show-number", "--porcelain", "--line-porcelain",
+        "--date", "--root", "--abbrev")),
+    "git rev-parse": OptionSpec(long=(
+        "--abbrev-ref", "--show-toplevel", "--show-prefix", "--show-cdup", "--git-dir",
+        "--is-inside-work-tree", "--short", "--verify", "--symbolic-full-name", "--quiet")),
+    "git ls-files": OptionSpec(short="cdmoiksuz", long=(
+        "--cached", "--deleted", "--modified", "--others", "--ignored", "--stage", "--unmerged",
+        "--exclude-standard", "--full-name", "--error-unmatch")),
+    # Exact commands: any further word changes what they do.
+    "git remote -v": _NO_ARGS,
+    "python --version": _NO_ARGS,
+    "python3 --version": _NO_ARGS,
+    "pip list": ANY_OPTIONS, "pip show": ANY_OPTIONS, "pip freeze": ANY_OPTIONS,
+}
+
+AUTO_ALLOW_CLASSES = [c for c in os.getenv("AGENT_AUTO_ALLOW", "inspect,search,git-read").split(",") if c]
+# Extra read-only commands, comma-separated.
+EXTRA_SAFE_COMMANDS = [c.strip() for c in os.getenv("AGENT_SAFE_COMMANDS", "").split(",") if c.strip()]
+# Directories where writes need no confirmation, os.pathsep-separated.
+WRITE_SCOPES = [p for p in os.getenv("AGENT_WRITE_SCOPES", "").split(os.pathsep) if p]
+LOG_PATH = os.getenv("AGENT_PERMISSION_LOG",
+                     os.path.join(os.path.expanduser("~"), ".cache", "agent-zero", "permissions.jsonl"))
+
+# Pipelines, lists and newlines separate commands.
+_SEGMENTS = re.compile(r"&&|\|\||[;|\n&]")
+# Discarding output is harmless; any other redirection or substitution is not.
+_DEV_NULL = re.compile(r"\d?>>?\s*/dev/null|\d>&\d")
+_UNSAFE_SYNTAX = re.compile(r"[<>`]|\$\(")
+
+
+def compile_risk_rules(rules=RISK_RULES):
+    combined = "|".join(f"(?P<{name}>{pattern})" for name, pattern, _ in rules)
+    return re.compile(combined, re.IGNORECASE), {name: reason for name, _, reason in rules}
+
+
+def compile_safe_commands(classes=AUTO_ALLOW_CLASSES, extra=EXTRA_SAFE_COMMANDS):
+    """{command words: OptionSpec}, longest commands first."""
+    commands = [c for name in classes for c in COMMAND_CLASSES.get(name, [])] + list(extra)
+    if not commands:
+        return None
+    # Longest first so "git status" wins over a bare "git" someone configured.
+    return {tuple(c.split()): COMMAND_OPTIONS.get(c, _NO_OPTIONS)
+            for c in sorted(commands, key=lambda c: len(c.split()), reverse=True)}
+
+
+_NO_OPTIONS = OptionSpec()
+
+
+def options_allowed(spec, args):
+    """Whether every option in `args` is on the allowlist `spec`."""
+    if spec is ANY_OPTIONS:
+        return True
+    positionals = 0
+    words = iter(args)
+    for word in words:
+        if word == "--":
+            positionals += sum(1 for _ in words)
+        elif spec.predicates and word.startswith("-"):
+            if word not in spec.predicates:
+                return False
+            if spec.predicates[word]:
+                next(words, None)  # the predicate's argument
+        elif word.startswith("--"):
+            if word.split("=", 1)[0] not in spec.long:
+                return False
+        elif word.startswith("-") and word != "-":
+            for i, flag in enumerate(word[1:], 1):
+                if flag in spec.value:
+                    if i == len(word) - 1:
+                        next(words, None)
+                    break
+                if flag not in spec.short:
+                    return False
+        else:
+            positionals += 1
+    return spec.positionals is None or positionals <= spec.positionals
+
+
+class PermissionPolicy:
+    def __init__(self, ask, classes=AUTO_ALLOW_CLASSES, extra_commands=EXTRA_SAFE_COMMANDS,
+                 write_scopes=WRITE_SCOPES, log_path=LOG_PATH):
+        # ask(tool_name, subject, risk) -> the user's raw answer.
+        self.ask = ask
+        self.risk, self.risk_reasons = compile_risk_rules()
+        self.safe = compile_safe_commands(classes, extra_commands)
+        self.write_scopes = [os.path.realpath(p) for p in write_scopes]
+        self.log_path = log_path
+        self.lock = threading.Lock()
+        self.commands = set()   # approved commands
+        self.paths = set()      # approved files (realpaths)
+        self.prefixes = set()   # directories approved for the session
+        self.decisions = 0
+        self.automatic = 0
+        self.prompts = 0
+        self.prompt_wait = 0.0
+
+    def risk_of(self, command):
+        match = self.risk.search(command)
+        return self.risk_reasons[match.lastgroup] if match else None
+
+    def is_read_only(self, command):
+        command = _DEV_NULL.sub(" ", command)
+        if self.safe is None or _UNSAFE_SYNTAX.search(command):
+            return False
+        segments = [s.strip() for s in _SEGMENTS.split(command)]
+        return all(s and self._segment_read_only(s) for s in segments)
+
+    def _segment_read_only(self, segment):
+        try:
+            words = shlex.split(segment)
+        except ValueError:
+            return False
+        for prefix, spec in self.safe.items():
+            if tuple(words[:len(prefix)]) == prefix:
+                return options_allowed(spec, words[len(prefix):])
+        return False
+
+    def check(self, tool_name, tool_input):
+        """Return (allowed, reason) for a tool call, asking the user if needed."""
+        start = time.monotonic()
+        if tool_name == "run_bash":
+            subject = tool_input.get("command", "")
+            allowed, reason, source = self._check_command(subject)
+        elif tool_name in ("write_file", "apply_edits"):
+            if tool_name == "write_file":
+                paths = [tool_input.get("path", "")]
+            else:
+                paths = sorted({edit.get("path", "") for edit in tool_input.get("edits", [])})
+            subject = ", ".join(paths)
+            allowed, reason, source = self._check_write(tool_name, paths)
+        else:
+            return True, None
+        self._record(tool_name, subject, allowed, source, time.monotonic() - start)
+        return allowed, reason
+
+    def _check_command(self, command):
+        risk = self.risk_of(command)
+        if risk is None and self.is_read_only(command):
+            return True, None, "read-only"
+        with self.lock:
+            if command in self.commands:
+                return True, None, "remembered"
+        answer = self._prompt("run_bash", command, risk)
+        if answer.lower() not in ("y", "a"):
+            return False, answer or "User denied permission", "user"
+        with self.lock:
+            self.commands.add(command)
+        return True, None, "user"
+
+    def _check_write(self, tool_name, paths):
+        real = [os.path.realpath(p) for p in paths]
+        with self.lock:
+            scopes = self.write_scopes + sorted(self.prefixes)
+            if all(any(_within(p, scope) for scope in scopes) for p in real):
+                return True, None, "scope"
+            if all(p in self.paths for p in real):
+                return True, None, "remembered"
+        answer = self._prompt(tool_name, ", ".join(paths), None).lower()
+        if answer not in ("y", "a"):
+            return False, "User denied permission", "user"
+        with self.lock:
+            self.paths.update(real)
+            if answer == "a":
+                self.prefixes.update(os.path.dirname(p) for p in real)
+        return True, None, "user"
+
+    def _prompt(self, tool_name, subject, risk):
+        start = time.monotonic()
+        try:
+            return self.ask(tool_name, subject, risk).strip()
+        finally:
+            with self.lock:
+                self.prompts += 1
+                self.prompt_wait += time.monotonic() - start
+
+    def _record(self, tool_name, subject, allowed, source, latency):
+        with self.lock:
+            self.decisions += 1
+            if source != "user":
+                self.automatic += 1
+        if not self.log_path:
+            return
+        entry = {"ts": time.time(), "tool": tool_name, "subject": subject,
+                 "decision": "allow" if allowed else "deny", "source": source,
+                 "latency_ms": round(latency * 1000, 3)}
+        try:
+            os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+            with self.lock, open(self.log_path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError:
+            pass
+
+    def summary(self):
+        return (f"{self.decisions} decisions, {self.automatic} automatic, "
+                f"{self.prompts} prompted ({self.prompt_wait:.1f}s waiting on you)")
+
+
+def _within(path, scope):
+    return path == scope or path.startswith(scope.rstrip(os.sep) + os.sep)
@@ -0,0 +1,96 @@
+"""Prompt-caching breakpoints and cache hit accounting for `run_agent`.
+
+The request prefix is tools -> system -> messages. We place three
+`cache_control` breakpoints on it:
+
+1. the last tool schema (caches all tools),
+2. the system prompt (caches tools + system),
+3. the last block of the newest message, which moves forward every turn.
+   The API looks back from a breakpoint for the longest cached prefix, so
+   each turn reads everything up to the previous turn from the cache and
+   only pays full price for the newest tool results.
+
+Prefixes shorter than the model's minimum cacheable length are simply not
+cached; the breakpoints are harmless there.
+"""
+
+EPHEMERAL = {"type": "ephemeral"}
+
+
+def cached_tools(tools):
+    """Tool schemas with a breakpoint after the last one."""
+    if not tools:
+        return tools
+    return tools[:-1] + [dict(tools[-1], cache_control=EPHEMERAL)]
+
+
+def cached_system(text):
+    return [{"type": "text", "text": text, "cache_control": EPHEMERAL}]
+
+
+def _as_dict(block):
+    if isinstance(block, dict):
+        return block
+    return block.model_dump(exclude_none=True)
+
+
+def with_message_breakpoint(messages):
+    """Copy of `messages` with a breakpoint on the newest content block.
+
+    Only the last message is copied; the stored history is left untouched so
+    breakpoints from earlier turns do not pile up (the API allows four).
+    """
+    if not messages:
+        return messages
+    last = messages[-1]
+    content = last["content"]
+    if isinstance(content, str):
+        content = [{"type": "text", "text": content}]
+    if not content:
+        return messages
+    content = [_as_dict(block) for block in content]
+    content[-1] = dict(content[-1], cache_control=EPHEMERAL)
+    return messages[:-1] + [dict(last, content=content)]
+
+
+class CacheStats:
+    """Accumulates prompt-cache usage from `response.usage` across turns."""
+
+    def __init__(self):
+        self.turns = []
+
+    def record(self, usage):
+        turn = {
+            "input_tokens": getattr(usage, "input_tokens", 0) or 0,
+            "cache_read_input_tokens": getattr(usage, "cache_read_input_tokens", 0) or 0,
+            "cache_creation_input_tokens": getattr(usage, "cache_creation_input_tokens", 0) or 0,
+            "output_tokens": getattr(usage, "output_tokens", 0) or 0,
+        }
+        self.turns.append(turn)
+        return turn
+
+    def total(self, key):
+        return sum(turn[key] for turn in self.turns)
+
+    @property
+    def hits(self):
+        return sum(1 for turn in self.turns if turn["cache_read_input_tokens"])
+
+    @property
+    def prompt_tokens(self):
+        return (self.total("input_tokens") + self.total("cache_read_input_tokens")
+                + self.total("cache_creation_input_tokens"))
+
+    def summary(self):
+        prompt = self.prompt_tokens
+        read = self.total("cache_read_input_tokens")
+        share = 100 * read / prompt if prompt else 0
+        return (
+            f"{self.hits}/{len(self.turns)} turns hit the cache, "
+            f"{read}/{prompt} prompt tokens read from cache ({share:.0f}%), "
+            f"{self.total('cache_creation_input_tokens')} written"
+        )
+
+
+# Usage of every request in this process, including subagents.
+SESSION_STATS = CacheStats()
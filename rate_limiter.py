@@ -0,0 +1,245 @@
+"""Process-wide scheduler for Messages API calls: rate limits, retries, priority.
+
+Every API call of every agent and subagent goes through `LIMITER.call()`.
+Before sending, a call waits until three token buckets have room:
+
+    requests       1 per call                 (requests per minute)
+    input_tokens   the request's estimate     (input tokens per minute)
+    output_tokens  settled after the response (output tokens per minute)
+
+The buckets know nothing until the API tells them: client_pool feeds every
+response's `anthropic-ratelimit-*` headers to `LIMITER.observe()`, which
+sets each bucket's capacity (the limit) and level (what remains). Buckets
+refill continuously at limit/60 per second in between. AGENT_RPM,
+AGENT_ITPM and AGENT_OTPM preset the limits, e.g. to stay below the
+organization's share for one machine.
+
+Waiting callers are served shallowest agent first (then in arrival order),
+so the top-level agent is not starved by its own subagents.
+
+429 (rate limited), 529 (overloaded), 5xx and connection errors are retried
+up to AGENT_MAX_RETRIES times with jittered exponential backoff, or after
+the server's `retry-after`. A 429 or 529 pauses every caller, not just the
+one that got it, so the process stops hammering the API as a whole. An
+`event: error` in the middle of a stream arrives on a 200 response, so
+errors are classified by their body's error type (ERROR_TYPES) first; a
+connection that drops while a stream is read raises a bare httpx transport
+error, which is retried like any connection error. The SDK's own retries
+are turned off in client_pool so there is one policy.
+"""
+
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+
+MAX_RETRIES = int(os.getenv("AGENT_MAX_RETRIES", "8"))
+BACKOFF_BASE_SEC = float(os.getenv("AGENT_BACKOFF_BASE_SEC", "1.0"))
+BACKOFF_MAX_SEC = float(os.getenv("AGENT_BACKOFF_MAX_SEC", "60"))
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504, 529}
+PAUSE_STATUSES = {429, 529}
+# Status a streamed `event: error` of each type stands for.
+ERROR_TYPES = {"overloaded_error": 529, "rate_limit_error": 429, "api_error": 500}
+HEADER_PREFIX = "anthropic-ratelimit-"
+WINDOW_SEC = 60  # the API's limits are per minute
+BUCKETS = {"requests": "AGENT_RPM", "input_tokens": "AGENT_ITPM", "output_tokens": "AGENT_OTPM"}
+
+
+class TokenBucket:
+    """A per-window limit that refills continuously; unlimited until known."""
+
+    def __init__(self, limit=None, window_sec=WINDOW_SEC):
+        self.capacity = None
+        self.level = 0.0
+        self.window_sec = window_sec
+        self.updated = time.monotonic()
+        self.observed = 0.0  # when the API last reported this bucket
+        if limit:
+            self.set_limit(limit, limit)
+
+    def set_limit(self, limit, remaining=None):
+        self._refill()
+        known = self.capacity is not None
+        self.capacity = float(limit)
+        if remaining is None:
+            self.level = min(self.capacity, self.level)
+        elif known:
+            # Headers of responses that overlapped later sends are stale
+            # (too high); only ever lower the level, refill raises it.
+            self.level = min(self.level, float(remaining))
+        else:
+            self.level = min(self.capacity, float(remaining))
+
+    def _refill(self, now=None):
+        now = time.monotonic() if now is None else now
+        if self.capacity:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / self.window_sec)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` (capped at capacity) is available."""
+        if not self.capacity:
+            return 0.0
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing * self.window_sec / self.capacity)
+
+    def take(self, amount):
+        if self.capacity:
+            self._refill()
+            # May go negative: later callers wait until the debt is refilled.
+            self.level = min(self.capacity, self.level - amount)
+
+
+def _status(error):
+    body = getattr(error, "body", None)
+    if isinstance(body, dict) and isinstance(body.get("error"), dict):
+        status = ERROR_TYPES.get(body["error"].get("type"))
+        if status:
+            return status
+    status = getattr(error, "status_code", None)
+    if status is None:
+        # APIConnectionError / APITimeoutError carry no status; neither do
+        # httpx errors raised while iterating a stream (not imported here).
+        names = {(cls.__module__.split(".")[0], cls.__name__) for cls in type(error).__mro__}
+        if names & {("anthropic", "APIConnectionError"), ("anthropic", "APITimeoutError"),
+                    ("httpx", "TransportError")}:
+            return 0
+        return None
+    return status
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    for name, scale in (("retry-after-ms", 1000.0), ("retry-after", 1.0)):
+        try:
+            return float(headers[name]) / scale
+        except (KeyError, TypeError, ValueError):
+            continue
+    return None
+
+
+class RateLimiter:
+    def __init__(self, limits=None, max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE_SEC,
+                 backoff_max=BACKOFF_MAX_SEC, window_sec=WINDOW_SEC):
+        if limits is None:
+            limits = {name: float(os.getenv(env) or 0) for name, env in BUCKETS.items()}
+        self.buckets = {name: TokenBucket(limits.get(name), window_sec) for name in BUCKETS}
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.cond = threading.Condition()
+        self.waiting = []
+        self.seq = itertools.count()
+        self.paused_until = 0.0
+        self.stats = {"calls": 0, "retries": 0, "failed": 0, "wait_sec": 0.0, "by_status": {}}
+
+    def _wait_time(self, input_tokens, now):
+        return max(self.paused_until - now,
+                   self.buckets["requests"].wait_time(1, now),
+                   self.buckets["input_tokens"].wait_time(input_tokens, now),
+                   # Output is only known afterwards; wait out any overdraft.
+                   self.buckets["output_tokens"].wait_time(0, now))
+
+    def acquire(self, depth=0, input_tokens=0):
+        """Block until this call may be sent; shallower depths go first.
+
+        Returns the send time, for `settle`.
+        """
+        ticket = (depth, next(self.seq))
+        start = time.monotonic()
+        with self.cond:
+            heapq.heappush(self.waiting, ticket)
+            try:
+                while True:
+                    timeout = None
+                    if self.waiting[0] == ticket:
+                        now = time.monotonic()
+                        timeout = self._wait_time(input_tokens, now)
+                        if timeout <= 0:
+                            self.buckets["requests"].take(1)
+                            self.buckets["input_tokens"].take(input_tokens)
+                            self.stats["wait_sec"] += now - start
+                            return now
+                    self.cond.wait(timeout)
+            finally:
+                self.waiting.remove(ticket)
+                heapq.heapify(self.waiting)
+                self.cond.notify_all()
+
+    def settle(self, usage, input_tokens, sent):
+        """Correct the input estimate and charge output once usage is known.
+
+        Buckets the API reported on since `sent` already include this call.
+        """
+        if usage is None:
+            return
+        actual = {"input_tokens": (getattr(usage, "input_tokens", 0) or 0) - input_tokens,
+                  "output_tokens": getattr(usage, "output_tokens", 0) or 0}
+        with self.cond:
+            for name, amount in actual.items():
+                if self.buckets[name].observed < sent:
+                    self.buckets[name].take(amount)
+
+    def observe(self, headers):
+        """Update the buckets from a response's anthropic-ratelimit-* headers."""
+        with self.cond:
+            for name, bucket in self.buckets.items():
+                limit = headers.get(f"{HEADER_PREFIX}{name.replace('_', '-')}-limit")
+                remaining = headers.get(f"{HEADER_PREFIX}{name.replace('_', '-')}-remaining")
+                try:
+                    if limit is not None:
+                        bucket.set_limit(float(limit), None if remaining is None else float(remaining))
+                        bucket.observed = time.monotonic()
+                except ValueError:
+                    pass
+            self.cond.notify_all()
+
+    def backoff(self, attempt, error):
+        delay = _retry_after(error)
+        if delay is None:
+            # Jitter keeps parallel subagents from retrying in lockstep.
+            delay = random.uniform(0.5, 1.0) * min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        if _status(error) in PAUSE_STATUSES:
+            with self.cond:
+                self.paused_until = max(self.paused_until, time.monotonic() + delay)
+                self.cond.notify_all()
+        return delay
+
+    def call(self, send, depth=0, input_tokens=0):
+        """Run `send()` under the limits, retrying transient API errors."""
+        for attempt in range(self.max_retries + 1):
+            sent = self.acquire(depth, input_tokens)
+            try:
+                response = send()
+            except Exception as e:
+                status = _status(e)
+                if status is None or (status and status not in RETRY_STATUSES):
+                    raise
+                with self.cond:
+                    self.stats["by_status"][status] = self.stats["by_status"].get(status, 0) + 1
+                    if attempt == self.max_retries:
+                        self.stats["failed"] += 1
+                        raise
+                    self.stats["retries"] += 1
+                delay = self.backoff(attempt, e)
+                print(f"\n⏳ API {status or 'connection error'}, retrying in {delay:.1f}s "
+                      f"(attempt {attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+                continue
+            with self.cond:
+                self.stats["calls"] += 1
+            self.settle(getattr(response, "usage", None), input_tokens, sent)
+            return response
+
+    def summary(self):
+        s = self.stats
+        statuses = ", ".join(f"{k or 'conn'}×{v}" for k, v in sorted(s["by_status"].items()))
+        return (f"{s['calls']} calls, {s['retries']} retries{f' ({statuses})' if statuses else ''}, "
+                f"{s['failed']} failed, {s['wait_sec']:.1f}s waiting for limits")
+
+
+LIMITER = RateLimiter()
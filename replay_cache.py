@@ -0,0 +1,183 @@
+"""Record/replay cache for Messages API calls, keyed by a request hash.
+
+    AGENT_REPLAY_MODE=record        call the API and store every response
+    AGENT_REPLAY_MODE=replay        answer from the store only; a request
+                                    that was never recorded is an error
+    AGENT_REPLAY_MODE=passthrough   (default) no caching at all
+
+The key is a SHA-256 of the request (model, system, tools, messages, ...)
+serialized with sorted keys, so dict ordering does not matter; SDK content
+blocks in `messages` are dumped to plain JSON first. Values that differ on
+every run (VOLATILE: run_bash timings, temp-file spill paths) are replaced
+by placeholders before hashing. Otherwise a replayed session only hits if
+every tool result is identical to the recorded run, which makes it a strict
+regression check of the local loop and tools.
+
+Responses live in AGENT_REPLAY_DIR, one JSON file per request. Reads bump a
+file's mtime; when the store grows past AGENT_REPLAY_MAX_MB the least
+recently used files are deleted. Streaming is turned off while recording or
+replaying, so every turn is a single create() call.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+
+REPLAY_MODE = os.getenv("AGENT_REPLAY_MODE", "passthrough")
+REPLAY_DIR = os.getenv("AGENT_REPLAY_DIR",
+                       os.path.join(os.path.expanduser("~"), ".cache", "agent-zero", "replay"))
+MAX_STORE_BYTES = int(float(os.getenv("AGENT_REPLAY_MAX_MB", "512")) * (1 << 20))
+MODES = ("record", "replay", "passthrough")
+# (pattern, placeholder) for tool output that changes from run to run.
+VOLATILE = [
+    # CommandResult trailer: "[exit code 0; 0.12s" and "timed out after 30s".
+    (re.compile(r"(\[(?:exit code -?\d+|timed out after \d+s, killed)); \d+\.\d+s"), r"\1; <elapsed>s"),
+    (re.compile(r"timed out after \d+s"), "timed out after <timeout>s"),
+    # bash_runner spill files: mkdtemp dir, mkstemp name.
+    (re.compile(r"[^\s\"']*/agent-bash-\w+/(stdout|stderr)-\w+\.log"), r"<spill>/\1.log"),
+]
+
+
+class ReplayMiss(Exception):
+    """Replay mode got a request that was never recorded."""
+
+
+def _plain(value):
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json", exclude_none=True)
+    raise TypeError(f"cannot serialize {type(value).__name__}")
+
+
+def request_key(request):
+    """Stable hash of a Messages API request, ignoring VOLATILE values."""
+    data = json.dumps(request, sort_keys=True, separators=(",", ":"), default=_plain)
+    for pattern, placeholder in VOLATILE:
+        data = pattern.sub(placeholder, data)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class ResponseStore:
+    def __init__(self, directory=REPLAY_DIR, max_bytes=MAX_STORE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.size = sum(entry.stat().st_size for entry in os.scandir(directory)
+                        if entry.name.endswith(".json"))
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)  # most recently used
+        except OSError:
+            pass
+        return data
+
+    def put(self, key, data):
+        import tempfile  # deferred: only recording writes
+        payload = json.dumps(data)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(payload)
+        path = self._path(key)
+        with self.lock:
+            try:
+                self.size -= os.path.getsize(path)
+            except OSError:
+                pass
+            os.replace(tmp, path)
+            self.size += len(payload.encode("utf-8"))
+            if self.size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        entries = sorted((e for e in os.scandir(self.directory) if e.name.endswith(".json")),
+                         key=lambda e: e.stat().st_mtime)
+        # Down to 90% so eviction does not run on every write.
+        for entry in entries:
+            if self.size <= self.max_bytes * 0.9:
+                break
+            try:
+                size = entry.stat().st_size
+                os.unlink(entry.path)
+                self.size -= size
+            except OSError:
+                pass
+
+
+class _ReplayMessages:
+    def __init__(self, messages, mode, store, stats):
+        self._messages = messages
+        self.mode = mode
+        self.store = store
+        self.stats = stats
+
+    def create(self, **request):
+        key = request_key(request)
+        if self.mode == "replay":
+            data = self.store.get(key)
+            if data is None:
+                self.stats["misses"] += 1
+                raise ReplayMiss(f"no recorded response for request {key[:12]} "
+                                 f"(store: {self.store.directory})")
+            self.stats["hits"] += 1
+            from anthropic.types import Message
+            return Message.model_validate(data)
+        response = self._messages.create(**request)
+        self.store.put(key, response.model_dump(mode="json"))
+        self.stats["recorded"] += 1
+        return response
+
+    def __getattr__(self, name):
+        # count_tokens, stream, with_raw_response, ... are not cached.
+        return getattr(self._messages, name)
+
+
+class ReplayClient:
+    """Wraps an Anthropic client; only messages.create is recorded/replayed."""
+
+    def __init__(self, client, mode, store):
+        self._client = client
+        self.stats = {"hits": 0, "misses": 0, "recorded": 0}
+        self.messages = _ReplayMessages(client.messages, mode, store, self.stats)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+_wrapped = None
+_lock = threading.Lock()
+
+
+def active():
+    return REPLAY_MODE in ("record", "replay")
+
+
+def wrap(client):
+    """`client` wrapped for the configured mode (itself in passthrough mode)."""
+    global _wrapped
+    if REPLAY_MODE not in MODES:
+        raise ValueError(f"AGENT_REPLAY_MODE must be one of {', '.join(MODES)}, not {REPLAY_MODE!r}")
+    if not active():
+        return client
+    with _lock:
+        if _wrapped is None or _wrapped._client is not client:
+            _wrapped = ReplayClient(client, REPLAY_MODE, ResponseStore())
+        return _wrapped
+
+
+def summary():
+    if _wrapped is None:
+        return None
+    s = _wrapped.stats
+    return f"{REPLAY_MODE}: {s['hits']} replayed, {s['misses']} missing, {s['recorded']} recorded"
@@ -0,0 +1,189 @@
+"""Token budgets for tool results, with oversized output spilled to disk.
+
+Every result passes through `shape_turn` between tool execution and the
+tool_result blocks of the next request. Tokens are estimated locally
+(CHARS_PER_TOKEN). Two budgets apply:
+
+    AGENT_MAX_RESULT_TOKENS        one result (default 8000)
+    AGENT_MAX_TURN_RESULT_TOKENS   all results of one turn together (default 24000)
+
+Small results always go through untouched. If a turn's results do not fit,
+the budget is shared out smallest first, so one huge output cannot starve
+the others. Shares are at least MIN_PREVIEW_TOKENS while the turn budget
+lasts and zero after, so a turn stays within its budget plus one short
+omission note per spilled result. A result over its share is saved in a
+per-process content store, and the model gets a head and tail preview plus
+a handle. The new read_result(handle, offset) tool pages through the saved
+text. The store is capped at AGENT_RESULT_STORE_MB; the oldest results are
+dropped first.
+
+run_bash bounds its own output (head/tail capture), but read_file returns
+files up to AGENT_MAX_FULL_READ_BYTES (256 KB, ~64k tokens) whole, and
+only pages larger ones; this layer is what keeps those, and every other
+tool's output, subagents included, within budget. agent-v3 dedupes repeat
+reads after shaping, so a reference always points at what was sent.
+read_result pages (UNSHAPED_TOOLS) are never shaped again, or a busy turn
+would spill a page under a new handle and paging would never converge;
+they still count against the turn budget of the other results.
+"""
+
+import atexit
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from context_compaction import CHARS_PER_TOKEN
+
+MAX_RESULT_TOKENS = int(os.getenv("AGENT_MAX_RESULT_TOKENS", "8000"))
+MAX_TURN_TOKENS = int(os.getenv("AGENT_MAX_TURN_RESULT_TOKENS", "24000"))
+MAX_STORE_BYTES = int(os.getenv("AGENT_RESULT_STORE_MB", "256")) * (1 << 20)
+# A preview smaller than this is useless; budgets never go below it.
+MIN_PREVIEW_TOKENS = 256
+# Share of a preview taken from the head; the rest comes from the tail.
+HEAD_SHARE = 0.6
+PAGE_CHARS = MAX_RESULT_TOKENS * CHARS_PER_TOKEN // 2
+# Already bounded by PAGE_CHARS.
+UNSHAPED_TOOLS = {"read_result"}
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN
+
+
+class ShapingStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.results = 0
+        self.spilled = 0
+        self.tokens_saved = 0
+
+    def summary(self):
+        return (f"{self.spilled}/{self.results} tool results over budget, "
+                f"~{self.tokens_saved} tokens kept out of context")
+
+
+SESSION_STATS = ShapingStats()
+
+
+class ResultStore:
+    """Full text of spilled results, by handle, in a per-process temp dir."""
+
+    def __init__(self, max_bytes=MAX_STORE_BYTES):
+        self.max_bytes = max_bytes
+        self.directory = None
+        self.sizes = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+    def _dir(self):
+        if self.directory is None:
+            # Deferred: most sessions never spill.
+            import shutil
+            import tempfile
+            self.directory = tempfile.mkdtemp(prefix="agent-results-")
+            atexit.register(shutil.rmtree, self.directory, True)
+        return self.directory
+
+    def _path(self, handle):
+        return os.path.join(self._dir(), handle + ".txt")
+
+    def put(self, text):
+        data = text.encode("utf-8")
+        # Content-addressed: the same output twice is stored once.
+        handle = "r-" + hashlib.sha256(data).hexdigest()[:16]
+        with self.lock:
+            if handle in self.sizes:
+                self.sizes.move_to_end(handle)
+                return handle
+            with open(self._path(handle), "wb") as f:
+                f.write(data)
+            self.sizes[handle] = len(data)
+            self.bytes += len(data)
+            while self.bytes > self.max_bytes and len(self.sizes) > 1:
+                old, size = self.sizes.popitem(last=False)
+                self.bytes -= size
+                try:
+                    os.unlink(self._path(old))
+                except OSError:
+                    pass
+        return handle
+
+    def read(self, handle, offset=0, length=PAGE_CHARS):
+        """One page of a stored result, with a header saying where it is."""
+        with self.lock:
+            known = handle in self.sizes
+        if not known:
+            return f"Error: unknown or expired result handle {handle!r}"
+        with open(self._path(handle), "r", encoding="utf-8") as f:
+            text = f.read()
+        offset = max(0, offset or 0)
+        end = min(len(text), offset + max(1, min(length or PAGE_CHARS, PAGE_CHARS)))
+        header = f"[Chars {offset:,}-{end:,} of {len(text):,} in {handle}"
+        if end < len(text):
+            header += f"; pass offset={end} to continue"
+        return header + "]\n" + text[offset:end]
+
+
+STORE = ResultStore()
+
+
+def _cut(text, chars, from_end=False):
+    """`chars` characters from one end, trimmed to whole lines when possible."""
+    if from_end:
+        piece = text[len(text) - chars:]
+        newline = piece.find("\n")
+        return piece[newline + 1:] if 0 <= newline < len(piece) // 2 else piece
+    piece = text[:chars]
+    newline = piece.rfind("\n")
+    return piece[:newline + 1] if newline > len(piece) // 2 else piece
+
+
+def preview(text, budget_tokens, handle):
+    chars = budget_tokens * CHARS_PER_TOKEN
+    head = _cut(text, int(chars * HEAD_SHARE))
+    tail = _cut(text, chars - len(head), from_end=True)
+    omitted = len(text) - len(head) - len(tail)
+    note = (f"[... {omitted:,} of {len(text):,} chars (~{estimate_tokens(text):,} tokens) omitted; "
+            f"full result saved as {handle}, page it with "
+            f"read_result(handle=\"{handle}\", offset={len(head)}) ...]")
+    separator = "" if head.endswith("\n") else "\n"
+    return f"{head}{separator}{note}\n{tail}"
+
+
+def allocate(sizes, per_result=MAX_RESULT_TOKENS, per_turn=MAX_TURN_TOKENS):
+    """Token budget for each of `sizes`, smallest first, within the turn total."""
+    budgets = [0] * len(sizes)
+    remaining = per_turn
+    order = sorted(range(len(sizes)), key=lambda i: sizes[i])
+    for n, i in enumerate(order):
+        share = min(remaining, max(MIN_PREVIEW_TOKENS, remaining // (len(order) - n)))
+        budgets[i] = min(sizes[i], per_result, share)
+        remaining = max(0, remaining - budgets[i])
+    return budgets
+
+
+def shape_turn(results, names=None, store=STORE, stats=SESSION_STATS):
+    """Results of one turn, each within its share of the token budgets.
+
+    `names` are the tools that produced `results`; UNSHAPED_TOOLS results
+    pass through as they are.
+    """
+    sizes = [estimate_tokens(r) for r in results]
+    exempt = [name in UNSHAPED_TOOLS for name in names or [None] * len(results)]
+    shaped_sizes = [size for size, skip in zip(sizes, exempt) if not skip]
+    unshaped_tokens = sum(size for size, skip in zip(sizes, exempt) if skip)
+    budgets = iter(allocate(shaped_sizes, per_turn=max(0, MAX_TURN_TOKENS - unshaped_tokens)))
+    shaped = []
+    for result, size, skip in zip(results, sizes, exempt):
+        budget = size if skip else next(budgets)
+        if size <= budget:
+            shaped.append(result)
+            continue
+        shaped.append(preview(result, budget, store.put(result)))
+        with stats.lock:
+            stats.spilled += 1
+            stats.tokens_saved += size - estimate_tokens(shaped[-1])
+    with stats.lock:
+        stats.results += len(results)
+    return shaped
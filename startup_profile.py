@@ -0,0 +1,98 @@
+"""Import-time breakdown of agent startup (`agent-v3.py --profile-startup`).
+
+Runs a fresh interpreter under `python -X importtime` that goes through
+the startup path in three phases and times each one:
+
+    agent       importing agent-v3.py (what every run pays up front)
+    client      first use of the API client (imports anthropic, httpx, ...)
+    tools       first use of every registered tool (imports tool modules)
+
+The importtime log is then folded into the slowest top-level imports and
+self time per package.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+TOP_N = 15
+
+_CHILD = r"""
+import importlib.util, json, sys, time
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location("agent_v3", sys.argv[1])
+agent = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(agent)
+phases = {"agent": time.perf_counter() - start}
+if "--agent-only" not in sys.argv:
+    start = time.perf_counter()
+    agent.client_pool.get_client()
+    phases["client"] = time.perf_counter() - start
+    start = time.perf_counter()
+    for name in list(agent.REGISTRY.specs):
+        agent.REGISTRY.handler(name)
+    phases["tools"] = time.perf_counter() - start
+print(json.dumps(phases))
+"""
+
+
+def parse_importtime(log):
+    """[(depth, name, self_us, cumulative_us)] from `-X importtime` output."""
+    imports = []
+    for line in log.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the header line
+        name = fields[2].rstrip()
+        stripped = name.lstrip()
+        depth = (len(name) - len(stripped) - 1) // 2
+        imports.append((depth, stripped, int(fields[0]), int(fields[1])))
+    return imports
+
+
+def profile(agent_path, agent_only=False):
+    """Run the startup path in a child interpreter; returns (phases, imports)."""
+    env = dict(os.environ)
+    env.setdefault("ANTHROPIC_API_KEY", "profile-startup")
+    cmd = [sys.executable, "-X", "importtime", "-c", _CHILD, agent_path]
+    if agent_only:
+        cmd.append("--agent-only")
+    proc = subprocess.run(cmd, capture_output=True, text=True, env=env,
+                          cwd=os.path.dirname(agent_path))
+    if proc.returncode != 0:
+        errors = [line for line in proc.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError("startup failed:\n" + "\n".join(errors[-20:]))
+    return json.loads(proc.stdout.strip().splitlines()[-1]), parse_importtime(proc.stderr)
+
+
+def format_report(phases, imports, top_n=TOP_N):
+    lines = ["Startup phases:"]
+    for name, seconds in phases.items():
+        lines.append(f"  {name:<8}{seconds * 1000:>9.1f} ms")
+
+    lines.append("\nSlowest top-level imports (cumulative):")
+    top = sorted((i for i in imports if i[0] == 0), key=lambda i: i[3], reverse=True)
+    for _, name, _, cumulative in top[:top_n]:
+        lines.append(f"  {cumulative / 1000:>9.1f} ms  {name}")
+
+    packages = {}
+    for _, name, self_us, _ in imports:
+        root = name.split(".")[0]
+        packages[root] = packages.get(root, 0) + self_us
+    lines.append("\nSelf time by package:")
+    for root, self_us in sorted(packages.items(), key=lambda p: p[1], reverse=True)[:top_n]:
+        lines.append(f"  {self_us / 1000:>9.1f} ms  {root}")
+    return "\n".join(lines)
+
+
+def main(agent_path):
+    try:
+        phases, imports = profile(agent_path)
+    except RuntimeError as e:
+        print(e)
+        return 1
+    print(format_report(phases, imports))
+    return 0
@@ -0,0 +1,149 @@
+"""Concurrent execution of delegated sub-agents.
+
+Each sub-agent runs on its own thread with its own output buffer, so the
+emoji log of three parallel sub-agents is printed as three readable blocks
+instead of being interleaved. A process-wide semaphore caps how many
+sub-agents make progress at once; an agent that is waiting on its own
+children gives its slot back while it waits, so nested delegation can never
+deadlock on the limit. Every sub-agent also gets a wall-clock deadline that
+`run_agent` checks between turns.
+
+A sub-agent still running JOIN_GRACE_SEC past its deadline is abandoned,
+since a thread cannot be killed, and cancelled: from then on `cancelled()`
+is true in it, its tool threads and its own sub-agents, and the agent
+refuses every tool that is not read-only.
+"""
+
+import contextvars
+import io
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+MAX_CONCURRENT_SUBAGENTS = int(os.getenv("AGENT_MAX_SUBAGENTS", "4"))
+SUBAGENT_TIME_BUDGET_SEC = float(os.getenv("AGENT_SUBAGENT_BUDGET_SEC", "600"))
+# Extra time given to a sub-agent past its deadline to finish its current turn.
+JOIN_GRACE_SEC = 30
+
+_slots = threading.BoundedSemaphore(MAX_CONCURRENT_SUBAGENTS)
+_prompt_lock = threading.Lock()
+_local = threading.local()
+# Cancellation events of the sub-agents this context runs under, outermost
+# first. A ContextVar rather than _local: tool threads run in a copy of the
+# sub-agent's context (tool_scheduler) and must see the same events.
+_cancel_events = contextvars.ContextVar("subagent_cancel_events", default=())
+
+
+class _ThreadLocalStdout:
+    """sys.stdout replacement that routes writes to the thread's buffer, if any."""
+
+    def __init__(self, real):
+        self.real = real
+
+    def write(self, text):
+        buffer = getattr(_local, "buffer", None)
+        return (buffer or self.real).write(text)
+
+    def flush(self):
+        if getattr(_local, "buffer", None) is None:
+            self.real.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.real, name)
+
+
+def _install_output_capture():
+    if not isinstance(sys.stdout, _ThreadLocalStdout):
+        sys.stdout = _ThreadLocalStdout(sys.stdout)
+
+
+def current_deadline():
+    """monotonic() deadline of the sub-agent running on this thread, or None."""
+    return getattr(_local, "deadline", None)
+
+
+def cancelled():
+    """Whether the sub-agent running in this context (or one above it) was abandoned."""
+    return any(event.is_set() for event in _cancel_events.get())
+
+
+@contextmanager
+def terminal():
+    """Talk to the user directly, one prompt at a time, from any agent thread."""
+    with _prompt_lock:
+        buffer = getattr(_local, "buffer", None)
+        _local.buffer = None
+        try:
+            yield
+        finally:
+            _local.buffer = buffer
+
+
+def _run_one(func, deadline, outcome, cancel):
+    _local.buffer = io.StringIO()
+    _local.deadline = deadline
+    _cancel_events.set(_cancel_events.get() + (cancel,))
+    _slots.acquire()
+    _local.holds_slot = True
+    try:
+        outcome["result"] = func()
+    except Exception as e:
+        outcome["result"] = f"Error: {e}"
+    finally:
+        _local.holds_slot = False
+        _slots.release()
+        outcome["output"] = _local.buffer.getvalue()
+
+
+def run_batch(funcs, budget=SUBAGENT_TIME_BUDGET_SEC):
+    """Run sub-agent callables concurrently and return their results in order.
+
+    Captured output is printed afterwards, one block per sub-agent, in order.
+    """
+    _install_output_capture()
+    deadline = time.monotonic() + budget
+    parent_deadline = current_deadline()
+    if parent_deadline is not None:
+        deadline = min(deadline, parent_deadline)
+
+    outcomes = [{} for _ in funcs]
+    cancels = [threading.Event() for _ in funcs]
+    # Each thread runs in a copy of our context, so tracing spans nest under the caller.
+    threads = [
+        threading.Thread(target=contextvars.copy_context().run,
+                         args=(_run_one, func, deadline, outcome, cancel), daemon=True)
+        for func, outcome, cancel in zip(funcs, outcomes, cancels)
+    ]
+
+    # Give our own slot back while we only wait on children.
+    holds_slot = getattr(_local, "holds_slot", False)
+    if holds_slot:
+        _slots.release()
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(max(0, deadline - time.monotonic()) + JOIN_GRACE_SEC)
+    finally:
+        if holds_slot:
+            _slots.acquire()
+
+    for thread, cancel in zip(threads, cancels):
+        if thread.is_alive():
+            cancel.set()
+
+    results = []
+    for i, outcome in enumerate(outcomes, 1):
+        if "output" in outcome:
+            output = outcome["output"].rstrip("\n")
+            if output:
+                print(f"\n┌─ subagent {i}/{len(funcs)}")
+                print("\n".join("│ " + line for line in output.splitlines()))
+                print("└─")
+        if "result" in outcome:
+            results.append(outcome["result"])
+        else:
+            results.append(f"Error: Subagent exceeded its time budget of {budget:.0f}s.")
+    return results
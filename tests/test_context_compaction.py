@@ -0,0 +1,78 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from context_compaction import SUMMARY_HEADER, ContextCompactor
+
+
+def conversation(turns, calls_per_turn=2, result_chars=4000):
+    messages = [{"role": "user", "content": "Fix the failing tests"}]
+    for turn in range(turns):
+        ids = [f"tu_{turn}_{k}" for k in range(calls_per_turn if turn % 3 else 1)]
+        messages.append({"role": "assistant", "content": [{"type": "text", "text": f"Step {turn}"}] + [
+            {"type": "tool_use", "id": i, "name": "read_file", "input": {"path": f"f{i}.py"}} for i in ids]})
+        messages.append({"role": "user", "content": [
+            {"type": "tool_result", "tool_use_id": i, "content": "x" * result_chars} for i in ids]})
+    return messages
+
+
+def assert_valid(messages):
+    assert messages[0]["role"] == "user"
+    for previous, message in zip(messages, messages[1:]):
+        assert previous["role"] != message["role"]
+    for index, message in enumerate(messages):
+        if message["role"] != "user" or isinstance(message["content"], str):
+            continue
+        results = {b["tool_use_id"] for b in message["content"] if b["type"] == "tool_result"}
+        if not results:
+            continue
+        calls = {b["id"] for b in messages[index - 1]["content"] if b["type"] == "tool_use"}
+        assert index > 0 and results == calls
+
+
+@pytest.mark.parametrize("budget,max_messages", [(3000, None), (8000, None), (20000, None), (10**6, 12)])
+def test_compaction_keeps_every_tool_result_after_its_tool_use(budget, max_messages):
+    elided = []
+    compactor = ContextCompactor(overhead_tokens=500, budget=budget, max_messages=max_messages,
+                                 on_elide=elided.append)
+    messages = conversation(3)
+    for turn in range(3, 40):
+        compactor.compact(messages)
+        assert_valid(messages)
+        messages += conversation(turn + 1)[-2:]
+    assert compactor.compactions > 0
+    intact = {b["tool_use_id"] for m in messages if m["role"] == "user" and not isinstance(m["content"], str)
+              for b in m["content"] if not b["content"].startswith("[Elided")}
+    assert elided and not intact & set(elided)
+
+
+def test_a_long_session_is_summarized_at_an_assistant_turn():
+    compactor = ContextCompactor(budget=3000)
+    messages = conversation(30)
+    assert compactor.compact(messages)
+    assert messages[0]["content"].startswith(SUMMARY_HEADER)
+    assert messages[1]["role"] == "assistant"
+    assert_valid(messages)
+
+
+def test_recent_results_are_left_intact():
+    compactor = ContextCompactor(budget=2000)
+    messages = conversation(20)
+    recent = [dict(m) for m in messages[-6:]]
+    assert compactor.compact(messages)
+    assert messages[-6:] == recent
+
+
+def test_elided_ids_are_reported():
+    elided = []
+    compactor = ContextCompactor(budget=5000, on_elide=elided.append)
+    messages = conversation(20)
+    before = {b["tool_use_id"] for m in messages if m["role"] == "user" and not isinstance(m["content"], str)
+              for b in m["content"]}
+    compactor.compact(messages)
+    intact = {b["tool_use_id"] for m in messages if m["role"] == "user" and not isinstance(m["content"], str)
+              for b in m["content"] if not b["content"].startswith("[Elided")}
+    assert set(elided) == before - intact
@@ -0,0 +1,111 @@
+import os
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools import file_tools
+
+
+@pytest.fixture
+def big_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_tools, "MAX_FULL_READ_BYTES", 1024)
+    path = tmp_path / "big.txt"
+    path.write_text("".join(f"line {i}\n" for i in range(1, 5001)))
+    return str(path)
+
+
+def header(result):
+    return result.split("\n", 1)[0]
+
+
+def test_large_file_is_paged_by_following_the_hint(big_file):
+    result = file_tools.read_file(big_file)
+    assert header(result) == f"[Lines 1-2000 of 5000 in {big_file}; pass offset=2001, limit=2000 to continue]"
+    pages = 1
+    while "to continue" in header(result):
+        offset, limit = map(int, re.search(r"offset=(\d+), limit=(\d+)", header(result)).groups())
+        result = file_tools.read_file(big_file, offset=offset, limit=limit)
+        assert result.count("\n") <= 2001
+        pages += 1
+    assert pages == 3
+    assert header(result) == f"[Lines 4001-5000 of 5000 in {big_file}]"
+    assert result.endswith("line 5000\n")
+
+
+def test_offset_without_limit_reads_one_page(big_file):
+    result = file_tools.read_file(big_file, offset=2001)
+    assert header(result).startswith("[Lines 2001-4000 of 5000")
+    assert "line 4001\n" not in result
+
+
+def test_byte_offset_without_limit_reads_one_page(big_file, monkeypatch):
+    monkeypatch.setattr(file_tools, "DEFAULT_READ_BYTES", 100)
+    result = file_tools.read_file(big_file, byte_offset=100)
+    assert header(result) == (f"[Bytes 100-200 of {os.path.getsize(big_file)} in {big_file}; "
+                              "pass byte_offset=200, byte_limit=100 to continue]")
+
+
+def test_small_file_is_read_whole(tmp_path):
+    path = tmp_path / "small.txt"
+    path.write_text("a\nb\n")
+    assert file_tools.read_file(str(path)) == "a\nb\n"
+
+
+def test_apply_edits_shares_one_buffer_per_real_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.py").write_text("one\ntwo\n")
+    os.symlink("a.py", tmp_path / "link.py")
+    result = file_tools.apply_edits([
+        {"path": "a.py", "old_str": "one", "new_str": "ONE"},
+        {"path": "./a.py", "old_str": "two", "new_str": "TWO"},
+        {"path": "link.py", "old_str": "ONE\n", "new_str": "ONE\nthree\n"},
+    ])
+    assert result.startswith("Applied 3 edits to 1 files")
+    assert (tmp_path / "a.py").read_text() == "ONE\nthree\nTWO\n"
+    assert os.path.islink(tmp_path / "link.py")
+
+
+def test_apply_edits_changes_nothing_when_an_edit_fails(tmp_path):
+    a, b = tmp_path / "a.py", tmp_path / "b.py"
+    a.write_text("alpha\n")
+    b.write_text("beta\n")
+    result = file_tools.apply_edits([
+        {"path": str(a), "old_str": "alpha", "new_str": "ALPHA"},
+        {"path": str(b), "old_str": "gamma", "new_str": "GAMMA"},
+    ])
+    assert result.startswith("No files changed; 1 of 2 edits failed")
+    assert a.read_text() == "alpha\n" and b.read_text() == "beta\n"
+
+
+def test_apply_edits_changes_nothing_when_a_write_fails(tmp_path, monkeypatch):
+    a, b = tmp_path / "a.py", tmp_path / "b.py"
+    a.write_text("alpha\n")
+    b.write_text("beta\n")
+    stage = file_tools._stage
+
+    def failing_stage(path, content):
+        if path.endswith("b.py"):
+            raise OSError("disk full")
+        return stage(path, content)
+
+    monkeypatch.setattr(file_tools, "_stage", failing_stage)
+    result = file_tools.apply_edits([
+        {"path": str(a), "old_str": "alpha", "new_str": "ALPHA"},
+        {"path": str(b), "old_str": "beta", "new_str": "BETA"},
+    ])
+    assert "disk full" in result and "No files changed" in result
+    assert a.read_text() == "alpha\n" and b.read_text() == "beta\n"
+    assert sorted(os.listdir(tmp_path)) == ["a.py", "b.py"]  # no temp files left behind
+
+
+def test_edit_file_writes_through_a_symlink(tmp_path):
+    target = tmp_path / "target.py"
+    target.write_text("x = 1\n")
+    link = tmp_path / "link.py"
+    os.symlink(target, link)
+    file_tools.edit_file(str(link), "x = 1", "x = 2")
+    assert os.path.islink(link)
+    assert target.read_text() == "x = 2\n"
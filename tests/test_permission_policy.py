@@ -0,0 +1,73 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from permission_policy import PermissionPolicy
+
+
+def deny(tool_name, subject, risk):
+    return "n"
+
+
+@pytest.fixture
+def policy():
+    return PermissionPolicy(deny, log_path="")
+
+
+@pytest.mark.parametrize("command", [
+    "fd . --exec touch /tmp/pwned",
+    "fd -x sh -c 'touch /tmp/pwned'",
+    "fd -X rm",
+    "fd . --exec-batch touch",
+    "rg --pre ./evil.sh foo",
+    "rg --pre-glob '*.py' --pre=./evil.sh foo",
+    "ag --pager ./evil.sh foo",
+    "sort -uo out.txt in.txt",
+    "sort --output=out.txt in.txt",
+    "sort --compress-program=./evil.sh in.txt",
+    "uniq in.txt out.txt",
+    "tree -o out.txt",
+    "date -s 2020-01-01",
+    "find . -name '*.py' -exec touch {} ;",
+    "find . -delete",
+    "find . -fprint out.txt",
+    "git remote -v add evil http://x",
+    "git diff --output=out.txt",
+    "git log --ext-diff",
+    "ls 'unterminated",
+])
+def test_commands_that_run_or_write_need_a_prompt(policy, command):
+    assert policy.check("run_bash", {"command": command}) == (False, "n")
+
+
+@pytest.mark.parametrize("command", [
+    "ls -la",
+    "grep -rn foo .",
+    "rg -n --glob '*.py' -C2 foo src",
+    "fd -e py -t f src",
+    "find . -name '*.py' -not -path './.git/*' -type f",
+    "sort -rn -k2 counts.txt | uniq -c | head -n 5",
+    "git log --oneline -n 5",
+    "git log -1 --format=%H",
+    "git diff --stat HEAD~1 -- src",
+    "git remote -v",
+    "cat a.txt 2>/dev/null",
+])
+def test_read_only_commands_are_allowed(policy, command):
+    assert policy.check("run_bash", {"command": command}) == (True, None)
+
+
+def test_extra_safe_commands_take_no_options():
+    policy = PermissionPolicy(deny, extra_commands=["make lint"], log_path="")
+    assert policy.is_read_only("make lint")
+    assert not policy.is_read_only("make lint -j4")
+    assert not policy.is_read_only("make lint-fix")
+
+
+def test_exact_commands_take_no_further_words():
+    policy = PermissionPolicy(deny, classes=["python-info"], log_path="")
+    assert policy.is_read_only("python3 --version")
+    assert not policy.is_read_only("python3 --version evil.py")
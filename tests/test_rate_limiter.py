@@ -0,0 +1,64 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rate_limiter
+from rate_limiter import RateLimiter
+
+
+class APIStatusError(Exception):
+    """Shaped like anthropic.APIStatusError for a mid-stream `event: error`."""
+
+    def __init__(self, error_type, status_code=200):
+        super().__init__(error_type)
+        self.status_code = status_code
+        self.body = {"type": "error", "error": {"type": error_type, "message": "mock"}}
+        self.response = None
+
+
+TransportError = type("TransportError", (Exception,), {"__module__": "httpx"})
+RemoteProtocolError = type("RemoteProtocolError", (TransportError,), {"__module__": "httpx"})
+
+
+@pytest.mark.parametrize("error,status", [
+    (APIStatusError("overloaded_error"), 529),
+    (APIStatusError("rate_limit_error"), 429),
+    (APIStatusError("api_error"), 500),
+    (APIStatusError("invalid_request_error", 400), 400),
+    (RemoteProtocolError("peer closed connection"), 0),
+    (ValueError("bug"), None),
+])
+def test_errors_are_classified_by_type_then_status(error, status):
+    assert rate_limiter._status(error) == status
+
+
+@pytest.mark.parametrize("error", [APIStatusError("overloaded_error"),
+                                   RemoteProtocolError("peer closed connection")])
+def test_mid_stream_failures_are_retried(error, monkeypatch):
+    monkeypatch.setattr(rate_limiter.time, "sleep", lambda seconds: None)
+    limiter = RateLimiter(limits={}, backoff_base=0)
+    attempts = []
+
+    def send():
+        attempts.append(None)
+        if len(attempts) == 1:
+            raise error
+        return "response"
+
+    assert limiter.call(send) == "response"
+    assert len(attempts) == 2
+
+
+def test_client_errors_are_not_retried():
+    attempts = []
+
+    def send():
+        attempts.append(None)
+        raise APIStatusError("invalid_request_error", 400)
+
+    with pytest.raises(APIStatusError):
+        RateLimiter(limits={}).call(send)
+    assert len(attempts) == 1
@@ -0,0 +1,61 @@
+import os
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from result_shaping import MAX_TURN_TOKENS, ResultStore, ShapingStats, estimate_tokens, shape_turn
+
+NOTE = re.compile(r"\[\.\.\. [\d,]+ of [\d,]+ chars .*? \.\.\.\]")
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultStore()
+    store.directory = str(tmp_path)
+    return store
+
+
+def big(n, lines=20000):
+    return "".join(f"result {n} line {i}\n" for i in range(lines))
+
+
+def shape(results, names, store):
+    return shape_turn(results, names, store=store, stats=ShapingStats())
+
+
+def test_small_results_pass_untouched(store):
+    results = ["short", "x" * 1000]
+    assert shape(results, ["grep", "glob"], store) == results
+
+
+@pytest.mark.parametrize("count", [1, 3, 10, 100])
+def test_turn_stays_within_budget_plus_notes(store, count):
+    shaped = shape([big(n) for n in range(count)], ["run_bash"] * count, store)
+    notes = sum(estimate_tokens(m) for s in shaped for m in NOTE.findall(s))
+    assert sum(estimate_tokens(s) for s in shaped) - notes <= MAX_TURN_TOKENS
+
+
+def test_spilled_result_pages_back_in_full_on_a_busy_turn(store):
+    text = big(0)
+    others = [big(n) for n in range(1, 10)]
+    preview = shape([text] + others, ["read_file"] + ["run_bash"] * 9, store)[0]
+    handle = re.search(r'handle="(r-[0-9a-f]+)"', preview).group(1)
+
+    pages, offset = [], 0
+    while offset is not None:
+        # Each page comes back on a turn as busy as the one that spilled it.
+        page = store.read(handle, offset)
+        page = shape([page] + others, ["read_result"] + ["run_bash"] * 9, store)[0]
+        header, body = page.split("\n", 1)
+        assert handle in header
+        pages.append(body)
+        more = re.search(r"pass offset=(\d+)", header)
+        offset = int(more.group(1)) if more else None
+    assert "".join(pages) == text
+
+
+def test_unknown_handle_is_an_error(store):
+    assert store.read("r-0000000000000000").startswith("Error: unknown")
@@ -0,0 +1,25 @@
+import glob
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.search_codebase import glob_files
+
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+    (tmp_path / "pkg" / "sub").mkdir(parents=True)
+    for name in ("top.py", "pkg/m.py", "pkg/sub/x.py", "pkg/sub/notes.txt"):
+        (tmp_path / name).write_text("")
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.mark.parametrize("pattern", [
+    "*", "pkg/*", "**/sub", "*/", "pkg/sub", "pkg/sub/", "top.py/", "**/*.py", "pkg/**",
+    "pkg/**/", "**", "pkg/*/*.txt", "missing", "nope/*",
+])
+def test_glob_matches_glob_module(tree, pattern):
+    assert sorted(glob_files(pattern, snapshot=None)) == sorted(glob.glob(pattern, recursive=True))
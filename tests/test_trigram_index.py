@@ -0,0 +1,80 @@
+import os
+import random
+import re
+import sys
+import threading
+from contextlib import closing
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools import trigram_index
+
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+    monkeypatch.setattr(trigram_index, "INDEX_DIR", str(tmp_path / "index"))
+    monkeypatch.setattr(trigram_index, "_loaded", {})
+    root = tmp_path / "repo"
+    (root / ".git").mkdir(parents=True)
+    (root / "src" / "pkg").mkdir(parents=True)
+    (root / "top.py").write_text("def main():\n    return helper()\n")
+    (root / "src" / "a.py").write_text("def helper():\n    return 42\n")
+    (root / "src" / "pkg" / "b.py").write_text("class Widget:\n    pass\n")
+    return root
+
+
+def candidates(path, pattern):
+    with closing(trigram_index.candidate_files(str(path), pattern)) as files:
+        return sorted(os.path.relpath(f, path) for f in files)
+
+
+@pytest.mark.parametrize("pattern", [
+    "helper", r"def \w+\(", "foo|bar", "(?i)Widget", "ab+c", r"x\.y", "[abc]def",
+    "(abc)?defg", "abc(def)+", "a.c", "(?:hello) world", r"\bword\b",
+])
+def test_required_trigrams_never_exclude_a_match(pattern):
+    rng = random.Random(pattern)
+    regex = re.compile(pattern)
+    required = trigram_index.required_trigrams(pattern)
+    alphabet = "abcdefgxyz. ()\\wodrlhelpWidget"
+    texts = ["".join(rng.choice(alphabet) for _ in range(40)) for _ in range(2000)]
+    texts += ["def helper(", "Widget", "WIDGET", "bar", "hello world", "x.y", "adefg", "defg"]
+    for text in texts:
+        if regex.search(text):
+            assert required <= trigram_index.trigrams(text), (pattern, text)
+
+
+def test_subtrees_share_the_repo_index(tree):
+    assert candidates(tree, "helper") == ["src/a.py", "top.py"]
+    assert candidates(tree / "src", "helper") == ["a.py"]
+    assert list(trigram_index._loaded) == [str(tree)]
+
+
+def test_changes_are_picked_up_and_persisted(tree):
+    assert candidates(tree, "Widget") == ["src/pkg/b.py"]
+    (tree / "src" / "pkg" / "b.py").write_text("class Gadget:\n    pass\n")
+    (tree / "src" / "c.py").write_text("Widget = None\n")
+    os.unlink(tree / "top.py")
+    assert candidates(tree, "Widget") == ["src/c.py"]
+    assert candidates(tree, "Gadget") == ["src/pkg/b.py"]
+
+    # A fresh process sees the same index from the snapshot and its log.
+    expected = dict(trigram_index._loaded[str(tree)].files)
+    trigram_index._loaded.clear()
+    reloaded = trigram_index.TrigramIndex.load(str(tree))
+    assert reloaded.files == expected
+    assert "top.py" not in reloaded.files
+    assert candidates(tree, "Widget") == ["src/c.py"]
+
+
+def test_an_open_grep_does_not_block_another(tree):
+    first = trigram_index.candidate_files(str(tree), "def")
+    next(first)  # paused mid-walk, as grep_engine would leave it
+    result = []
+    thread = threading.Thread(target=lambda: result.append(candidates(tree, "Widget")))
+    thread.start()
+    thread.join(5)
+    first.close()
+    assert result == [["src/pkg/b.py"]]
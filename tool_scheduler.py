@@ -0,0 +1,95 @@
+"""Runs the tool calls from one assistant turn, in parallel where it is safe.
+
+Calls without side effects (reads and searches) are grouped with their
+read-only neighbours and executed together on a thread pool. Consecutive
+`delegate_subagent` calls are grouped the same way and fanned out through
+subagents.run_batch. Any other call acts as a barrier: it runs alone, on
+the calling thread, after everything before it has finished and before
+anything after it starts. Permission prompts only happen for side-effecting
+calls, so they stay serial and in order. Results always come back in the
+order of the original calls.
+"""
+
+import contextvars
+import threading
+
+import subagents
+from tools.registry import REGISTRY
+
+# Side-effect classes (see tools/registry.py) that may share a batch.
+BATCHED_CLASSES = {"read", "subagent"}
+MAX_WORKERS = 8
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Deferred: concurrent.futures is a noticeable part of startup.
+            from concurrent.futures import ThreadPoolExecutor
+            _pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="tool")
+        return _pool
+
+
+def _submit(execute, call):
+    # Run in a copy of the caller's context so tracing spans keep their parent.
+    return _get_pool().submit(contextvars.copy_context().run, execute, call)
+
+
+def is_read_only(tool_name):
+    return REGISTRY.side_effect(tool_name) == "read"
+
+
+def concurrency_class(tool_name):
+    """"read" or "subagent" for calls that may be batched, None for barriers."""
+    side_effect = REGISTRY.side_effect(tool_name)
+    return side_effect if side_effect in BATCHED_CLASSES else None
+
+
+def start_early(execute, call):
+    """Start a read-only call now (e.g. while the response is still streaming).
+
+    Pass the returned future to run_tool_calls via `started`.
+    """
+    return _submit(execute, call)
+
+
+def run_tool_calls(calls, execute, announce=None, on_done=None, started=None):
+    """Execute `calls` (tool_use blocks) and return their results in order.
+
+    `execute(call)` produces a result. `announce(call)` and
+    `on_done(call, result)` are optional callbacks, always invoked on the
+    calling thread in call order, for display. `started` maps call ids to
+    futures from start_early; those calls are not executed again.
+    """
+    started = started or {}
+    results = [None] * len(calls)
+    i = 0
+    while i < len(calls):
+        kind = concurrency_class(calls[i].name)
+        j = i + 1
+        if kind:
+            while j < len(calls) and concurrency_class(calls[j].name) == kind:
+                j += 1
+        batch = range(i, j)
+
+        if announce:
+            for k in batch:
+                announce(calls[k])
+        if kind == "subagent":
+            funcs = [lambda call=calls[k]: execute(call) for k in batch]
+            results[i:j] = subagents.run_batch(funcs)
+        elif len(batch) == 1 and calls[i].id not in started:
+            results[i] = execute(calls[i])
+        else:
+            futures = [started.get(calls[k].id) or _submit(execute, calls[k]) for k in batch]
+            for k, future in zip(batch, futures):
+                results[k] = future.result()
+        if on_done:
+            for k in batch:
+                on_done(calls[k], results[k])
+        i = j
+    return results
@@ -0,0 +1,154 @@
+"""Runs shell commands for run_bash with bounded output capture.
+
+stdout and stderr are read incrementally as the command runs. Each stream
+keeps the first HEAD_BYTES and a ring buffer of the last TAIL_BYTES, so
+memory stays flat however much the command prints. Once a stream outgrows
+its head, everything is also written to a spill file in a per-process
+temporary directory (removed at exit); the result names that file so the model can page through the middle with
+read_file(byte_offset=..., byte_limit=...). Spill files of streams that
+turned out to fit are deleted again.
+"""
+
+import atexit
+import os
+import selectors
+import shutil
+import signal
+import subprocess
+import tempfile
+import time
+from collections import namedtuple
+
+HEAD_BYTES = int(os.getenv("AGENT_BASH_HEAD_BYTES", str(16 * 1024)))
+TAIL_BYTES = int(os.getenv("AGENT_BASH_TAIL_BYTES", str(16 * 1024)))
+MAX_SPILL_BYTES = int(os.getenv("AGENT_BASH_MAX_SPILL_MB", "1024")) * (1 << 20)
+DEFAULT_TIMEOUT_SEC = 20
+READ_CHUNK = 64 * 1024
+
+_spill_dir = None
+
+
+def spill_dir():
+    global _spill_dir
+    if _spill_dir is None:
+        _spill_dir = tempfile.mkdtemp(prefix="agent-bash-")
+        atexit.register(shutil.rmtree, _spill_dir, True)
+    return _spill_dir
+
+
+class Capture:
+    """Head + tail of one output stream, with overflow spilled to disk."""
+
+    def __init__(self, name, head_bytes=HEAD_BYTES, tail_bytes=TAIL_BYTES):
+        self.name = name
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+        self.spill = None
+        self.spill_path = None
+        self.spilled = 0
+
+    def feed(self, data):
+        self.total += len(data)
+        room = self.head_bytes - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+            if not data:
+                return
+        self._spill(data)
+        self.tail += data
+        if len(self.tail) > self.tail_bytes:
+            del self.tail[:len(self.tail) - self.tail_bytes]
+
+    def _spill(self, data):
+        if self.spill is None:
+            fd, self.spill_path = tempfile.mkstemp(dir=spill_dir(), prefix=f"{self.name}-", suffix=".log")
+            self.spill = os.fdopen(fd, "wb")
+            self.spill.write(self.head)
+            self.spilled = len(self.head)
+        if self.spilled < MAX_SPILL_BYTES:
+            data = data[:MAX_SPILL_BYTES - self.spilled]
+            self.spill.write(data)
+            self.spilled += len(data)
+
+    @property
+    def omitted(self):
+        return self.total - len(self.head) - len(self.tail)
+
+    def close(self):
+        if self.spill is not None:
+            self.spill.close()
+            if self.omitted <= 0:
+                os.unlink(self.spill_path)
+                self.spill_path = None
+
+    def text(self):
+        head = self.head.decode("utf-8", errors="replace")
+        if self.omitted <= 0:
+            # Everything fits; head and tail are contiguous.
+            return head + self.tail.decode("utf-8", errors="replace")
+        note = f"\n[... {self.omitted:,} bytes omitted"
+        if self.spill_path:
+            note += f"; full output ({self.spilled:,} bytes) in {self.spill_path}, page it with read_file byte_offset/byte_limit"
+        return head + note + " ...]\n" + self.tail.decode("utf-8", errors="replace")
+
+
+class CommandResult(namedtuple("CommandResult", "exit_code elapsed timed_out stdout stderr")):
+    def format(self):
+        status = f"exit code {self.exit_code}"
+        if self.timed_out:
+            status = f"timed out after {self.elapsed:.0f}s, killed"
+        truncated = [f"{c.name} {c.total:,} bytes, {c.omitted:,} omitted"
+                     for c in (self.stdout, self.stderr) if c.omitted > 0]
+        trailer = f"[{status}; {self.elapsed:.2f}s"
+        if truncated:
+            trailer += "; truncated: " + ", ".join(truncated)
+        return f"STDOUT:\n{self.stdout.text()}\nSTDERR:\n{self.stderr.text()}\n{trailer}]"
+
+
+def run_command(command, timeout=DEFAULT_TIMEOUT_SEC, cwd=None):
+    """Run `command` through the shell and capture its output within bounds."""
+    start = time.monotonic()
+    proc = subprocess.Popen(
+        command, shell=True, cwd=cwd,
+        stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        start_new_session=True,
+    )
+    captures = {proc.stdout: Capture("stdout"), proc.stderr: Capture("stderr")}
+    timed_out = False
+    with selectors.DefaultSelector() as selector:
+        for pipe in captures:
+            selector.register(pipe, selectors.EVENT_READ)
+        while selector.get_map():
+            remaining = start + timeout - time.monotonic()
+            if remaining <= 0:
+                timed_out = True
+                _kill_group(proc)
+                break
+            for key, _ in selector.select(remaining):
+                data = os.read(key.fd, READ_CHUNK)
+                if data:
+                    captures[key.fileobj].feed(data)
+                else:
+                    selector.unregister(key.fileobj)
+    # Output is fully read (or the command was killed); reap it.
+    try:
+        exit_code = proc.wait(timeout=5)
+    except subprocess.TimeoutExpired:
+        _kill_group(proc)
+        exit_code = proc.wait()
+    for pipe, capture in captures.items():
+        pipe.close()
+        capture.close()
+    return CommandResult(exit_code, time.monotonic() - start, timed_out,
+                         captures[proc.stdout], captures[proc.stderr])
+
+
+def _kill_group(proc):
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        proc.kill()
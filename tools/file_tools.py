@@ -1,14 +1,31 @@
 import os
-import subprocess
+import shutil
+import tempfile
+
+from tools import bash_runner, line_index, read_cache, shell_session, tree_snapshot
+
+# Files larger than this are paged instead of returned whole.
+MAX_FULL_READ_BYTES = int(os.getenv("AGENT_MAX_FULL_READ_BYTES", str(256 * 1024)))
+DEFAULT_READ_LINES = 2000
+# Page size of a byte-range read that gives no byte_limit.
+DEFAULT_READ_BYTES = 64 * 1024
 
 TOOLS = [
     {
         "name": "read_file",
-        "description": "Read the contents of a file",
+        "description": (
+            "Read the contents of a file. Large files are returned a page at a time "
+            "with a header giving the line range and total line count; pass offset/limit "
+            "to read other pages, or byte_offset/byte_limit for a raw byte range."
+        ),
         "input_schema": {
             "type": "object",
             "properties": {
-                "path": {"type": "string", "description": "Path to the file"}
+                "path": {"type": "string", "description": "Path to the file"},
+                "offset": {"type": "integer", "description": "1-based line number to start from"},
+                "limit": {"type": "integer", "description": "Maximum number of lines to return"},
+                "byte_offset": {"type": "integer", "description": "Byte offset to start from"},
+                "byte_limit": {"type": "integer", "description": "Maximum number of bytes to return"}
             },
             "required": ["path"]
         }
@@ -38,6 +55,32 @@ TOOLS = [
         "required": ["path", "old_str", "new_str"]
     }
     },
+    {
+        "name": "apply_edits",
+        "description": (
+            "Apply many exact-string replacements across one or more files in a single call. "
+            "Edits to the same file are applied in order, and each old_str must be unique in the "
+            "file at that point. All edits are checked first; if any fails, no file is changed."
+        ),
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "edits": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "path": {"type": "string"},
+                            "old_str": {"type": "string", "description": "Exact string to find (must be unique in file)"},
+                            "new_str": {"type": "string", "description": "String to replace it with"}
+                        },
+                        "required": ["path", "old_str", "new_str"]
+                    }
+                }
+            },
+            "required": ["edits"]
+        }
+    },
     {
         "name": "run_bash",
         "description": "Run a bash command",
@@ -51,38 +94,64 @@ TOOLS = [
     }
 ]
 
+SIDE_EFFECTS = {
+    "read_file": "read",
+    "write_file": "write",
+    "edit_file": "write",
+    "apply_edits": "write",
+    "run_bash": "exec",
+}
+
 
 def execute_tool(tool_name, input):
     if tool_name == "read_file":
         try:
-            with open(input['path'], 'r') as file:
-                return file.read()
+            args = tuple(input.get(k) for k in ('offset', 'limit', 'byte_offset', 'byte_limit'))
+            return read_cache.CACHE.get(input['path'], args, lambda: read_file(input['path'], *args))
         except Exception as e:
             return f"Error {e}"
     elif tool_name == "write_file":
         try:
             with open(input['path'], 'w') as file:
                 file.write(input['content'])
-                return f"Successfully written to file {input['path']}"
+            tree_snapshot.note_write(input['path'])
+            read_cache.invalidate(input['path'])
+            return f"Successfully written to file {input['path']}"
         except Exception as e:
             return f"Error {e}"
     elif tool_name == "edit_file":
         return edit_file(input['path'], input['old_str'], input['new_str'])
+    elif tool_name == "apply_edits":
+        return apply_edits(input['edits'])
     elif tool_name == "run_bash":
         try:
-            result = subprocess.run(
-                input["command"], 
-                shell=True, 
-                capture_output=True, 
-                text=True,
-                timeout=20  # Added safety timeout
-            )
-            return f"STDOUT:\n{result.stdout}\nSTDERR:\n{result.stderr}"
-        except subprocess.TimeoutExpired:
-            return "Error: Command timed out after 20 seconds."
+            session = shell_session.current()
+            if session is not None:
+                return session.run(input["command"]).format()
+            return bash_runner.run_command(input["command"]).format()
         except Exception as e:
             return f"Error running command: {e}"
 
+def read_file(path, offset=None, limit=None, byte_offset=None, byte_limit=None):
+    if byte_offset is not None or byte_limit is not None:
+        byte_limit = byte_limit or DEFAULT_READ_BYTES
+        text, start, end, size = line_index.read_bytes(path, byte_offset or 0, byte_limit)
+        header = f"[Bytes {start}-{end} of {size} in {path}"
+        if end < size:
+            header += f"; pass byte_offset={end}, byte_limit={byte_limit} to continue"
+        return f"{header}]\n{text}"
+    if offset is None and limit is None and os.path.getsize(path) <= MAX_FULL_READ_BYTES:
+        with open(path, 'r') as file:
+            return file.read()
+    # Every other read is one page, so following the hint never reads to EOF.
+    limit = limit or DEFAULT_READ_LINES
+    text, first, last, total = line_index.read_lines(path, offset or 1, limit)
+    header = f"[Lines {first}-{last} of {total} in {path}"
+    if last < total:
+        header += f"; pass offset={last + 1}, limit={limit} to continue"
+    return f"{header}]\n{text}"
+
+
 def edit_file(path, old_str, new_str):
     with open(path, "r") as f:
         content = f.read()
@@ -95,7 +164,102 @@ def edit_file(path, old_str, new_str):
         return f"Error: '{old_str}' found {count} times. Must be unique."
     
     new_content = content.replace(old_str, new_str)
-    with open(path, "w") as f:
-        f.write(new_content)
+    atomic_write(path, new_content)
     
-    return f"Successfully replaced text in {path}"
\ No newline at end of file
+    return f"Successfully replaced text in {path}"
+
+
+def _stage(path, content):
+    """Write `content` to a temp file beside the file `path` resolves to.
+
+    Returns (real path, temp path). Resolving first means a symlink is
+    written through, as plain open() would, instead of being replaced.
+    """
+    real = os.path.realpath(path)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(real),
+                               prefix=f".{os.path.basename(real)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        try:
+            shutil.copymode(real, tmp)
+        except OSError:
+            pass
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return real, tmp
+
+
+def _written(path, real):
+    for p in {path, real}:
+        tree_snapshot.note_write(p)
+        read_cache.invalidate(p)
+
+
+def atomic_write(path, content):
+    """Replace `path` with `content` so readers never see a half-written file."""
+    real, tmp = _stage(path, content)
+    try:
+        os.replace(tmp, real)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    _written(path, real)
+
+
+def apply_edits(edits):
+    """Validate every edit against one read per file, then write each file once."""
+    # Keyed by real path: "a.py", "./a.py" and a symlink share one buffer.
+    contents = {}
+    names = {}
+    statuses = []
+    for edit in edits:
+        path = edit['path']
+        real = os.path.realpath(path)
+        names.setdefault(real, path)
+        if real not in contents:
+            try:
+                with open(real, "r") as f:
+                    contents[real] = f.read()
+            except Exception as e:
+                contents[real] = e
+        content = contents[real]
+        if isinstance(content, Exception):
+            statuses.append(f"error {path}: {content}")
+            continue
+        count = content.count(edit['old_str']) if edit['old_str'] else 0
+        if count == 1:
+            contents[real] = content.replace(edit['old_str'], edit['new_str'])
+            statuses.append(f"ok {path}")
+        elif count == 0:
+            statuses.append(f"error {path}: old_str not found")
+        else:
+            statuses.append(f"error {path}: old_str found {count} times, must be unique")
+
+    lines = [f"{i}. {status}" for i, status in enumerate(statuses, 1)]
+    failed = sum(1 for status in statuses if status.startswith("error"))
+    if failed:
+        return f"No files changed; {failed} of {len(edits)} edits failed:\n" + "\n".join(lines)
+
+    # Stage every file before replacing any, so a failed write (disk full,
+    # permissions) leaves them all unchanged. The renames themselves do not
+    # fail in practice: each temp file sits in its target's directory.
+    staged = []
+    try:
+        for real, content in contents.items():
+            staged.append((real, _stage(real, content)[1]))
+    except Exception as e:
+        for _, tmp in staged:
+            os.unlink(tmp)
+        return f"Error writing {names[real]}: {e}. No files changed.\n" + "\n".join(lines)
+    for i, (real, tmp) in enumerate(staged):
+        try:
+            os.replace(tmp, real)
+        except OSError as e:
+            for _, left in staged[i:]:
+                os.unlink(left)
+            done = ", ".join(names[r] for r, _ in staged[:i]) or "none"
+            return f"Error writing {names[real]}: {e}. Already written: {done}.\n" + "\n".join(lines)
+        _written(names[real], real)
+    return f"Applied {len(edits)} edits to {len(staged)} files:\n" + "\n".join(lines)
\ No newline at end of file
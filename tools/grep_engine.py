@@ -0,0 +1,115 @@
+"""Parallel, early-terminating regex search over a stream of files.
+
+Files are pulled lazily from the caller's iterator and handed to a shared
+process pool in small chunks. Chunks are collected in submission order, so
+results always come back in the order the files were produced. As soon as
+`limit` results are in hand the remaining queued chunks are cancelled and
+no further files are pulled from the iterator.
+"""
+
+import multiprocessing
+import os
+import re
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from tools.walker import open_text
+
+MAX_RESULTS = 100
+# Files per task sent to a worker; small enough that a cancelled search
+# wastes little work, large enough to amortise the IPC round-trip.
+CHUNK_SIZE = 64
+# Below this many files the pool start-up costs more than it saves.
+PARALLEL_THRESHOLD = 256
+WORKERS = int(os.getenv("AGENT_GREP_WORKERS", "0")) or os.cpu_count() or 1
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _mp_context():
+    # Never fork: the pool is created on a tool thread while streaming,
+    # subagent and other tool threads run, and a child forked from a
+    # multithreaded process can deadlock on a lock another thread held.
+    # The fork server starts clean and forks workers with this module
+    # already imported.
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload([__name__])
+    return context
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=_mp_context())
+        return _pool
+
+
+def scan_files(pattern, paths, limit):
+    """Search `paths` in order, stopping after `limit` matching lines."""
+    # re caches compiled patterns, so each worker compiles this only once.
+    regex = re.compile(pattern)
+    results = []
+    for file_path in paths:
+        try:
+            f = open_text(file_path)
+            if f is None:
+                continue  # Binary file
+            with f:
+                for i, line in enumerate(f, 1):
+                    if regex.search(line):
+                        results.append(f"{file_path}:{i}: {line.strip()}")
+                        if len(results) >= limit:
+                            return results
+        except Exception:
+            continue  # Skip unreadable files
+    return results
+
+
+def search(pattern, files, limit=MAX_RESULTS):
+    """Return up to `limit` "path:line: text" matches for `pattern` in `files`.
+
+    Raises re.error for an invalid pattern before touching any file.
+    """
+    re.compile(pattern)
+    files = iter(files)
+
+    head = list(islice(files, PARALLEL_THRESHOLD))
+    if len(head) < PARALLEL_THRESHOLD or WORKERS == 1:
+        results = scan_files(pattern, head, limit)
+        if len(results) < limit and len(head) == PARALLEL_THRESHOLD:
+            results += scan_files(pattern, files, limit - len(results))
+        return results
+
+    def chunks():
+        yield from (head[i:i + CHUNK_SIZE] for i in range(0, len(head), CHUNK_SIZE))
+        while True:
+            chunk = list(islice(files, CHUNK_SIZE))
+            if not chunk:
+                return
+            yield chunk
+
+    pool = _get_pool()
+    window = WORKERS * 2
+    pending = deque()
+    results = []
+    source = chunks()
+    try:
+        for chunk in islice(source, window):
+            pending.append(pool.submit(scan_files, pattern, chunk, limit))
+        while pending:
+            results += pending.popleft().result()
+            if len(results) >= limit:
+                break
+            chunk = next(source, None)
+            if chunk is not None:
+                pending.append(pool.submit(scan_files, pattern, chunk, limit))
+    finally:
+        for future in pending:
+            future.cancel()
+    return results[:limit]
@@ -0,0 +1,108 @@
+"""Sparse newline index for random access to lines of large files.
+
+Instead of one offset per line, we record a checkpoint every
+CHECKPOINT_BYTES bytes: the byte offset and how many newlines precede it.
+Building the index is a single pass of `bytes.count` over the mmapped file,
+and finding line N is a binary search over checkpoints plus a scan of at
+most one checkpoint interval, so page reads cost the same at line 10 as at
+line 10,000,000. Indexes are cached per (path, mtime_ns, size).
+"""
+
+import mmap
+import os
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+CHECKPOINT_BYTES = 1 << 20
+MAX_CACHED_INDEXES = 32
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+class LineIndex:
+    def __init__(self, mm, size):
+        self.size = size
+        self.offsets = array("Q", [0])
+        self.lines_before = array("Q", [0])
+        newlines = 0
+        for start in range(0, size, CHECKPOINT_BYTES):
+            end = min(start + CHECKPOINT_BYTES, size)
+            newlines += mm[start:end].count(b"\n")
+            if end < size:
+                self.offsets.append(end)
+                self.lines_before.append(newlines)
+        self.newlines = newlines
+        ends_with_newline = size > 0 and mm[size - 1:size] == b"\n"
+        self.total_lines = newlines + (0 if ends_with_newline or size == 0 else 1)
+
+    def line_start(self, mm, line):
+        """Byte offset where 1-based `line` starts (size if past the end)."""
+        if line <= 1:
+            return 0
+        if line - 1 > self.newlines:
+            return self.size
+        # Last checkpoint with strictly fewer newlines before it than we need.
+        k = bisect_left(self.lines_before, line - 1) - 1
+        return skip_lines(mm, self.offsets[k], line - 1 - self.lines_before[k])
+
+
+def skip_lines(mm, pos, count):
+    """Offset just past the `count`-th newline at or after `pos`."""
+    for _ in range(count):
+        found = mm.find(b"\n", pos)
+        if found == -1:
+            return len(mm)
+        pos = found + 1
+    return pos
+
+
+def get_index(path, mm, st):
+    key = os.path.abspath(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == stamp:
+            _cache.move_to_end(key)
+            return cached[1]
+    index = LineIndex(mm, st.st_size)
+    with _cache_lock:
+        _cache[key] = (stamp, index)
+        _cache.move_to_end(key)
+        while len(_cache) > MAX_CACHED_INDEXES:
+            _cache.popitem(last=False)
+    return index
+
+
+def read_lines(path, offset=1, limit=None):
+    """Return (text, first_line, last_line, total_lines) for a line range."""
+    with open(path, "rb") as f:
+        st = os.fstat(f.fileno())
+        if st.st_size == 0:
+            return "", 0, 0, 0
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            index = get_index(path, mm, st)
+            offset = max(offset, 1)
+            start = index.line_start(mm, offset)
+            end = st.st_size if limit is None else skip_lines(mm, start, limit)
+            data = mm[start:end]
+    last = min(offset + data.count(b"\n") - (1 if data.endswith(b"\n") else 0),
+               index.total_lines)
+    if not data:
+        return "", offset, offset - 1, index.total_lines
+    return data.decode("utf-8", errors="replace"), offset, last, index.total_lines
+
+
+def read_bytes(path, byte_offset=0, byte_limit=None):
+    """Return (text, start, end, size) for a byte range."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        start = min(max(byte_offset, 0), size)
+        end = size if byte_limit is None else min(start + byte_limit, size)
+        if start >= end:
+            return "", start, start, size
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            data = mm[start:end]
+    return data.decode("utf-8", errors="replace"), start, end, size
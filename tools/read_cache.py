@@ -0,0 +1,127 @@
+"""Process-wide cache of read_file results, plus per-conversation dedupe.
+
+`CACHE` is shared by the agent and every subagent. Entries are keyed by the
+read arguments and validated against (mtime_ns, size, inode), so a file
+changed behind our back (by run_bash, an editor, git) is simply re-read.
+Writes through write_file/edit_file invalidate their path right away.
+
+`ReadLedger` belongs to one conversation. It remembers a digest of each
+read_file result already sent to the model; sending the same content again
+is replaced by a short reference to the turn that has it. The context
+compactor tells the ledger when a result is elided, so content that is no
+longer in the conversation is sent in full again.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from context_compaction import CHARS_PER_TOKEN
+
+MAX_CACHE_BYTES = int(os.getenv("AGENT_READ_CACHE_MB", "64")) * (1 << 20)
+# Results shorter than this are cheaper to resend than to reference.
+MIN_DEDUPE_CHARS = 400
+
+
+class ReadStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.duplicates = 0
+        self.tokens_saved = 0
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups else 0.0
+        return (f"{self.hits}/{lookups} reads served from cache ({rate:.0%}), "
+                f"{self.duplicates} duplicate results elided, ~{self.tokens_saved} tokens saved")
+
+
+SESSION_STATS = ReadStats()
+
+
+class ReadCache:
+    def __init__(self, max_bytes=MAX_CACHE_BYTES, stats=SESSION_STATS):
+        self.max_bytes = max_bytes
+        self.stats = stats
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, path, args, produce):
+        """Return the cached result of `produce()` for reading `path` with `args`."""
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+        key = (os.path.abspath(path), args)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] == stamp:
+                self.entries.move_to_end(key)
+                with self.stats.lock:
+                    self.stats.hits += 1
+                return entry[1]
+        result = produce()
+        with self.lock, self.stats.lock:
+            self.stats.misses += 1
+            self._drop(key)
+            if len(result) <= self.max_bytes:
+                self.entries[key] = (stamp, result)
+                self.bytes += len(result)
+                while self.bytes > self.max_bytes:
+                    self._drop(next(iter(self.entries)))
+        return result
+
+    def _drop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry:
+            self.bytes -= len(entry[1])
+
+    def invalidate(self, path):
+        target = os.path.abspath(path)
+        with self.lock:
+            for key in [k for k in self.entries if k[0] == target]:
+                self._drop(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+
+CACHE = ReadCache()
+
+
+def invalidate(path):
+    CACHE.invalidate(path)
+
+
+class ReadLedger:
+    def __init__(self, stats=SESSION_STATS):
+        self.stats = stats
+        self.sent = {}      # digest -> (turn, tool_use_id)
+        self.digests = {}   # tool_use_id -> digest
+
+    def dedupe(self, path, result, turn, tool_use_id):
+        """Return `result`, or a reference if this conversation already has it."""
+        if len(result) < MIN_DEDUPE_CHARS or result.startswith("Error"):
+            return result
+        digest = hashlib.sha1(result.encode("utf-8", "surrogatepass")).hexdigest()
+        earlier = self.sent.get(digest)
+        if earlier is None:
+            self.sent[digest] = (turn, tool_use_id)
+            self.digests[tool_use_id] = digest
+            return result
+        reference = (f"[{path} unchanged since turn {earlier[0]}: identical to the "
+                     f"read_file result for tool_use_id {earlier[1]}.]")
+        with self.stats.lock:
+            self.stats.duplicates += 1
+            self.stats.tokens_saved += (len(result) - len(reference)) // CHARS_PER_TOKEN
+        return reference
+
+    def forget(self, tool_use_id):
+        """The result for `tool_use_id` is gone from the conversation."""
+        digest = self.digests.pop(tool_use_id, None)
+        if digest is not None and self.sent.get(digest, (None, None))[1] == tool_use_id:
+            del self.sent[digest]
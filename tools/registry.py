@@ -0,0 +1,178 @@
+"""Name -> tool lookup for dispatch, scheduling and the API schema list.
+
+Tool modules are discovered without importing them. Every module in this
+package, plus any module named by an `agent_zero.tools` entry point, is
+parsed with `ast`. A module provides tools by assigning literal lists at
+top level:
+
+    TOOLS = [{"name": ..., "description": ..., "input_schema": {...}}, ...]
+    SIDE_EFFECTS = {"tool_name": "read" | "write" | "exec", ...}
+
+(any name ending in TOOLS works) and a function `execute_tool(name, input)`.
+The module itself is imported the first time one of its tools is called,
+so heavy dependencies (process pools, indexes) cost nothing at startup.
+
+Side-effect classes drive tool_scheduler: "read" calls run concurrently,
+"subagent" calls fan out, anything else is a barrier. Tools without a
+declared class are treated as "write".
+"""
+
+import ast
+import importlib
+import importlib.util
+import json
+import os
+import re
+import sys
+import threading
+from collections import namedtuple
+
+ENTRY_POINT_GROUP = "agent_zero.tools"
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+ToolSpec = namedtuple("ToolSpec", "name schema side_effect module")
+
+# Cheap pre-check so only modules that declare tools are parsed.
+_DECLARES_TOOLS = re.compile(r"^\w*TOOLS\s*=", re.MULTILINE)
+
+
+def _literal_assignments(path):
+    with open(path, "r") as f:
+        source = f.read()
+    if not _DECLARES_TOOLS.search(source):
+        return {}
+    tree = ast.parse(source, filename=path)
+    found = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            try:
+                found[node.targets[0].id] = ast.literal_eval(node.value)
+            except ValueError:
+                pass
+    return found
+
+
+def entry_point_modules(group=ENTRY_POINT_GROUP, paths=None):
+    """Modules named by installed `group` entry points.
+
+    Reads the entry_points.txt files of installed distributions directly;
+    importing importlib.metadata alone costs more than the rest of startup.
+    """
+    modules = []
+    for directory in sys.path if paths is None else paths:
+        try:
+            names = os.listdir(directory or ".")
+        except OSError:
+            continue
+        for name in names:
+            if not name.endswith((".dist-info", ".egg-info")):
+                continue
+            try:
+                with open(os.path.join(directory, name, "entry_points.txt")) as f:
+                    lines = f.read().splitlines()
+            except OSError:
+                continue
+            section = None
+            for line in lines:
+                line = line.strip()
+                if line.startswith("[") and line.endswith("]"):
+                    section = line[1:-1].strip()
+                elif section == group and "=" in line and not line.startswith(("#", ";")):
+                    # "name = package.module" (an ":attr" suffix is ignored).
+                    modules.append(line.split("=", 1)[1].split(":", 1)[0].strip())
+    return modules
+
+
+def scan_module(module, path):
+    """ToolSpecs declared in the source at `path`, without importing it."""
+    values = _literal_assignments(path)
+    side_effects = values.get("SIDE_EFFECTS", {})
+    specs = []
+    for name, value in values.items():
+        if not name.endswith("TOOLS") or not isinstance(value, list):
+            continue
+        for schema in value:
+            if isinstance(schema, dict) and "name" in schema and "input_schema" in schema:
+                specs.append(ToolSpec(schema["name"], schema,
+                                      side_effects.get(schema["name"], "write"), module))
+    return specs
+
+
+class ToolRegistry:
+    def __init__(self, package_dir=PACKAGE_DIR, package="tools", group=ENTRY_POINT_GROUP):
+        self.package_dir = package_dir
+        self.package = package
+        self.group = group
+        self.specs = {}
+        self.handlers = {}
+        self.lock = threading.Lock()
+        self._discovered = False
+        self._schemas = None
+        self._schemas_json = None
+
+    def _discover(self):
+        if self._discovered:
+            return
+        with self.lock:
+            if self._discovered:
+                return
+            modules = [(f"{self.package}.{entry[:-3]}", os.path.join(self.package_dir, entry))
+                       for entry in sorted(os.listdir(self.package_dir))
+                       if entry.endswith(".py") and not entry.startswith("_") and entry != "registry.py"]
+            for name in entry_point_modules(self.group):
+                spec = importlib.util.find_spec(name)
+                if spec and spec.origin:
+                    modules.append((name, spec.origin))
+            for module, path in modules:
+                for spec in scan_module(module, path):
+                    self.specs.setdefault(spec.name, spec)
+            self._discovered = True
+
+    def register(self, schema, side_effect="write", module=None, handler=None):
+        """Add a tool defined outside the tool modules (e.g. delegate_subagent)."""
+        self._discover()
+        with self.lock:
+            self.specs[schema["name"]] = ToolSpec(schema["name"], schema, side_effect, module)
+            if handler is not None:
+                self.handlers[schema["name"]] = handler
+            self._schemas = self._schemas_json = None
+
+    def get(self, name):
+        self._discover()
+        return self.specs.get(name)
+
+    def side_effect(self, name):
+        spec = self.get(name)
+        return spec.side_effect if spec else "write"
+
+    def schemas(self):
+        """Schemas for the API, built once (treat as read-only)."""
+        self._discover()
+        if self._schemas is None:
+            self._schemas = [spec.schema for spec in self.specs.values()]
+        return self._schemas
+
+    def schemas_json(self):
+        if self._schemas_json is None:
+            self._schemas_json = json.dumps(self.schemas())
+        return self._schemas_json
+
+    def handler(self, name):
+        handler = self.handlers.get(name)
+        if handler is None:
+            spec = self.get(name)
+            if spec is None or spec.module is None:
+                return None
+            # Import on first use; the import system serializes concurrent imports.
+            module = importlib.import_module(spec.module)
+            handler = self.handlers.setdefault(name, lambda input: module.execute_tool(name, input))
+        return handler
+
+    def execute(self, name, input):
+        handler = self.handler(name)
+        if handler is None:
+            return f"Error: Unknown tool {name}"
+        return handler(input)
+
+
+REGISTRY = ToolRegistry()
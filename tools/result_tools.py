@@ -0,0 +1,32 @@
+RESULT_TOOLS = [
+    {
+        "name": "read_result",
+        "description": (
+            "Page through a tool result that was too large to show in full. "
+            "Oversized results are replaced by a preview naming a handle; pass that "
+            "handle and a character offset to read the text from there."
+        ),
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "handle": {"type": "string", "description": "Handle from the truncated result, e.g. r-1a2b3c4d5e6f7a8b"},
+                "offset": {"type": "integer", "description": "Character offset to start from (default 0)"},
+                "length": {"type": "integer", "description": "Maximum number of characters to return"}
+            },
+            "required": ["handle"]
+        }
+    }
+]
+
+SIDE_EFFECTS = {"read_result": "read"}
+
+import result_shaping
+
+
+def execute_tool(tool_name, input):
+    if tool_name == "read_result":
+        try:
+            return result_shaping.STORE.read(input["handle"], input.get("offset", 0), input.get("length"))
+        except Exception as e:
+            return f"Error reading result: {e}"
+    return f"Error: Unknown tool {tool_name}"
@@ -24,14 +24,55 @@ SEARCH_TOOLS = [
     }
 ]
 
+SIDE_EFFECTS = {"glob": "read", "grep": "read"}
+
 import glob
 import os
 import re
+from contextlib import closing
+
+from tools import grep_engine, tree_snapshot, trigram_index
+from tools.walker import glob_to_regex, walk_files
+
+
+def glob_files(pattern, snapshot=tree_snapshot.SNAPSHOT):
+    """Paths matching a `**`-aware glob, found with the ignore-aware walker.
+
+    Like glob.glob, directories match too, and a trailing "/" matches only
+    directories (returned with the slash).
+    """
+    if not glob.has_magic(pattern):
+        return [pattern] if os.path.exists(pattern) else []
+    dirs_only = pattern.endswith("/")
+    if dirs_only:
+        pattern = pattern.rstrip("/")
+
+    # Walk from the longest leading directory that has no wildcards.
+    parts = pattern.split("/")
+    split = 0
+    while split < len(parts) - 1 and not glob.has_magic(parts[split]):
+        split += 1
+    base = "/".join(parts[:split]) or ("/" if pattern.startswith("/") else "")
+    rest = parts[split:]
+    regex = re.compile(glob_to_regex("/".join(rest)) + r"\Z")
+    # Like glob.glob, wildcards only match dotfiles when the pattern asks.
+    include_hidden = any(part.startswith(".") for part in rest)
+
+    root = base or "."
+    entries = walk_files(root, max_size=None, include_hidden=include_hidden,
+                         snapshot=snapshot, stat=False, include_dirs=True)
+    suffix = "/" if dirs_only else ""
+    matches = [(entry.rel if not base else entry.path) + suffix for entry in entries
+               if regex.match(entry.rel) and (entry.is_dir or not dirs_only)]
+    if base and rest[0] == "**" and regex.match("") and os.path.isdir(base):
+        matches.insert(0, base.rstrip("/") + "/")  # "pkg/**" includes pkg/ itself
+    return matches
+
 
 def execute_tool(tool_name, input):
     if tool_name == "glob":
         try:
-            files = glob.glob(input['pattern'], recursive=True)
+            files = glob_files(input['pattern'])
             return "\n".join(files) if files else "No files found matching pattern."
         except Exception as e:
             return f"Error executing glob: {e}"
@@ -40,27 +81,15 @@ def execute_tool(tool_name, input):
         try:
             pattern = input['pattern']
             path = input.get('path', '.')
-            
-            # Simple python-based grep for cross-platform compatibility
-            results = []
+
             if os.path.isfile(path):
-                search_files = [path]
+                results = grep_engine.search(pattern, [path])
             else:
-                search_files = []
-                for root, _, files in os.walk(path):
-                    for file in files:
-                        search_files.append(os.path.join(root, file))
-            
-            for file_path in search_files:
-                try:
-                    with open(file_path, 'r', errors='ignore') as f:
-                        for i, line in enumerate(f, 1):
-                            if re.search(pattern, line):
-                                results.append(f"{file_path}:{i}: {line.strip()}")
-                except Exception:
-                    continue  # Skip unreadable files
-                    
-            return "\n".join(results[:100]) if results else "No matches found."
-            
+                # The trigram index skips files that cannot contain a match.
+                with closing(trigram_index.candidate_files(path, pattern)) as search_files:
+                    results = grep_engine.search(pattern, search_files)
+
+            return "\n".join(results) if results else "No matches found."
+
         except Exception as e:
             return f"Error executing grep: {e}"
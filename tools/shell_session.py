@@ -0,0 +1,245 @@
+"""Optional long-lived bash session behind run_bash.
+
+With AGENT_PERSISTENT_SHELL=1 each agent (and each subagent) gets one bash
+process for its whole run, so `cd`, exported variables and activated
+virtualenvs carry over between calls and no shell is spawned per command.
+The session is picked up through a contextvar set by `session_scope`.
+
+Commands are framed over the shell's stdin. The command text is handed
+over in a quoted heredoc (so quoting in it cannot break the framing) and
+run with `eval` with stdin from /dev/null. Afterwards the shell prints a
+per-session sentinel plus the exit status on stdout and the sentinel on
+stderr. Output before the sentinel goes through the same bounded
+bash_runner.Capture as one-shot commands.
+
+On timeout only the command's processes (the shell's descendants, found
+through /proc) are killed, so the shell keeps its state. If the shell
+does not come back (say, a busy loop in a builtin) or exits (say, `exit`),
+it is killed and a fresh one is started on the next command.
+"""
+
+import contextvars
+import os
+import secrets
+import selectors
+import signal
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+
+from tools.bash_runner import DEFAULT_TIMEOUT_SEC, READ_CHUNK, Capture, CommandResult
+
+PERSISTENT_SHELL = os.getenv("AGENT_PERSISTENT_SHELL", "0") == "1"
+SHELL = os.getenv("AGENT_SHELL", "/bin/bash")
+# After a timeout, how long the shell gets to report back before it is replaced.
+INTERRUPT_GRACE_SEC = 2.0
+
+_current = contextvars.ContextVar("shell_session", default=None)
+
+
+def current():
+    """The session of the agent running on this thread, or None."""
+    return _current.get()
+
+
+@contextmanager
+def session_scope(enabled=None):
+    """Give the code inside its own shell session (if enabled), closed on exit."""
+    if not (PERSISTENT_SHELL if enabled is None else enabled):
+        yield None
+        return
+    session = ShellSession()
+    token = _current.set(session)
+    try:
+        yield session
+    finally:
+        _current.reset(token)
+        session.close()
+
+
+def _descendants(pid):
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name is in parentheses and may contain spaces.
+        ppid = int(stat.rsplit(")", 1)[1].split()[1])
+        children.setdefault(ppid, []).append(int(entry))
+    found, stack = [], [pid]
+    while stack:
+        for child in children.get(stack.pop(), []):
+            found.append(child)
+            stack.append(child)
+    return found
+
+
+def _kill(proc):
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        proc.kill()
+
+
+class _Stream:
+    """Feeds one pipe into a Capture until the sentinel line shows up."""
+
+    def __init__(self, capture, marker):
+        self.capture = capture
+        self.marker = marker
+        self.pending = bytearray()
+        self.done = False
+        self.status = None
+
+    def feed(self, data):
+        if self.done:
+            return
+        self.pending += data
+        index = self.pending.find(self.marker)
+        if index != -1:
+            end = self.pending.find(b"\n", index + len(self.marker))
+            if end == -1:
+                return
+            status = self.pending[index + len(self.marker):end].strip()
+            self.status = int(status) if status else None
+            self.capture.feed(bytes(self.pending[:index]))
+            self.pending.clear()
+            self.done = True
+            return
+        # Hold back enough bytes that a sentinel split across reads is not lost.
+        keep = len(self.marker) + 16
+        if len(self.pending) > keep:
+            self.capture.feed(bytes(self.pending[:-keep]))
+            del self.pending[:-keep]
+
+    def finish(self):
+        self.capture.feed(bytes(self.pending))
+        self.pending.clear()
+        self.done = True
+
+
+class ShellSession:
+    def __init__(self, cwd=None, shell=SHELL):
+        self.cwd = cwd
+        self.shell = shell
+        self.proc = None
+        self.lock = threading.Lock()
+        token = secrets.token_hex(8)
+        self.heredoc_end = f"__AGENT_EOF_{token}"
+        self.done = f"__AGENT_DONE_{token}"
+
+    def _ensure_started(self):
+        if self.proc is not None and self.proc.poll() is None:
+            return
+        self._discard()
+        self.proc = subprocess.Popen(
+            [self.shell, "--noprofile", "--norc"],
+            cwd=self.cwd or os.getcwd(),
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            start_new_session=True,
+        )
+
+    def _script(self, command):
+        return (
+            f"IFS= read -r -d '' __agent_cmd <<'{self.heredoc_end}'\n{command}\n{self.heredoc_end}\n"
+            f'eval "$__agent_cmd" < /dev/null\n'
+            f"__agent_rc=$?; printf '\\n{self.done} %d\\n' \"$__agent_rc\"; printf '\\n{self.done}\\n' >&2\n"
+        ).encode()
+
+    def run(self, command, timeout=DEFAULT_TIMEOUT_SEC):
+        with self.lock:
+            self._ensure_started()
+            try:
+                self.proc.stdin.write(self._script(command))
+                self.proc.stdin.flush()
+            except BrokenPipeError:
+                # Died since the last command; start over once.
+                self._ensure_started()
+                self.proc.stdin.write(self._script(command))
+                self.proc.stdin.flush()
+            return self._collect(time.monotonic(), timeout)
+
+    def _collect(self, start, timeout):
+        proc = self.proc
+        marker = f"\n{self.done}".encode()
+        streams = {proc.stdout.fileno(): _Stream(Capture("stdout"), marker),
+                   proc.stderr.fileno(): _Stream(Capture("stderr"), marker)}
+        deadline = start + timeout
+        timed_out = died = False
+        with selectors.DefaultSelector() as selector:
+            for fd in streams:
+                selector.register(fd, selectors.EVENT_READ)
+            while not all(s.done for s in streams.values()):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    if timed_out:
+                        break
+                    timed_out = True
+                    self._interrupt()
+                    deadline = time.monotonic() + INTERRUPT_GRACE_SEC
+                    continue
+                for key, _ in selector.select(remaining):
+                    data = os.read(key.fd, READ_CHUNK)
+                    if data:
+                        streams[key.fd].feed(data)
+                    else:
+                        died = True
+                        selector.unregister(key.fd)
+                        streams[key.fd].finish()
+
+        out, err = streams[proc.stdout.fileno()], streams[proc.stderr.fileno()]
+        exit_code = out.status
+        if died or not (out.done and err.done):
+            # The shell itself is gone or stuck; replace it next time.
+            if not died:
+                _kill(proc)
+            exit_code = proc.wait()
+            err.capture.feed(b"\n[shell session ended; a fresh shell will be started for the next command]")
+            self._discard()
+        for stream in streams.values():
+            stream.capture.close()
+        return CommandResult(exit_code, time.monotonic() - start, timed_out, out.capture, err.capture)
+
+    def _interrupt(self):
+        """Kill the running command but leave the shell alive."""
+        try:
+            pids = _descendants(self.proc.pid)
+        except OSError:
+            pids = None
+        if not pids:
+            # Nothing to kill (a builtin is looping) or no /proc: give up on the shell.
+            _kill(self.proc)
+            return
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    def _discard(self):
+        proc, self.proc = self.proc, None
+        if proc is None:
+            return
+        if proc.poll() is None:
+            _kill(proc)
+        proc.wait()
+        for pipe in (proc.stdin, proc.stdout, proc.stderr):
+            try:
+                pipe.close()
+            except OSError:
+                pass
+
+    def close(self):
+        with self.lock:
+            if self.proc is not None and self.proc.poll() is None:
+                try:
+                    self.proc.stdin.close()
+                    self.proc.wait(timeout=1)
+                except (OSError, subprocess.TimeoutExpired):
+                    pass
+            self._discard()
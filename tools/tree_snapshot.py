@@ -0,0 +1,89 @@
+"""In-process snapshot of directory listings, reused across `glob` calls.
+
+Each cached listing is keyed by the directory's absolute path and stamped
+with the directory's mtime. Adding, removing or renaming an entry bumps
+that mtime, so revalidating a directory costs one stat() instead of a full
+scandir(), and unchanged subtrees are never listed again. The file tools
+report their own writes through `note_write` so the snapshot stays warm
+after the agent edits files.
+
+There is no inotify binding in the standard library, so invalidation is
+mtime-based only.
+"""
+
+import os
+import threading
+from collections import namedtuple
+
+# kind is "d" for real directories, "f" for files (symlinks followed), "" otherwise.
+Entry = namedtuple("Entry", "name kind")
+Listing = namedtuple("Listing", "mtime_ns entries")
+
+
+def _kind(entry):
+    try:
+        if entry.is_dir(follow_symlinks=False):
+            return "d"
+        if entry.is_file():
+            return "f"
+    except OSError:
+        pass
+    return ""
+
+
+def scan(directory):
+    """List `directory` sorted by name, without any caching."""
+    with os.scandir(directory) as it:
+        entries = [Entry(e.name, _kind(e)) for e in it]
+    entries.sort()
+    return entries
+
+
+class TreeSnapshot:
+    def __init__(self):
+        self.listings = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def listdir(self, directory):
+        """Sorted entries of `directory`, rescanned only if its mtime moved."""
+        key = os.path.abspath(directory)
+        mtime_ns = os.stat(key).st_mtime_ns
+        cached = self.listings.get(key)
+        if cached and cached.mtime_ns == mtime_ns:
+            self.hits += 1
+            return cached.entries
+        self.misses += 1
+        entries = scan(key)
+        self.listings[key] = Listing(mtime_ns, entries)
+        return entries
+
+    def note_write(self, path):
+        """Record that `path` was just written by one of our own tools."""
+        path = os.path.abspath(path)
+        directory, name = os.path.split(path)
+        with self.lock:
+            cached = self.listings.get(directory)
+            if cached is None:
+                return
+            try:
+                mtime_ns = os.stat(directory).st_mtime_ns
+            except OSError:
+                self.listings.pop(directory, None)
+                return
+            entries = cached.entries
+            if not any(e.name == name for e in entries):
+                entries = sorted(entries + [Entry(name, "f")])
+            self.listings[directory] = Listing(mtime_ns, entries)
+
+    def clear(self):
+        self.listings.clear()
+
+
+# Shared by every glob in the process.
+SNAPSHOT = TreeSnapshot()
+
+
+def note_write(path):
+    SNAPSHOT.note_write(path)
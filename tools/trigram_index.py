@@ -0,0 +1,381 @@
+"""On-disk trigram index used by the `grep` tool to narrow candidate files.
+
+The index maps every 3-character substring of a file's text to the set of
+files containing it. A regex can only match a file that contains every
+trigram of the literal runs the regex requires, so grep only has to run the
+regex over the intersection of those posting sets.
+
+Files are tracked by (mtime_ns, size). When a file changes it gets a new id
+and its old id is simply forgotten; stale ids left in the postings are
+dropped when the index is compacted.
+
+There is one index per tree: the enclosing git work tree, or the first
+directory searched when there is none. Greps of `.`, `src` and `src/pkg`
+share it, each walking (and indexing) only its own subtree.
+
+On disk an index is a pickled snapshot plus an append-only log of the
+files added and forgotten since. A grep appends only its own changes; the
+snapshot is rewritten when the log outgrows LOG_RATIO of it or after a
+compaction. Log batches carry the snapshot's generation, so batches written
+against an older snapshot are ignored.
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+
+from tools.walker import open_text, walk_files
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+INDEX_VERSION = 3
+# Id recorded for binary files; they never appear in postings.
+BINARY_ID = -1
+INDEX_DIR = os.getenv(
+    "AGENT_INDEX_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "agent-zero", "trigrams"),
+)
+# Compact once fewer than this fraction of allocated ids are still live.
+COMPACT_RATIO = 0.5
+# Rewrite the snapshot once the log is this large relative to it.
+LOG_RATIO = 0.5
+
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def trigrams(text):
+    """Return the set of trigrams in text."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def required_trigrams(pattern):
+    """Trigrams that any line matching `pattern` must contain.
+
+    Only literal runs that are unconditionally part of the match are used.
+    Anything we cannot reason about (case-insensitive matching, alternation,
+    repeats, classes) ends the current run, so the result is always a safe
+    under-approximation. An empty set means "every file is a candidate".
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except Exception:
+        return set()
+    if parsed.state.flags & sre_constants.SRE_FLAG_IGNORECASE:
+        return set()
+
+    runs = []
+    current = []
+
+    def flush():
+        if len(current) >= 3:
+            runs.append("".join(current))
+        current.clear()
+
+    def visit(items):
+        for op, arg in items:
+            if op is sre_constants.LITERAL:
+                current.append(chr(arg))
+                continue
+            flush()
+            if op is sre_constants.SUBPATTERN:
+                _group, add_flags, del_flags, sub = arg
+                if not add_flags and not del_flags:
+                    visit(sub)
+                    flush()
+
+    visit(parsed)
+    flush()
+
+    required = set()
+    for run in runs:
+        required |= trigrams(run)
+    return required
+
+
+def _read_text(path):
+    """Text exactly as grep would decode it, or None for binary files."""
+    # An unreadable file is indexed as empty: it can only be a candidate for
+    # patterns without literals, and grep skips it anyway.
+    try:
+        f = open_text(path)
+    except OSError:
+        return ""
+    if f is None:
+        return None
+    with f:
+        return f.read()
+
+
+def index_root(path):
+    """Root of the index that covers directory `path`."""
+    path = os.path.abspath(path)
+    with _loaded_lock:
+        loaded = [root for root in _loaded if _within(path, root)]
+    if loaded:
+        return max(loaded, key=len)
+    directory = path
+    while True:
+        if os.path.exists(os.path.join(directory, ".git")):
+            return directory
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return path
+        directory = parent
+
+
+def _within(path, root):
+    return path == root or path.startswith(root.rstrip(os.sep) + os.sep)
+
+
+class TrigramIndex:
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.files = {}      # relpath -> (file_id, mtime_ns, size)
+        self.postings = {}   # trigram -> set(file_id)
+        self.next_id = 0
+        self.pending = []    # changes not yet on disk, as log ops
+        self.rewrite = False
+        self.generation = None
+        self.snapshot_bytes = 0
+        self.epoch = 0       # bumped when compaction renumbers ids
+        self.lock = threading.Lock()
+
+    @property
+    def store_path(self):
+        digest = hashlib.sha1(self.root.encode("utf-8", "surrogateescape")).hexdigest()
+        return os.path.join(INDEX_DIR, f"{digest}.pkl")
+
+    @property
+    def log_path(self):
+        return self.store_path[:-len(".pkl")] + ".log"
+
+    @classmethod
+    def load(cls, root):
+        """Return the index for root, from memory, disk, or freshly created."""
+        key = os.path.abspath(root)
+        with _loaded_lock:
+            if key not in _loaded:
+                _loaded[key] = cls._read(key)
+            return _loaded[key]
+
+    @classmethod
+    def _read(cls, key):
+        index = cls(key)
+        try:
+            with open(index.store_path, "rb") as f:
+                data = pickle.load(f)
+                index.snapshot_bytes = f.tell()
+            if data.get("version") != INDEX_VERSION or data.get("root") != key:
+                return index
+            index.files = data["files"]
+            index.postings = data["postings"]
+            index.next_id = data["next_id"]
+            index.generation = data["generation"]
+        except Exception:
+            return index  # Missing or unreadable index: start empty.
+        try:
+            with open(index.log_path, "rb") as f:
+                while True:
+                    batch = pickle.load(f)
+                    if batch.get("generation") == index.generation:
+                        for op in batch["ops"]:
+                            index._apply(op)
+        except Exception:
+            pass  # End of the log, or a batch cut short by a crash.
+        return index
+
+    def _apply(self, op):
+        if op[0] == "forget":
+            self.files.pop(op[1], None)
+            return
+        _, rel, file_id, mtime_ns, size, grams = op
+        self.files[rel] = (file_id, mtime_ns, size)
+        for gram in grams:
+            self.postings.setdefault(gram, set()).add(file_id)
+        self.next_id = max(self.next_id, file_id + 1)
+
+    def save(self):
+        if not self.pending and not self.rewrite:
+            return
+        try:
+            os.makedirs(INDEX_DIR, exist_ok=True)
+            if self.rewrite or self.generation is None:
+                self._save_snapshot()
+            elif self._append_log() > self.snapshot_bytes * LOG_RATIO:
+                self._save_snapshot()
+            self.pending = []
+            self.rewrite = False
+        except OSError:
+            pass  # The index is an optimisation; keep working without it.
+
+    def _append_log(self):
+        """Append the pending ops as one batch; returns the log's size."""
+        batch = pickle.dumps({"generation": self.generation, "ops": self.pending},
+                             protocol=pickle.HIGHEST_PROTOCOL)
+        fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, batch)
+            return os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+
+    def _save_snapshot(self):
+        generation = os.urandom(8).hex()
+        data = {
+            "version": INDEX_VERSION,
+            "root": self.root,
+            "generation": generation,
+            "files": self.files,
+            "postings": self.postings,
+            "next_id": self.next_id,
+        }
+        fd, tmp = tempfile.mkstemp(dir=INDEX_DIR, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+                self.snapshot_bytes = f.tell()
+            os.replace(tmp, self.store_path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        self.generation = generation
+        try:
+            os.unlink(self.log_path)
+        except FileNotFoundError:
+            pass
+
+    def _add(self, rel, mtime_ns, size, grams):
+        """Index a file with trigram set `grams` (None for a binary file)."""
+        if grams is None:
+            op = ("add", rel, BINARY_ID, mtime_ns, size, ())
+        else:
+            op = ("add", rel, self.next_id, mtime_ns, size, grams)
+        self._apply(op)
+        self.pending.append(op)
+        return op[2]
+
+    def _forget(self, rel):
+        op = ("forget", rel)
+        self._apply(op)
+        self.pending.append(op)
+
+    def _compact(self):
+        live = sum(1 for entry in self.files.values() if entry[0] != BINARY_ID)
+        if live >= self.next_id * COMPACT_RATIO:
+            return
+        # Renumber live files densely and drop stale ids from the postings.
+        remap = {}
+        for rel, (file_id, mtime_ns, size) in self.files.items():
+            if file_id != BINARY_ID:
+                remap[file_id] = len(remap)
+                self.files[rel] = (remap[file_id], mtime_ns, size)
+        postings = {}
+        for gram, ids in self.postings.items():
+            ids = {remap[i] for i in ids if i in remap}
+            if ids:
+                postings[gram] = ids
+        self.postings = postings
+        self.next_id = len(remap)
+        self.epoch += 1
+        self.rewrite = True
+
+    def _matching(self, required):
+        """Ids of files containing all of `required`, or None for "all"."""
+        # Called with the lock held.
+        if not required:
+            return None
+        # Intersect smallest posting sets first.
+        sets = sorted((self.postings.get(g, set()) for g in required), key=len)
+        matching = set(sets[0])
+        for ids in sets[1:]:
+            matching &= ids
+            if not matching:
+                break
+        return matching
+
+    def _may_match(self, file_id, required, matching, known):
+        # Called with the lock held. Ids from `known` on were allocated (by
+        # a concurrent grep) after `matching` was computed.
+        if file_id == BINARY_ID:
+            return False
+        if matching is None:
+            return True
+        if file_id < known:
+            return file_id in matching
+        return all(file_id in self.postings.get(g, ()) for g in required)
+
+    def candidates(self, path, pattern):
+        """Walk `path` and yield the files that may match `pattern`.
+
+        `path` is the root or a directory below it. Files come from the
+        shared walker, in its order, so callers see the same output as a
+        full scan over the same walk. Binary files are never yielded.
+        Changed and new files are (re)indexed along the way. Bookkeeping for
+        deleted files only happens once the walk runs to completion; the
+        index is saved even if the caller stops early.
+
+        The lock is only held around each lookup and update, never across a
+        yield, so concurrent greps of the same tree interleave.
+        """
+        prefix = os.path.relpath(os.path.abspath(path), self.root).replace(os.sep, "/")
+        prefix = "" if prefix == "." else prefix + "/"
+        required = required_trigrams(pattern)
+        with self.lock:
+            epoch, known = self.epoch, self.next_id
+            matching = self._matching(required)
+
+        seen = set()
+        index_dir = os.path.abspath(INDEX_DIR) + os.sep
+        try:
+            for entry in walk_files(path):
+                full = entry.path
+                if os.path.abspath(full).startswith(index_dir):
+                    continue  # Never index our own store.
+                rel = prefix + entry.rel
+                seen.add(rel)
+                with self.lock:
+                    if self.epoch != epoch:
+                        # Ids were renumbered under us; start over from the new ones.
+                        epoch, known = self.epoch, self.next_id
+                        matching = self._matching(required)
+                    cached = self.files.get(rel)
+                    fresh = cached and cached[1] == entry.mtime_ns and cached[2] == entry.size
+                    hit = fresh and self._may_match(cached[0], required, matching, known)
+                if fresh:
+                    if hit:
+                        yield full
+                    continue
+                text = _read_text(full)
+                grams = None if text is None else trigrams(text)
+                with self.lock:
+                    self._add(rel, entry.mtime_ns, entry.size, grams)
+                if grams is not None and required <= grams:
+                    yield full
+
+            with self.lock:
+                # Forget files that disappeared from the walked subtree.
+                for rel in list(self.files):
+                    if rel.startswith(prefix) and rel not in seen:
+                        self._forget(rel)
+                self._compact()
+        finally:
+            with self.lock:
+                self.save()
+
+
+def candidate_files(path, pattern):
+    """Iterate files under directory `path` that may contain a match for `pattern`.
+
+    Close the returned generator (or exhaust it) so the index gets saved.
+    """
+    index = TrigramIndex.load(index_root(path))
+    return index.candidates(path, pattern)
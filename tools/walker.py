@@ -0,0 +1,266 @@
+"""Ignore-aware file walker shared by the search tools.
+
+Walks a directory tree in a deterministic order (sorted names, a
+directory's files before its subdirectories) while skipping:
+
+- anything matched by `.gitignore` / `.ignore` files, including the ones in
+  parent directories up to the enclosing git repository,
+- names in a configurable exclude list (VCS metadata, virtualenvs,
+  `node_modules`, caches, ...) and any directory containing `pyvenv.cfg`,
+- files larger than a size cap.
+
+Binary files cannot be recognised from metadata alone, so `open_text`
+sniffs the first few KB of a file and returns None for binaries; callers
+use it in place of a plain `open`.
+"""
+
+import fnmatch
+import io
+import os
+import re
+from collections import namedtuple
+
+from tools.tree_snapshot import scan
+
+DEFAULT_EXCLUDES = (
+    ".git", ".hg", ".svn", "node_modules", "__pycache__", ".venv", "venv",
+    ".tox", ".nox", ".mypy_cache", ".pytest_cache", ".ruff_cache", "*.pyc",
+)
+IGNORE_FILES = (".gitignore", ".ignore")
+MAX_FILE_SIZE = int(os.getenv("AGENT_MAX_FILE_SIZE", str(2 * 1024 * 1024)))
+BINARY_SNIFF_BYTES = 8192
+
+# `rel` is the path relative to the walk root, always "/"-separated.
+FileEntry = namedtuple("FileEntry", "path size mtime_ns rel is_dir", defaults=(False,))
+
+_rules_cache = {}
+
+
+def _segment_to_regex(part):
+    out = []
+    i = 0
+    while i < len(part):
+        c = part[i]
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "\\" and i + 1 < len(part):
+            i += 1
+            out.append(re.escape(part[i]))
+        elif c == "[" and part.find("]", i + 2) != -1:
+            j = part.find("]", i + 2)
+            body = part[i + 1:j]
+            if body[0] in "!^":
+                body = "^" + body[1:]
+            out.append("[" + body.replace("\\", "\\\\") + "]")
+            i = j
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+def glob_to_regex(pattern):
+    """Translate a '/'-separated glob (with `**`) into a regex source string."""
+    parts = pattern.split("/")
+    out = []
+    for i, part in enumerate(parts):
+        last = i == len(parts) - 1
+        if part == "**":
+            out.append(".*" if last else "(?:.*/)?")
+        else:
+            out.append(_segment_to_regex(part) + ("" if last else "/"))
+    return "".join(out)
+
+
+class IgnoreRules:
+    """Rules from one ignore file, applied to paths relative to the walk root."""
+
+    def __init__(self, lines, base="", prefix=""):
+        # `base`: directory of the ignore file relative to the walk root.
+        # `prefix`: walk root relative to the ignore file's directory, for
+        # ignore files that live above the walk root.
+        self.base = base
+        self.prefix = prefix
+        self.rules = []
+        for line in lines:
+            line = line.rstrip("\n")
+            if not line.strip() or line.startswith("#"):
+                continue
+            line = line.rstrip(" ")
+            if line.startswith("\\"):
+                line = line[1:]
+                negate = False
+            else:
+                negate = line.startswith("!")
+                if negate:
+                    line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            if "/" in line:
+                source = glob_to_regex(line.lstrip("/"))
+            else:
+                source = "(?:.*/)?" + glob_to_regex(line)
+            self.rules.append((re.compile(source + r"\Z"), negate, dir_only))
+
+    @classmethod
+    def from_file(cls, path, base="", prefix=""):
+        try:
+            with open(path, "r", errors="ignore") as f:
+                return cls(f.readlines(), base, prefix)
+        except OSError:
+            return None
+
+    def match(self, rel, is_dir):
+        """True if ignored, False if re-included, None if no rule applies."""
+        if self.base:
+            if not rel.startswith(self.base + "/"):
+                return None
+            rel = rel[len(self.base) + 1:]
+        if self.prefix:
+            rel = self.prefix + "/" + rel
+        verdict = None
+        for regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel):
+                verdict = not negate
+        return verdict
+
+
+def _parent_rules(root):
+    """Ignore rules from directories above `root`, up to the git repo root."""
+    rules = []
+    current = os.path.abspath(root)
+    if os.path.isdir(os.path.join(current, ".git")):
+        return rules
+    prefix = ""
+    while True:
+        parent = os.path.dirname(current)
+        if parent == current:
+            return []  # Not inside a git repository.
+        prefix = os.path.basename(current) + ("/" + prefix if prefix else "")
+        current = parent
+        for name in IGNORE_FILES:
+            ruleset = IgnoreRules.from_file(os.path.join(current, name), prefix=prefix)
+            if ruleset:
+                rules.insert(0, ruleset)
+        if os.path.isdir(os.path.join(current, ".git")):
+            return rules
+
+
+def _is_ignored(rulesets, rel, is_dir):
+    verdict = None
+    for ruleset in rulesets:
+        result = ruleset.match(rel, is_dir)
+        if result is not None:
+            verdict = result
+    return bool(verdict)
+
+
+def _load_rules(path, base):
+    """Parse an ignore file, reusing the previous parse if it is unchanged."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    key = (os.path.abspath(path), base)
+    cached = _rules_cache.get(key)
+    if cached and cached[0] == (st.st_mtime_ns, st.st_size):
+        return cached[1]
+    ruleset = IgnoreRules.from_file(path, base=base)
+    _rules_cache[key] = ((st.st_mtime_ns, st.st_size), ruleset)
+    return ruleset
+
+
+def walk_files(root, excludes=DEFAULT_EXCLUDES, max_size=MAX_FILE_SIZE,
+               use_ignore_files=True, include_hidden=True, snapshot=None, stat=True,
+               include_dirs=False):
+    """Yield a FileEntry for every file under `root` that survives the filters.
+
+    Paths are root joined with the relative path, as os.walk would build
+    them. With a
+    `snapshot` (see tools/tree_snapshot.py) directory listings are served
+    from it. With `stat=False` and no size cap, files are not stat()ed and
+    the entries carry None for size and mtime. With `include_dirs`, every
+    directory that survives the filters is yielded too (is_dir=True, no
+    stat), in its parent's listing order.
+    """
+    exclude = re.compile("|".join(fnmatch.translate(p) for p in excludes)) if excludes else None
+    listdir = snapshot.listdir if snapshot is not None else scan
+    need_stat = stat or max_size is not None
+
+    # Depth-first with an explicit stack: a directory's files, then each of
+    # its subdirectories in name order.
+    rulesets = tuple(_parent_rules(root)) if use_ignore_files else ()
+    stack = [(root, "", rulesets)]
+    while stack:
+        directory, rel_dir, rulesets = stack.pop()
+        try:
+            entries = listdir(directory)
+        except OSError:
+            continue
+
+        names = {e.name for e in entries}
+        if "pyvenv.cfg" in names and rel_dir:
+            continue  # A virtualenv, whatever it is called.
+        if use_ignore_files:
+            for name in IGNORE_FILES:
+                if name in names:
+                    ruleset = _load_rules(os.path.join(directory, name), rel_dir)
+                    if ruleset:
+                        rulesets = rulesets + (ruleset,)
+
+        path_prefix = directory if directory.endswith(os.sep) else directory + os.sep
+        rel_prefix = rel_dir + "/" if rel_dir else ""
+        subdirs = []
+        for name, kind in entries:
+            if exclude and exclude.match(name):
+                continue
+            if not include_hidden and name.startswith("."):
+                continue
+            rel = rel_prefix + name
+            if kind == "d":
+                if not rulesets or not _is_ignored(rulesets, rel, True):
+                    subdirs.append((path_prefix + name, rel, rulesets))
+                    if include_dirs:
+                        yield FileEntry(path_prefix + name, None, None, rel, True)
+                continue
+            if kind != "f" or (rulesets and _is_ignored(rulesets, rel, False)):
+                continue
+            path = path_prefix + name
+            if not need_stat:
+                yield FileEntry(path, None, None, rel)
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if max_size is not None and st.st_size > max_size:
+                continue
+            yield FileEntry(path, st.st_size, st.st_mtime_ns, rel)
+        stack.extend(reversed(subdirs))
+
+
+def looks_binary(head):
+    return b"\0" in head
+
+
+def open_text(path):
+    """Open `path` for reading text the way grep does, or None if it is binary.
+
+    The binary check peeks at the first BINARY_SNIFF_BYTES without a second
+    open or seek, then decodes with universal newlines and errors ignored.
+    """
+    raw = open(path, "rb", buffering=BINARY_SNIFF_BYTES)
+    try:
+        if looks_binary(raw.peek(BINARY_SNIFF_BYTES)[:BINARY_SNIFF_BYTES]):
+            raw.close()
+            return None
+        return io.TextIOWrapper(raw, errors="ignore")
+    except Exception:
+        raw.close()
+        raise
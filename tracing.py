@@ -0,0 +1,254 @@
+"""Structured spans for agent sessions, API calls, tool calls and subagents.
+
+Tracing is off unless an exporter is configured:
+
+    AGENT_TRACE_FILE       append spans as JSON lines to this file
+    AGENT_OTLP_ENDPOINT    POST spans as OTLP/HTTP JSON to <endpoint>/v1/traces
+                           (e.g. http://localhost:4318 for an OpenTelemetry
+                           collector)
+
+Spans nest through a contextvar; subagent threads and tool-pool threads
+are started with a copy of the caller's context, so a subagent's spans end
+up under the tool call that delegated it. Every span records the agent
+`depth` it ran at.
+
+Summarize a trace file:
+
+    python tracing.py trace.jsonl
+"""
+
+import contextvars
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+TRACE_FILE = os.getenv("AGENT_TRACE_FILE", "")
+OTLP_ENDPOINT = os.getenv("AGENT_OTLP_ENDPOINT", "")
+OTLP_BATCH_SIZE = 256
+SERVICE_NAME = "agent-zero"
+
+_current = contextvars.ContextVar("trace_span", default=None)
+
+
+class Span:
+    def __init__(self, name, kind, parent, attributes):
+        self.name = name
+        self.kind = kind
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self._start = time.perf_counter_ns()
+        self.end_ns = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def finish(self):
+        self.end_ns = self.start_ns + (time.perf_counter_ns() - self._start)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+            "name": self.name, "kind": self.kind,
+            "start_ns": self.start_ns, "end_ns": self.end_ns,
+            "duration_ms": (self.end_ns - self.start_ns) / 1e6,
+            "attributes": self.attributes, "error": self.error,
+        }
+
+
+class JsonlExporter:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def export(self, span):
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self.lock, open(self.path, "a") as f:
+            f.write(line)
+
+    def flush(self):
+        pass
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": value if isinstance(value, str) else json.dumps(value, default=str)}
+
+
+class OtlpExporter:
+    """Batches spans and POSTs them as OTLP/HTTP JSON."""
+
+    def __init__(self, endpoint, batch_size=OTLP_BATCH_SIZE):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.batch_size = batch_size
+        self.pending = []
+        self.lock = threading.Lock()
+
+    def export(self, span):
+        with self.lock:
+            self.pending.append(span)
+            if len(self.pending) < self.batch_size:
+                return
+            batch, self.pending = self.pending, []
+        self._send(batch)
+
+    def flush(self):
+        with self.lock:
+            batch, self.pending = self.pending, []
+        if batch:
+            self._send(batch)
+
+    def _send(self, batch):
+        spans = [{
+            "traceId": s.trace_id, "spanId": s.span_id, "parentSpanId": s.parent_id or "",
+            "name": s.name, "kind": 1,
+            "startTimeUnixNano": str(s.start_ns), "endTimeUnixNano": str(s.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)}
+                           for k, v in dict(s.attributes, **{"agent.kind": s.kind}).items()],
+            "status": {"code": 2, "message": s.error} if s.error else {},
+        } for s in batch]
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": "agent-zero.tracing"}, "spans": spans}],
+        }]}
+        import urllib.request  # deferred: pulls in ssl and email at import
+        request = urllib.request.Request(self.url, data=json.dumps(payload).encode("utf-8"),
+                                         headers={"Content-Type": "application/json"})
+        try:
+            urllib.request.urlopen(request, timeout=5).close()
+        except OSError as e:
+            print(f"tracing: could not export {len(batch)} spans to {self.url}: {e}", file=sys.stderr)
+
+
+_exporters = []
+if TRACE_FILE:
+    _exporters.append(JsonlExporter(TRACE_FILE))
+if OTLP_ENDPOINT:
+    _exporters.append(OtlpExporter(OTLP_ENDPOINT))
+
+
+def enabled():
+    return bool(_exporters)
+
+
+def add_exporter(exporter):
+    _exporters.append(exporter)
+
+
+def flush():
+    for exporter in _exporters:
+        exporter.flush()
+
+
+class _NoSpan:
+    def set(self, **attributes):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+@contextmanager
+def span(name, kind="internal", **attributes):
+    """Record a span around the block; yields an object with .set(**attrs)."""
+    if not _exporters:
+        yield _NO_SPAN
+        return
+    current = Span(name, kind, _current.get(), attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        current.finish()
+        for exporter in _exporters:
+            exporter.export(current)
+
+
+def usage_attributes(usage):
+    return {key: getattr(usage, key, 0) or 0 for key in (
+        "input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens")}
+
+
+def summarize(spans):
+    """Per-session time and token breakdown of finished span dicts."""
+    sessions = {}
+    for s in spans:
+        session = sessions.setdefault(s["trace_id"], {
+            "wall_ms": 0.0, "api_calls": 0, "api_ms": 0.0, "tools": {}, "permission_ms": 0.0,
+            "tokens_by_depth": {}, "slowest": [],
+        })
+        attrs = s["attributes"]
+        if s["parent_id"] is None:
+            session["wall_ms"] = s["duration_ms"]
+            session["name"] = attrs.get("task", s["name"])
+        if s["kind"] == "api":
+            session["api_calls"] += 1
+            session["api_ms"] += s["duration_ms"]
+            tokens = session["tokens_by_depth"].setdefault(attrs.get("depth", 0), {})
+            for key in ("input_tokens", "output_tokens", "cache_read_input_tokens",
+                        "cache_creation_input_tokens"):
+                tokens[key] = tokens.get(key, 0) + attrs.get(key, 0)
+        elif s["kind"] == "tool":
+            tool = session["tools"].setdefault(attrs.get("tool", s["name"]),
+                                               {"calls": 0, "total_ms": 0.0, "max_ms": 0.0, "bytes_out": 0})
+            tool["calls"] += 1
+            tool["total_ms"] += s["duration_ms"]
+            tool["max_ms"] = max(tool["max_ms"], s["duration_ms"])
+            tool["bytes_out"] += attrs.get("bytes_out", 0)
+        elif s["kind"] == "permission":
+            session["permission_ms"] += s["duration_ms"]
+        if s["kind"] in ("api", "tool"):
+            session["slowest"].append((s["duration_ms"], s["name"], attrs.get("depth", 0)))
+    for session in sessions.values():
+        session["slowest"] = sorted(session["slowest"], reverse=True)[:5]
+    return sessions
+
+
+def format_summary(sessions):
+    lines = []
+    for trace_id, s in sessions.items():
+        lines.append(f"session {trace_id[:8]}  {str(s.get('name', ''))[:60]!r}")
+        lines.append(f"  wall {s['wall_ms'] / 1000:.2f}s   api {s['api_ms'] / 1000:.2f}s "
+                     f"({s['api_calls']} calls)   permission wait {s['permission_ms'] / 1000:.2f}s")
+        for name, t in sorted(s["tools"].items(), key=lambda item: item[1]["total_ms"], reverse=True):
+            lines.append(f"  tool {name:<18}{t['calls']:>5} calls {t['total_ms'] / 1000:>8.2f}s total "
+                         f"{t['max_ms'] / 1000:>7.2f}s max {t['bytes_out']:>10,} bytes out")
+        for depth, tokens in sorted(s["tokens_by_depth"].items()):
+            lines.append(f"  depth {depth}: {tokens['input_tokens']:,} in, {tokens['output_tokens']:,} out, "
+                         f"{tokens['cache_read_input_tokens']:,} cache read, "
+                         f"{tokens['cache_creation_input_tokens']:,} cache write")
+        if s["slowest"]:
+            lines.append("  slowest: " + ", ".join(f"{name}@{depth} {ms / 1000:.2f}s"
+                                                   for ms, name, depth in s["slowest"]))
+        lines.append("")
+    return "\n".join(lines)
+
+
+def main(argv):
+    if len(argv) != 1:
+        print("Usage: python tracing.py trace.jsonl")
+        return 1
+    with open(argv[0]) as f:
+        spans = [json.loads(line) for line in f if line.strip()]
+    print(format_summary(summarize(spans)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))